@@ -1,9 +1,32 @@
 import os
-import json
-import re
 import google.generativeai as genai
 from typing import Dict, Any
 from .context import AgentContext
+from .prompts import PromptTemplate, PromptField
+from .llm_usage import llm_usage
+from .streaming import generate_json
+
+PROMPT = PromptTemplate('actionPlanning', """
+You are an Action Planning Agent.
+
+Create specific actionable plan for the complaint described below.
+Respond ONLY with valid JSON:
+{
+  "immediate_actions": ["action 1", "action 2"],
+  "timeline": "X hours/days",
+  "resources_needed": ["resource 1", "resource 2"],
+  "notes": "considerations"
+}
+
+Context:
+""", [
+    PromptField('issue_type', '- Issue'),
+    PromptField('category', '- Category'),
+    PromptField('severity', '- Severity'),
+    PromptField('department', '- Department'),
+    PromptField('nearby_facilities', '- Nearby facilities', kind='list', max_tokens=60, empty=''),
+], budget=400)
+
 
 class ActionPlanningAgent:
     """ActionPlanningAgent - Creates resolution plans"""
@@ -28,26 +51,13 @@ class ActionPlanningAgent:
             return await self._fallback_execution(context, category, severity)
             
         try:
-            prompt = f"""You are an Action Planning Agent.
-
-Context:
-- Issue: {issue_type}
-- Category: {category}
-- Severity: {severity}
-- Department: {department}
-- Nearby facilities: {", ".join(nearby_facilities)}
-
-Create specific actionable plan.
-Respond ONLY with valid JSON:
-{{
-  "immediate_actions": ["action 1", "action 2"],
-  "timeline": "X hours/days",
-  "resources_needed": ["resource 1", "resource 2"],
-  "notes": "considerations"
-}}"""
-
-            response = await self.model.generate_content_async(prompt)
-            parsed = self._parse_json(response.text)
+            prompt = PROMPT.render(
+                issue_type=issue_type, category=category, severity=severity,
+                department=department, nearby_facilities=nearby_facilities
+            )
+            streamed = await generate_json(self.model, prompt.text)
+            usage = llm_usage.record(PROMPT, prompt, streamed.response, streamed.text)
+            parsed = streamed.data
             
             await context.update(self.name, {
                 "action_plan": parsed,
@@ -57,7 +67,8 @@ Respond ONLY with valid JSON:
             })
             
             return {
-                "summary": f"Plan created, Timeline: {parsed.get('timeline')}"
+                "summary": f"Plan created, Timeline: {parsed.get('timeline')}",
+                "usage": usage
             }
             
         except Exception:
@@ -91,10 +102,3 @@ Respond ONLY with valid JSON:
             "immediate_actions": tmpl['actions']
         })
         return {"summary": f"Plan: {len(tmpl['actions'])} steps, Timeline: {timeline} (Fallback)"}
-
-    def _parse_json(self, text):
-        try:
-            cleaned = re.sub(r'```json\n?|```\n?', '', text).strip()
-            return json.loads(cleaned)
-        except Exception:
-            return {}
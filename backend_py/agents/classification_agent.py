@@ -1,42 +1,16 @@
 import os
-import json
-import re
 import google.generativeai as genai
 from typing import Dict, Any, List
 from .context import AgentContext
+from .prompts import PromptTemplate, PromptField
+from .llm_usage import llm_usage
+from .streaming import generate_json
 
-class ClassificationAgent:
-    """ClassificationAgent - Determines category, severity, and impact"""
-    def __init__(self):
-        self.name = 'ClassificationAgent'
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            self.use_fallback = True
-        else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-            self.use_fallback = False
-
-    async def execute(self, context: AgentContext) -> Dict[str, Any]:
-        issue_type = context.get('issue_type')
-        urgency_indicators = context.get('urgency_indicators') or []
-        nearby_facilities = context.get('nearby_facilities') or []
-        original_text = context.get('original_text')
-        
-        if self.use_fallback:
-            return await self._fallback_execution(context, issue_type, urgency_indicators, nearby_facilities)
-            
-        try:
-            prompt = f"""You are a Classification Agent in a multi-agent civic complaint system.
+PROMPT = PromptTemplate('classification', """
+You are a Classification Agent in a multi-agent civic complaint system.
 
 Task: Classify this civic complaint based on context from OTHER agents.
 
-Context from other agents:
-- Issue type: {issue_type}
-- Urgency indicators: {", ".join(urgency_indicators) if urgency_indicators else 'None'}
-- Nearby facilities: {", ".join(nearby_facilities) if nearby_facilities else 'None'}
-- Original complaint: "{original_text}"
-
 Classification guidelines:
 
 CATEGORIES (choose one):
@@ -59,15 +33,61 @@ IMPACT SCOPE (choose one):
 - Ward (entire ward affected)
 
 Respond ONLY with valid JSON:
-{{
+{
   "category": "category name",
   "severity": "Low|Medium|High",
   "impact_scope": "Individual|Street|Neighborhood|Ward",
   "reasoning": "brief explanation of your classification decision"
-}}"""
+}
+
+Context from other agents:
+""", [
+    PromptField('issue_type', '- Issue type'),
+    PromptField('urgency_indicators', '- Urgency indicators', kind='list', max_tokens=60),
+    PromptField('nearby_facilities', '- Nearby facilities', kind='list', max_tokens=60),
+    PromptField('original_text', '- Original complaint', kind='text', elastic=True),
+], budget=800)
+
+# Proposed to the context as soon as they stream in, ahead of the reasoning
+EARLY_FIELDS = ('category', 'severity')
 
-            response = await self.model.generate_content_async(prompt)
-            parsed = self._parse_json(response.text)
+
+class ClassificationAgent:
+    """ClassificationAgent - Determines category, severity, and impact"""
+    def __init__(self):
+        self.name = 'ClassificationAgent'
+        api_key = os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            self.use_fallback = True
+        else:
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            self.use_fallback = False
+
+    async def execute(self, context: AgentContext) -> Dict[str, Any]:
+        issue_type = context.get('issue_type')
+        urgency_indicators = context.get('urgency_indicators') or []
+        nearby_facilities = context.get('nearby_facilities') or []
+        original_text = context.get('original_text')
+        
+        if self.use_fallback:
+            return await self._fallback_execution(context, issue_type, urgency_indicators, nearby_facilities)
+            
+        try:
+            prompt = PROMPT.render(
+                issue_type=issue_type, urgency_indicators=urgency_indicators,
+                nearby_facilities=nearby_facilities, original_text=original_text
+            )
+            # Early values are only proposed: the coordinator can speculate on
+            # them, but the context keeps nothing until the full response parses
+            try:
+                streamed = await generate_json(
+                    self.model, prompt.text, early_fields=EARLY_FIELDS, on_early=context.propose
+                )
+            finally:
+                context.retract(*EARLY_FIELDS)
+            usage = llm_usage.record(PROMPT, prompt, streamed.response, streamed.text)
+            parsed = streamed.data
             
             await context.update(self.name, {
                 "category": parsed.get("category"),
@@ -77,7 +97,8 @@ Respond ONLY with valid JSON:
             })
             
             return {
-                "summary": f"Category: {parsed.get('category')}, Severity: {parsed.get('severity')}, Impact: {parsed.get('impact_scope')}"
+                "summary": f"Category: {parsed.get('category')}, Severity: {parsed.get('severity')}, Impact: {parsed.get('impact_scope')}",
+                "usage": usage
             }
             
         except Exception:
@@ -107,10 +128,3 @@ Respond ONLY with valid JSON:
             "classification_reasoning": "Fallback Logic"
         })
         return {"summary": f"Category: {category}, Severity: {severity} (Fallback)"}
-
-    def _parse_json(self, text):
-        try:
-            cleaned = re.sub(r'```json\n?|```\n?', '', text).strip()
-            return json.loads(cleaned)
-        except Exception:
-            return {}
@@ -1,95 +1,233 @@
+import asyncio
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable
 from ..db.connection import get_pool
+from ..tracing import span
+
+# Known context fields and their defaults (lists are copied per instance)
+CONTEXT_FIELDS: Dict[str, Any] = {
+    # Original input
+    "original_text": "",
+    "latitude": None,
+    "longitude": None,
+    "address": None,
+
+    # Address resolution (gazetteer), before the GIS agent
+    "location_source": None,
+    "address_match": None,
+    "address_distance_m": None,
+    "location_mismatch": False,
+
+    # Understanding Agent outputs
+    "issue_type": None,
+    "urgency_indicators": [],
+    "affected_area": None,
+    "duration": None,
+
+    # GIS Intelligence Agent outputs
+    "zone_name": None,
+    "ward_number": None,
+    "zone_dataset_version": None,
+    "nearby_facilities": [],
+    "historical_issues": [],
+    "nearby_complaints": [],
+
+    # Classification Agent outputs
+    "category": None,
+    "severity": None,
+    "impact_scope": None,
+    "classification_reasoning": None,
+
+    # Sentiment Agent outputs
+    "sentiment": None,
+    "distress_score": None,
+    "severity_adjustment": None,
+
+    # Vision Agent outputs
+    "image_sha256": None,
+    "image_phash": None,
+    "image_thumbnail_url": None,
+    "image_features": None,
+    "duplicate_of": None,
+
+    # Predictive Agent outputs
+    "recurrence_risk": None,
+    "expected_volume": None,
+    "severity_elevation": None,
+
+    # Routing Agent outputs
+    "department": None,
+    "assigned_team": None,
+    "escalation_needed": False,
+    "routing_reasoning": None,
+
+    # Action Planning Agent outputs
+    "action_plan": None,
+    "timeline": None,
+    "resources_needed": [],
+    "immediate_actions": [],
+
+    # Coordinator: the incident this report belongs to ('opened' / 'joined' / 'member')
+    "incident_id": None,
+    "incident_role": None,
+
+    # Coordinator: agents that ran on their fallback due to load shedding
+    "degraded_agents": []
+}
 
 class AgentContext:
     """
     AgentContext - Shared memory/context for multi-agent collaboration
-    
+
     This class enables agents to:
     - Read data from previous agents
     - Write their findings for subsequent agents
     - Build collaborative intelligence through shared state
+
+    Known fields live in slots; keys outside CONTEXT_FIELDS go to `_extra`.
+    Every update records which fields actually changed, only that delta is
+    written to the database, and `take_changes()` hands the delta accumulated
+    since the previous call to the coordinator for the execution trace.
+    Values an agent has only proposed (see `propose()`) are kept apart and
+    reach nothing but forks.
     """
-    def __init__(self, complaint_id: int):
+    __slots__ = ('complaint_id', 'persist', '_extra', '_changes', '_saved', '_published',
+                 '_proposed') + tuple(CONTEXT_FIELDS)
+
+    def __init__(self, complaint_id: int, persist: bool = True):
         self.complaint_id = complaint_id
-        self.data: Dict[str, Any] = {
-            # Original input
-            "original_text": "",
-            "latitude": None,
-            "longitude": None,
-            "address": None,
-            
-            # Understanding Agent outputs
-            "issue_type": None,
-            "urgency_indicators": [],
-            "affected_area": None,
-            "duration": None,
-            
-            # GIS Intelligence Agent outputs
-            "zone_name": None,
-            "ward_number": None,
-            "nearby_facilities": [],
-            "historical_issues": [],
-            
-            # Classification Agent outputs
-            "category": None,
-            "severity": None,
-            "impact_scope": None,
-            "classification_reasoning": None,
-            
-            # Routing Agent outputs
-            "department": None,
-            "assigned_team": None,
-            "escalation_needed": False,
-            "routing_reasoning": None,
-            
-            # Action Planning Agent outputs
-            "action_plan": None,
-            "timeline": None,
-            "resources_needed": [],
-            "immediate_actions": []
-        }
+        # When False, updates stay in memory (used for dry-run reprocessing)
+        self.persist = persist
+        self._extra: Dict[str, Any] = {}
+        self._changes: Dict[str, Any] = {}
+        # Whether this run has written the agent_context row yet
+        self._saved = False
+        # Set (and replaced) on every update or proposal, for wait_for()
+        self._published: Optional[asyncio.Event] = None
+        # Uncommitted values from a running agent; never persisted or traced
+        self._proposed: Dict[str, Any] = {}
+        for name, default in CONTEXT_FIELDS.items():
+            setattr(self, name, list(default) if isinstance(default, list) else default)
 
     async def update(self, agent_name: str, data: Dict[str, Any]):
-        """Update context with new data from an agent and persist to DB."""
-        self.data.update(data)
-        await self._save_to_database(agent_name, self.data)
+        """Update context with new data from an agent and persist the changed fields."""
+        delta = self._apply(data)
+        if delta:
+            self._changes.update(delta)
+            if self.persist:
+                await self._save_to_database(agent_name, delta)
+        self._notify()
+
+    async def propose(self, data: Dict[str, Any]):
+        """
+        Offer values an agent has not committed yet, e.g. fields parsed while
+        an LLM is still streaming. They are visible to `peek()`, `wait_for()`
+        and `fork()` only; the agent commits them with `update()` once its
+        output is complete, or drops them with `retract()` if it fails.
+        """
+        self._proposed.update(data)
+        self._notify()
+
+    def retract(self, *keys: str):
+        """Drop proposed values (all of them when no keys are given)."""
+        if keys:
+            for key in keys:
+                self._proposed.pop(key, None)
+        else:
+            self._proposed.clear()
+
+    def peek(self, key: str) -> Any:
+        """The proposed value for `key` if there is one, else the committed value."""
+        return self._proposed[key] if key in self._proposed else self.get(key)
+
+    async def wait_for(self, *keys: str):
+        """Wait until every key has a committed or proposed value."""
+        while any(self.peek(key) is None for key in keys):
+            if self._published is None:
+                self._published = asyncio.Event()
+            await self._published.wait()
+
+    def _notify(self):
+        if self._published:
+            self._published.set()
+            self._published = None
+
+    def _apply(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        delta = {}
+        for key, value in data.items():
+            if key in CONTEXT_FIELDS:
+                if getattr(self, key) == value:
+                    continue
+                setattr(self, key, value)
+            else:
+                if key in self._extra and self._extra[key] == value:
+                    continue
+                self._extra[key] = value
+            delta[key] = value
+        return delta
 
     def get(self, key: str) -> Any:
         """Get a specific value from context."""
-        return self.data.get(key)
-    
+        if key in CONTEXT_FIELDS:
+            return getattr(self, key)
+        return self._extra.get(key)
+
     def get_all(self) -> Dict[str, Any]:
         """Get all context data."""
-        return self.data.copy()
+        data = {name: getattr(self, name) for name in CONTEXT_FIELDS}
+        data.update(self._extra)
+        return data
 
-    async def _save_to_database(self, agent_name: str, data: Dict[str, Any]):
-        """Save context update to database."""
+    def take_changes(self) -> Dict[str, Any]:
+        """Return the fields changed since the last call and reset the tracker."""
+        changes, self._changes = self._changes, {}
+        return changes
+
+    async def _save_to_database(self, agent_name: str, delta: Dict[str, Any]):
+        """Merge the changed fields into the stored context."""
         try:
             pool = await get_pool()
-            async with pool.acquire() as conn:
-                # Check if context record exists
-                count = await conn.fetchval(
-                    'SELECT COUNT(*) FROM agent_context WHERE complaint_id = $1',
-                    self.complaint_id
-                )
-                
-                json_data = json.dumps(data)
-                
-                if count == 0:
-                    await conn.execute(
-                        'INSERT INTO agent_context (complaint_id, context_data) VALUES ($1, $2)',
-                        self.complaint_id, json_data
-                    )
-                else:
-                    await conn.execute(
-                        'UPDATE agent_context SET context_data = $1, updated_at = NOW() WHERE complaint_id = $2',
-                        json_data, self.complaint_id
-                    )
+            with span("context.save", **{"agent.name": agent_name, "context.fields": len(delta)}):
+                async with pool.acquire() as conn:
+                    json_delta = json.dumps(delta, default=str)
+
+                    if not self._saved:
+                        # A new run (reprocess, worker retry) replaces the previous run's row
+                        await conn.execute(
+                            """
+                            INSERT INTO agent_context (complaint_id, context_data) VALUES ($1, $2)
+                            ON CONFLICT (complaint_id) DO UPDATE
+                            SET context_data = EXCLUDED.context_data, updated_at = NOW()
+                            """,
+                            self.complaint_id, json.dumps(self.get_all(), default=str)
+                        )
+                        self._saved = True
+                    else:
+                        await conn.execute(
+                            'UPDATE agent_context SET context_data = context_data || $1::jsonb, updated_at = NOW() WHERE complaint_id = $2',
+                            json_delta, self.complaint_id
+                        )
         except Exception as e:
             print(f"Error saving context to database ({agent_name}): {e}")
 
+    def fork(self) -> "AgentContext":
+        """In-memory copy for speculative work, proposed values included;
+        nothing it does is persisted."""
+        instance = AgentContext(self.complaint_id, persist=False)
+        instance._apply({**self.get_all(), **self._proposed})
+        instance._changes = {}
+        return instance
+
+    @classmethod
+    def from_deltas(cls, complaint_id: int, deltas: Iterable[Optional[Dict[str, Any]]]) -> "AgentContext":
+        """Rebuild a context by replaying per-step deltas in order (in memory only)."""
+        instance = cls(complaint_id, persist=False)
+        for delta in deltas:
+            if delta:
+                instance._apply(delta)
+        instance._changes = {}
+        return instance
+
     @classmethod
     async def load_from_database(cls, complaint_id: int):
         """Load context from database."""
@@ -102,7 +240,9 @@ class AgentContext:
                     complaint_id
                 )
                 if row:
-                    instance.data = json.loads(row['context_data'])
+                    instance._apply(json.loads(row['context_data']))
+                    instance._changes = {}
+                    instance._saved = True
             return instance
         except Exception as e:
             print(f"Error loading context from database: {e}")
@@ -1,6 +1,7 @@
+import asyncio
 import time
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from ..db.connection import get_pool
 from .context import AgentContext
 from .understanding_agent import UnderstandingAgent
@@ -8,16 +9,24 @@ from .gis_agent import GISIntelligenceAgent
 from .classification_agent import ClassificationAgent
 from .sentiment_agent import SentimentAgent
 from .vision_agent import VisionAgent
-from .predictive_agent import PredictiveAgent
+from .predictive_agent import PredictiveAgent, RECURRING_CATEGORIES
 from .routing_agent import RoutingAgent
 from .action_planning_agent import ActionPlanningAgent
+from .load_shedding import load_shedder
+from .incidents import incident_clusterer
+from .speculation import Speculation, SPECULATIVE_AGENTS, AGREEMENT_FIELDS, speculation_stats
+from ..geo.gazetteer import get_gazetteer, check_location
+from ..profiling import record_span
+from ..tracing import trace, span, current_trace_id
 
 class CoordinatorAgent:
     """
     CoordinatorAgent - Orchestrates the multi-agent workflow
     """
-    def __init__(self):
+    def __init__(self, persist: bool = True):
         self.name = 'CoordinatorAgent'
+        # When False, nothing is written to agent_context / agent_executions
+        self.persist = persist
         
         # Initialize all specialized agents
         self.agents = {
@@ -30,22 +39,37 @@ class CoordinatorAgent:
             'routing': RoutingAgent(),
             'actionPlanning': ActionPlanningAgent()
         }
+        # Agents with a working LLM; the load shedder may switch these to their fallbacks
+        self.llm_agents = {key for key, agent in self.agents.items() if getattr(agent, 'use_fallback', True) is False}
+        load_shedder.register(self)
 
     async def process_complaint(self, complaint_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a complaint through the multi-agent pipeline."""
-        context = AgentContext(complaint_data['id'])
+        """Process a complaint through the multi-agent pipeline.
+
+        Runs under the caller's trace (the HTTP request) or a new one; the
+        trace id is returned with the result and stored on each trace row."""
+        with trace("coordinator.process_complaint", complaint_id=complaint_data['id']) as root:
+            processing_result = await self._run_pipeline(complaint_data)
+            root.set(success=processing_result.get('success'))
+            processing_result["trace_id"] = current_trace_id()
+        return processing_result
+
+    async def _run_pipeline(self, complaint_data: Dict[str, Any]) -> Dict[str, Any]:
+        context = AgentContext(complaint_data['id'], persist=self.persist)
         execution_log: List[Dict[str, Any]] = []
         
         print(f"\n🎯 CoordinatorAgent: Starting parsing for complaint {complaint_data['id']}")
         
-        # Initialize context with input data
-        await context.update(self.name, {
+        # Initialize context with input data (the gazetteer may fill in missing coordinates)
+        await self._update_context(context, {
             "original_text": complaint_data['text'],
             "latitude": complaint_data.get('latitude'),
             "longitude": complaint_data.get('longitude'),
-            "address": complaint_data.get('address')
+            "address": complaint_data.get('address'),
+            **self._resolve_location(complaint_data)
         })
         
+        speculation = None
         try:
             # STEP 1: Understanding Agent (always runs)
             print('  → Running Understanding Agent...')
@@ -55,9 +79,22 @@ class CoordinatorAgent:
             print('  → Running GIS Intelligence Agent...')
             await self._execute_agent('gis', context, execution_log)
             
-            # STEP 3: Classification Agent (always runs)
+            # STEP 3: Classification Agent (always runs). While an LLM
+            # classification is in flight, routing and action planning run
+            # ahead on the rule-based classification.
+            speculation = await self._start_speculation(context)
             print('  → Running Classification Agent...')
-            await self._execute_agent('classification', context, execution_log)
+            if speculation:
+                classification = asyncio.create_task(self._execute_agent('classification', context, execution_log))
+                try:
+                    speculation = await self._check_early_classification(context, speculation, classification)
+                finally:
+                    await classification
+            else:
+                await self._execute_agent('classification', context, execution_log)
+            if speculation and not speculation.resolve(context):
+                print(f"  ↺ Speculation missed (provisional {speculation.provisional['category']}/"
+                      f"{speculation.provisional['severity']}); discarding")
             
             # STEP 4: Sentiment & Tone Agent (always runs)
             print('  → Running Sentiment & Tone Agent...')
@@ -73,8 +110,7 @@ class CoordinatorAgent:
                 
             # STEP 6: Predictive Agent (runs for recurring patterns)
             category = context.get('category')
-            recurring_categories = ['Sanitation', 'Roads', 'Water Supply', 'Drainage']
-            if category in recurring_categories:
+            if category in RECURRING_CATEGORIES:
                 print('  → Running Predictive Agent...')
                 await self._execute_agent('predictive', context, execution_log)
             else:
@@ -88,32 +124,56 @@ class CoordinatorAgent:
             
             final_severity = self._get_highest_severity([severity, severity_elevation, severity_adjust])
             
-            if category and category != 'Other':
-                print('  → Running Routing Agent...')
-                await self._execute_agent('routing', context, execution_log)
+            # Reports of the same problem form one incident, planned once
+            incident = await self._join_incident(context, category, final_severity)
+            plan = await self._incident_plan(incident, final_severity) if incident else None
+            if plan:
+                print(f"  ↳ Incident #{incident['id']} already planned; reusing its routing and action plan")
+                await self._update_context(context, plan)
+                if final_severity != severity:
+                    await self._update_context(context, {'severity': final_severity})
             else:
-                print('  ⊗ Skipping Routing Agent')
-                
-            # DECISION POINT: Action Plan
-            if final_severity != severity:
-                await context.update(self.name, {'severity': final_severity})
-                
-            if final_severity in ['Medium', 'High']:
-                print('  → Running Action Planning Agent...')
-                await self._execute_agent('actionPlanning', context, execution_log)
-            else:
-                print('  ⊗ Skipping Action Planning Agent')
+                if category and category != 'Other':
+                    print('  → Running Routing Agent...')
+                    await self._execute_or_commit('routing', context, execution_log, speculation)
+                else:
+                    print('  ⊗ Skipping Routing Agent')
+
+                # DECISION POINT: Action Plan
+                if final_severity != severity:
+                    await self._update_context(context, {'severity': final_severity})
+
+                if final_severity in ['Medium', 'High']:
+                    print('  → Running Action Planning Agent...')
+                    await self._execute_or_commit('actionPlanning', context, execution_log, speculation)
+                else:
+                    print('  ⊗ Skipping Action Planning Agent')
+                if incident:
+                    await incident_clusterer.save_plan(incident['id'], context.complaint_id, context.get_all())
+            
+            # Record agents that ran on their fallback because of load shedding,
+            # so the complaint can be reprocessed once pressure drops
+            degraded = [entry['name'] for entry in execution_log if entry.get('degraded')]
+            if degraded:
+                await self._update_context(context, {'degraded_agents': degraded})
             
             print(f"✓ Multi-agent processing complete! Executed {len(execution_log)} agents\n")
             
-            return {
+            processing_result = {
                 "success": True,
                 "result": context.get_all(),
                 "execution_log": execution_log,
                 "total_execution_time_ms": sum(l['execution_time_ms'] for l in execution_log)
             }
+            if speculation:
+                speculation.cancel()
+                speculation_stats.record(speculation)
+                processing_result["speculation"] = speculation.summary()
+            return processing_result
             
         except Exception as e:
+            if speculation:
+                speculation.cancel()
             print(f'❌ CoordinatorAgent error: {e}')
             execution_log.append({
                 "name": "CoordinatorAgent",
@@ -122,20 +182,162 @@ class CoordinatorAgent:
             })
             return await self._fallback_processing(complaint_data, execution_log)
 
+    async def _update_context(self, context: AgentContext, data: Dict[str, Any]):
+        """Coordinator-owned context change, traced like an agent step so the
+        full context can be replayed from agent_executions deltas."""
+        await context.update(self.name, data)
+        await self._save_agent_execution(
+            context.complaint_id, self.name, context.take_changes(), None, 0, "success", None
+        )
+
+    async def _start_speculation(self, context: AgentContext) -> Optional[Speculation]:
+        """Fork the context with the rule-based classification and start the
+        dependent agents on it, when that can save an LLM round-trip."""
+        classifier = self.agents['classification']
+        if (not speculation_stats.enabled or load_shedder.level > 0
+                or 'classification' not in self.llm_agents or classifier.use_fallback
+                or not any(key in self.llm_agents for key in SPECULATIVE_AGENTS)):
+            return None
+        fork = context.fork()
+        try:
+            await classifier._fallback_execution(
+                fork, fork.get('issue_type'), fork.get('urgency_indicators') or [],
+                fork.get('nearby_facilities') or []
+            )
+        except Exception as e:
+            print(f"  ⚠️  No provisional classification, not speculating: {e}")
+            return None
+        fork.take_changes()
+        return Speculation(self, fork, {'category': fork.get('category'), 'severity': fork.get('severity')})
+
+    async def _check_early_classification(self, context: AgentContext, speculation: Speculation,
+                                          classification: asyncio.Task) -> Speculation:
+        """
+        Category and severity are proposed to the context as they stream in,
+        before the LLM finishes its reasoning. If they already contradict the provisional classification, discard
+        the speculative branch and restart it from the LLM's values rather
+        than waiting for the rest of the response.
+        """
+        published = asyncio.create_task(context.wait_for(*AGREEMENT_FIELDS))
+        try:
+            await asyncio.wait({classification, published}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            published.cancel()
+        if classification.done() or speculation.resolve(context):
+            return speculation
+        speculation_stats.record(speculation)
+        print(f"  ↺ Early classification {context.peek('category')}/{context.peek('severity')} disagrees with "
+              f"{speculation.provisional['category']}/{speculation.provisional['severity']}; restarting speculation")
+        fork = context.fork()
+        return Speculation(self, fork, {key: fork.get(key) for key in AGREEMENT_FIELDS})
+
+    async def _execute_or_commit(self, agent_key: str, context: AgentContext, execution_log: List[Dict[str, Any]],
+                                 speculation: Optional[Speculation]):
+        """Commit the agent's speculative output if its inputs held; otherwise run it now."""
+        step = await speculation.take(agent_key, context) if speculation else None
+        if step is None:
+            return await self._execute_agent(agent_key, context, execution_log)
+        agent = self.agents[agent_key]
+        with span(f"agent.{agent_key}", **{"agent.name": agent.name, "agent.speculative": True}):
+            await context.update(agent.name, step.delta)
+        log_entry = {
+            "name": agent.name,
+            "status": "success",
+            "execution_time_ms": step.execution_time_ms,
+            "key_findings": step.result.get("summary"),
+            "speculative": True
+        }
+        if step.result.get("usage"):
+            log_entry["tokens"] = step.result["usage"]
+        if step.degraded:
+            log_entry["degraded"] = True
+        elif agent_key in self.llm_agents:
+            load_shedder.record_llm_latency(step.execution_time_ms)
+        execution_log.append(log_entry)
+        await self._save_agent_execution(
+            context.complaint_id, agent.name, context.take_changes(), step.result,
+            step.execution_time_ms, "success", None
+        )
+        return step.result
+
+    async def _join_incident(self, context: AgentContext, category: Optional[str],
+                             severity: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Attach the complaint to its incident (only for persisted runs)."""
+        if not self.persist:
+            return None
+        try:
+            with span("incidents.assign", category=category) as current:
+                incident = await incident_clusterer.assign(
+                    context.complaint_id, category, context.get('latitude'), context.get('longitude'), severity
+                )
+                current.set(role=incident['role'] if incident else None)
+        except Exception as e:
+            # Clustering is an optimisation; the complaint is still planned on its own
+            print(f"Incident clustering failed: {e}")
+            return None
+        if incident:
+            print(f"  ↳ Incident #{incident['id']}: {incident['role']} ({incident['member_count']} report(s))")
+            await self._update_context(context, {"incident_id": incident['id'], "incident_role": incident['role']})
+        return incident
+
+    async def _incident_plan(self, incident: Dict[str, Any], severity: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Routing and action plan to reuse from the incident, or None to plan this complaint."""
+        if incident['role'] in ('opened', 'member'):
+            # A new incident, or a reprocess: plan afresh and store it as the incident's plan
+            return None
+        if incident['role'] == 'joined' and incident.get('planned_at') is None:
+            # The incident's first report is still planning; wait for it rather than plan twice
+            incident = await incident_clusterer.wait_for_plan(incident['id'])
+            if incident is None:
+                return None
+        return incident_clusterer.reuse_plan(incident, severity)
+
+    def _resolve_location(self, complaint_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Match the address against the offline gazetteer before any agent runs:
+        fill in missing coordinates, or flag GPS that disagrees with the address.
+        """
+        lat, lng, address = complaint_data.get('latitude'), complaint_data.get('longitude'), complaint_data.get('address')
+        location_source = complaint_data.get('location_source')
+        if location_source is None and lat is not None and lng is not None:
+            location_source = 'gps'
+        gazetteer = get_gazetteer() if address else None
+        if gazetteer is None:
+            return {"location_source": location_source}
+
+        with span("gazetteer.resolve") as current:
+            match = gazetteer.resolve(address)
+            current.set(matched=match is not None)
+        location: Dict[str, Any] = {"address_match": match['name'] if match else None}
+        if match and location_source is None:
+            location_source = 'address'
+            location.update(latitude=match['latitude'], longitude=match['longitude'])
+            print(f"  📍 No GPS; located from address ({match['name']})")
+        elif match and location_source == 'gps':
+            check = check_location(match, lat, lng)
+            location.update(address_distance_m=check['distance_m'], location_mismatch=check['mismatch'])
+            if check['mismatch']:
+                print(f"  ⚠️  GPS is {check['distance_m']}m from the address ({match['name']})")
+        location["location_source"] = location_source
+        return location
+
     async def _execute_agent(self, agent_key: str, context: AgentContext, execution_log: List[Dict[str, Any]]):
         return await self._execute_agent_with_args(agent_key, context, execution_log)
 
     async def _execute_agent_with_args(self, agent_key: str, context: AgentContext, execution_log: List[Dict[str, Any]], *args):
         agent = self.agents[agent_key]
+        degraded = agent_key in self.llm_agents and agent.use_fallback
         start_time = time.time() * 1000
         
         try:
-            if args:
-                result = await agent.execute(context, *args)
-            else:
-                result = await agent.execute(context)
+            with span(f"agent.{agent_key}", **{"agent.name": agent.name, "agent.degraded": degraded}):
+                if args:
+                    result = await agent.execute(context, *args)
+                else:
+                    result = await agent.execute(context)
                 
             execution_time = (time.time() * 1000) - start_time
+            record_span(agent.name, start_time, start_time + execution_time)
             
             log_entry = {
                 "name": agent.name,
@@ -143,16 +345,18 @@ class CoordinatorAgent:
                 "execution_time_ms": int(execution_time),
                 "key_findings": result.get("summary")
             }
+            if result.get("usage"):
+                log_entry["tokens"] = result["usage"]
+            if degraded:
+                log_entry["degraded"] = True
+            elif agent_key in self.llm_agents:
+                load_shedder.record_llm_latency(execution_time)
             execution_log.append(log_entry)
             
             await self._save_agent_execution(
                 context.complaint_id,
                 agent.name,
-                context.get_all(), # saving state *before*? No, usually after or input state. JS code saved "context.getAll()" as input data? 
-                # Re-reading JS: saveAgentExecution(id, name, context.getAll(), result, ...)
-                # It passed context.getAll() as "inputData". Since update happens *inside* execute, 
-                # context.getAll() at this point includes the updates. So it's actually output state + new updates.
-                # Just mirroring JS logic.
+                context.take_changes(), # only the fields this agent changed
                 result,
                 int(execution_time),
                 "success",
@@ -161,6 +365,7 @@ class CoordinatorAgent:
             return result
         except Exception as e:
             execution_time = (time.time() * 1000) - start_time
+            record_span(agent.name, start_time, start_time + execution_time)
             log_entry = {
                 "name": agent.name,
                 "status": "error",
@@ -172,7 +377,7 @@ class CoordinatorAgent:
             await self._save_agent_execution(
                 context.complaint_id,
                 agent.name,
-                context.get_all(),
+                context.take_changes(),
                 None,
                 int(execution_time),
                 "error",
@@ -191,19 +396,22 @@ class CoordinatorAgent:
                 highest_val = levels[sev]
         return highest
 
-    async def _save_agent_execution(self, complaint_id, agent_name, input_data, output_data, exec_time, status, error_msg):
+    async def _save_agent_execution(self, complaint_id, agent_name, context_delta, output_data, exec_time, status, error_msg):
+        if not self.persist:
+            return
         try:
             pool = await get_pool()
-            async with pool.acquire() as conn:
-                await conn.execute(
-                    """
-                    INSERT INTO agent_executions 
-                    (complaint_id, agent_name, input_data, output_data, execution_time_ms, status, error_message) 
-                    VALUES ($1, $2, $3, $4, $5, $6, $7)
-                    """,
-                    complaint_id, agent_name, json.dumps(input_data, default=str), 
-                    json.dumps(output_data, default=str), exec_time, status, error_msg
-                )
+            with span("coordinator.save_execution", **{"agent.name": agent_name}):
+                async with pool.acquire() as conn:
+                    await conn.execute(
+                        """
+                        INSERT INTO agent_executions 
+                        (complaint_id, agent_name, context_delta, output_data, execution_time_ms, status, error_message, trace_id) 
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                        """,
+                        complaint_id, agent_name, json.dumps(context_delta, default=str), 
+                        json.dumps(output_data, default=str), exec_time, status, error_msg, current_trace_id()
+                    )
         except Exception as e:
             print(f"Error saving execution trace: {e}")
 
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..db.connection import get_pool
+
+# Days of history used to fit the model
+HISTORY_DAYS = 90
+# Forecast horizon for expected volume / recurrence risk
+HORIZON_DAYS = 7
+# Exponential smoothing factor for the level
+ALPHA = 0.1
+# Pseudo-count that shrinks sparse weekday factors towards 1.0
+SEASONAL_PRIOR = 1.0
+
+# Severity elevation thresholds
+HIGH_RISK = 0.9
+HIGH_TREND_RATIO = 1.5
+MEDIUM_RISK = 0.6
+
+
+class RecurrenceForecaster:
+    """
+    Per-(ward, category) recurrence model fitted from daily complaint counts.
+
+    All series are held in one (n_series, HISTORY_DAYS) NumPy matrix and fitted
+    together: weekday seasonal factors, an exponentially smoothed level computed
+    as a single matrix-vector product, and a Poisson recurrence risk for the
+    next HORIZON_DAYS. Lookups after a fit are a dict access plus array indexing.
+    """
+    def __init__(self):
+        self.index: Dict[Tuple[int, str], int] = {}
+        self.keys: List[Tuple[int, str]] = []
+        self.expected = np.zeros(0)
+        self.risk = np.zeros(0)
+        self.trend_ratio = np.zeros(0)
+        self.baseline = np.zeros(0)
+        self.fitted_at: Optional[datetime] = None
+        self.fit_time_ms = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.fitted_at is not None
+
+    async def refresh(self) -> None:
+        """Reload daily counts from the database and refit every series."""
+        async with self._lock:
+            start = time.time() * 1000
+            today = datetime.now(timezone.utc).date()
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT ward_number, category,
+                           (created_at AT TIME ZONE 'UTC')::date AS day, COUNT(*) AS n
+                    FROM complaints
+                    WHERE created_at >= NOW() - make_interval(days => $1)
+                      AND ward_number IS NOT NULL AND category IS NOT NULL
+                    GROUP BY 1, 2, 3
+                    """,
+                    HISTORY_DAYS
+                )
+            self.fit(rows, today)
+            self.fit_time_ms = int(time.time() * 1000 - start)
+
+    def fit(self, rows, today: date) -> None:
+        """Fit all series from (ward_number, category, day, n) rows."""
+        keys = sorted({(r['ward_number'], r['category']) for r in rows})
+        index = {k: i for i, k in enumerate(keys)}
+        first_day = today - timedelta(days=HISTORY_DAYS - 1)
+
+        counts = np.zeros((len(keys), HISTORY_DAYS))
+        if rows:
+            series_idx = np.fromiter((index[(r['ward_number'], r['category'])] for r in rows), dtype=np.int64)
+            day_idx = np.fromiter(((r['day'] - first_day).days for r in rows), dtype=np.int64)
+            n = np.fromiter((r['n'] for r in rows), dtype=np.float64)
+            valid = (day_idx >= 0) & (day_idx < HISTORY_DAYS)
+            np.add.at(counts, (series_idx[valid], day_idx[valid]), n[valid])
+
+        # Weekday of every column (0 = Monday) and of the forecast days
+        weekdays = (np.arange(HISTORY_DAYS) + first_day.weekday()) % 7
+        future_weekdays = (np.arange(1, HORIZON_DAYS + 1) + today.weekday()) % 7
+
+        baseline = counts.mean(axis=1)
+
+        # Seasonal factor per (series, weekday), shrunk towards 1 for sparse series
+        weekday_onehot = np.eye(7)[weekdays]                      # (days, 7)
+        weekday_totals = counts @ weekday_onehot                  # (series, 7)
+        weekday_days = weekday_onehot.sum(axis=0)                 # (7,)
+        expected_totals = baseline[:, None] * weekday_days[None, :]
+        seasonal = (weekday_totals + SEASONAL_PRIOR) / (expected_totals + SEASONAL_PRIOR)
+
+        # Exponentially smoothed level of the deseasonalised series
+        deseasonalised = counts / seasonal[:, weekdays]
+        ages = np.arange(HISTORY_DAYS - 1, -1, -1)
+        weights = ALPHA * (1 - ALPHA) ** ages
+        weights[0] += (1 - ALPHA) ** HISTORY_DAYS  # initial level = first observation
+        level = deseasonalised @ weights
+
+        expected = level * seasonal[:, future_weekdays].sum(axis=1)
+
+        self.keys = keys
+        self.index = index
+        self.baseline = baseline
+        self.expected = expected
+        self.risk = 1.0 - np.exp(-expected)
+        self.trend_ratio = level / np.maximum(baseline, 1e-9)
+        self.fitted_at = datetime.now(timezone.utc)
+
+    def lookup(self, ward_number: Optional[int], category: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the forecast for one ward/category, or None if it has no history."""
+        i = self.index.get((ward_number, category))
+        if i is None:
+            return None
+        return self._row(i)
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Forecasts for every ward/category, highest risk first."""
+        order = np.argsort(-self.risk, kind='stable')
+        return [self._row(int(i)) for i in order]
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        ward_number, category = self.keys[i]
+        risk = float(self.risk[i])
+        ratio = float(self.trend_ratio[i])
+        return {
+            "ward_number": ward_number,
+            "category": category,
+            "expected_volume": round(float(self.expected[i]), 2),
+            "recurrence_risk": round(risk, 3),
+            "trend_ratio": round(ratio, 2),
+            "severity_elevation": severity_for(risk, ratio),
+        }
+
+
+def severity_for(risk: float, trend_ratio: float) -> Optional[str]:
+    if risk >= HIGH_RISK and trend_ratio >= HIGH_TREND_RATIO:
+        return 'High'
+    if risk >= MEDIUM_RISK:
+        return 'Medium'
+    return None
+
+
+# Process-wide model shared by the agent and the /forecast endpoint
+forecaster = RecurrenceForecaster()
+
+
+async def run_refresh_loop(interval_seconds: float) -> None:
+    """Refit the shared model every `interval_seconds` (runs as a background task)."""
+    while True:
+        try:
+            await forecaster.refresh()
+            print(f"📈 Recurrence model refreshed: {len(forecaster.keys)} series in {forecaster.fit_time_ms}ms")
+        except Exception as e:
+            print(f"Error refreshing recurrence model: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -1,9 +1,44 @@
 import json
 import math
-from typing import Dict, Any, List, Optional
-from shapely.geometry import Point, Polygon
+from typing import Dict, Any, List, Optional, Tuple
 from .context import AgentContext
 from ..db.connection import get_pool
+from ..geo.spatial import find_complaints_near
+from ..geo.zones import zone_registry
+
+# Radius used for "what else has been reported around here" lookups
+NEIGHBOURHOOD_RADIUS_M = 500
+
+FACILITIES = {
+    'hospitals': [
+        (17.4326, 78.4071, 'Apollo Hospital'),
+        (17.4400, 78.4500, 'Care Hospital'),
+        (17.4200, 78.3900, 'NIMS Hospital')
+    ],
+    'schools': [
+        (17.4350, 78.4080, 'Delhi Public School'),
+        (17.4300, 78.4100, 'Jubilee Hills Public School')
+    ],
+    'markets': [
+        (17.4300, 78.4050, 'Banjara Market'),
+        (17.4380, 78.4120, 'Road No 10 Market')
+    ]
+}
+# Degrees (~1 km) within which a facility counts as nearby
+FACILITY_THRESHOLD = 0.01
+
+
+def facilities_near(lat: Optional[float], lng: Optional[float]) -> List[Tuple[str, str]]:
+    """(facility type, name) for every facility within FACILITY_THRESHOLD of the point."""
+    if lat is None or lng is None:
+        return []
+    nearby = []
+    for type_, locations in FACILITIES.items():
+        for fac_lat, fac_lng, name in locations:
+            distance = math.sqrt((lat - fac_lat)**2 + (lng - fac_lng)**2)
+            if distance < FACILITY_THRESHOLD:
+                nearby.append((type_, name))
+    return nearby
 
 class GISIntelligenceAgent:
     """
@@ -11,7 +46,8 @@ class GISIntelligenceAgent:
     """
     def __init__(self):
         self.name = 'GISIntelligenceAgent'
-        self.zones_data = self._get_fallback_zone_data() # simplified to use fallback for portability
+        # When False, only in-memory data is used (offline evaluation)
+        self.use_database = True
 
     async def execute(self, context: AgentContext) -> Dict[str, Any]:
         lat = context.get('latitude')
@@ -27,11 +63,16 @@ class GISIntelligenceAgent:
             # Check historical issues
             historical_issues = await self._get_historical_issues(zone_info['ward_number'])
             
+            # Other complaints reported close to this point
+            nearby_complaints = await self._get_nearby_complaints(lat, lng, getattr(context, 'complaint_id', None))
+            
             await context.update(self.name, {
                 "zone_name": zone_info['zone_name'],
                 "ward_number": zone_info['ward_number'],
+                "zone_dataset_version": zone_info['dataset_version'],
                 "nearby_facilities": nearby_facilities,
-                "historical_issues": historical_issues
+                "historical_issues": historical_issues,
+                "nearby_complaints": nearby_complaints
             })
             
             facilities_str = ", ".join(nearby_facilities) if nearby_facilities else "No major facilities nearby"
@@ -45,69 +86,27 @@ class GISIntelligenceAgent:
             await context.update(self.name, {
                 "zone_name": "Central Zone",
                 "ward_number": 0,
+                "zone_dataset_version": None,
                 "nearby_facilities": [],
-                "historical_issues": []
+                "historical_issues": [],
+                "nearby_complaints": []
             })
             return {"summary": "Zone: Central Zone, Ward: Unknown (using fallback)"}
 
     async def _get_zone_info(self, lat: float, lng: float) -> Dict[str, Any]:
-        point = Point(lng, lat)
-        
-        # Check GeoJSON features (fallback data)
-        if self.zones_data and "features" in self.zones_data:
-            for feature in self.zones_data["features"]:
-                try:
-                    coords = feature["geometry"]["coordinates"][0] # Assuming simple polygon
-                    polygon = Polygon(coords)
-                    if polygon.contains(point):
-                        props = feature["properties"]
-                        return {
-                            "zone_name": props.get("zone_name"),
-                            "ward_number": props.get("ward_number") or (props.get("ward_numbers")[0] if props.get("ward_numbers") else 0)
-                        }
-                except Exception:
-                    continue
-        
-        # Try Database
-        try:
-            pool = await get_pool()
-            async with pool.acquire() as conn:
-                row = await conn.fetchrow('SELECT zone_name, ward_number FROM zones LIMIT 1') # Placeholder query logic
-                if row:
-                    return {"zone_name": row["zone_name"], "ward_number": row["ward_number"]}
-        except Exception:
-            pass
-            
-        return {"zone_name": "Central Zone", "ward_number": 0}
+        index = await zone_registry.get()
+        version = index.version if index else None
+        zone = index.lookup(lat, lng) if index and lat is not None and lng is not None else None
+        if zone is None:
+            return {"zone_name": "Central Zone", "ward_number": 0, "dataset_version": version}
+        return {"zone_name": zone["zone_name"], "ward_number": zone["ward_number"], "dataset_version": version}
 
     def _get_nearby_facilities(self, lat: float, lng: float) -> List[str]:
-        facilities = {
-            'hospitals': [
-                (17.4326, 78.4071, 'Apollo Hospital'),
-                (17.4400, 78.4500, 'Care Hospital'),
-                (17.4200, 78.3900, 'NIMS Hospital')
-            ],
-            'schools': [
-                (17.4350, 78.4080, 'Delhi Public School'),
-                (17.4300, 78.4100, 'Jubilee Hills Public School')
-            ],
-            'markets': [
-                (17.4300, 78.4050, 'Banjara Market'),
-                (17.4380, 78.4120, 'Road No 10 Market')
-            ]
-        }
-        
-        nearby = []
-        threshold = 0.01
-        
-        for type_, locations in facilities.items():
-            for fac_lat, fac_lng, name in locations:
-                distance = math.sqrt((lat - fac_lat)**2 + (lng - fac_lng)**2)
-                if distance < threshold:
-                    nearby.append(name)
-        return nearby
+        return [name for _, name in facilities_near(lat, lng)]
 
     async def _get_historical_issues(self, ward_number: int) -> List[str]:
+        if not self.use_database:
+            return []
         try:
             pool = await get_pool()
             async with pool.acquire() as conn:
@@ -126,49 +125,15 @@ class GISIntelligenceAgent:
         except Exception:
             return []
 
-    def _get_fallback_zone_data(self):
-        return {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "properties": { "zone_name": "Khairatabad Zone (Central)", "ward_number": 90 },
-                    "geometry": {
-                        "type": "Polygon", 
-                        "coordinates": [[[78.40, 17.35], [78.50, 17.35], [78.50, 17.45], [78.40, 17.45], [78.40, 17.35]]]
-                    }
-                },
-                {
-                    "type": "Feature",
-                    "properties": { "zone_name": "Secunderabad Zone (North)", "ward_number": 140 },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": [[[78.40, 17.45], [78.60, 17.45], [78.60, 17.60], [78.40, 17.60], [78.40, 17.45]]]
-                    }
-                },
-                {
-                    "type": "Feature",
-                    "properties": { "zone_name": "Charminar Zone (South)", "ward_number": 20 },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": [[[78.40, 17.20], [78.60, 17.20], [78.60, 17.35], [78.40, 17.35], [78.40, 17.20]]]
-                    }
-                },
-                {
-                    "type": "Feature",
-                    "properties": { "zone_name": "Serilingampally Zone (West)", "ward_number": 100 },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": [[[78.20, 17.20], [78.40, 17.20], [78.40, 17.60], [78.20, 17.60], [78.20, 17.20]]]
-                    }
-                },
-                {
-                    "type": "Feature",
-                    "properties": { "zone_name": "LB Nagar Zone (East)", "ward_number": 15 },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": [[[78.50, 17.20], [78.70, 17.20], [78.70, 17.45], [78.50, 17.45], [78.50, 17.20]]]
-                    }
-                }
-            ]
-        }
+    async def _get_nearby_complaints(self, lat: float, lng: float, complaint_id: Optional[int]) -> List[str]:
+        if lat is None or lng is None or not self.use_database:
+            return []
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                rows = await find_complaints_near(
+                    conn, lat, lng, NEIGHBOURHOOD_RADIUS_M, limit=5, exclude_id=complaint_id
+                )
+                return [f"{r['category'] or 'Unclassified'} ({r['status']}, {int(r['distance_m'])}m)" for r in rows]
+        except Exception:
+            return []
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+# Derivatives live under the uploads mount so they are served at /uploads/derived/...
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(UPLOAD_DIR, "derived"))
+IMAGE_CACHE_URL = "/uploads/derived"
+# Worker processes; kept below the core count so the API keeps a core to itself
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", max(1, min(2, (os.cpu_count() or 2) - 1))))
+# Images queued or in progress before new ones are turned away
+IMAGE_MAX_PENDING = int(os.getenv("IMAGE_MAX_PENDING", IMAGE_WORKERS * 4))
+IMAGE_TIMEOUT_SECONDS = float(os.getenv("IMAGE_TIMEOUT_SECONDS", 20))
+# Decompression-bomb guard: images with more pixels than this are rejected
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 40_000_000))
+
+THUMBNAIL_SIZE = 320
+MODEL_INPUT_SIZE = 512
+JPEG_QUALITY = 85
+# Bins per RGB channel in the colour histogram
+HISTOGRAM_BINS = 8
+# Mean luminance (0-1) below which a photo is probably taken at night
+DARK_BRIGHTNESS = 0.25
+# Bump when derivatives or features change, so cached results are recomputed
+FEATURES_VERSION = 1
+
+
+class ImageProcessorBusy(Exception):
+    """Too many images are already waiting for the pool."""
+
+
+def upload_path(image_url: Optional[str]) -> Optional[str]:
+    """Local file behind an /uploads URL, or None for anything else."""
+    if not image_url or not image_url.startswith("/uploads/"):
+        return None
+    name = os.path.basename(image_url)
+    path = os.path.join(UPLOAD_DIR, name)
+    return path if name and os.path.isfile(path) else None
+
+
+def hamming(a: str, b: str) -> int:
+    """Bit distance between two hex perceptual hashes."""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _difference_hash(gray) -> str:
+    """64-bit dHash: is each pixel brighter than its right-hand neighbour, on a 9x8 thumbnail."""
+    from PIL import Image
+    pixels = list(gray.resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{value:016x}"
+
+
+def _histogram(image) -> List[float]:
+    """Normalised HISTOGRAM_BINS-bin histogram per R, G, B channel (concatenated)."""
+    counts = image.histogram()
+    total = image.width * image.height
+    step = 256 // HISTOGRAM_BINS
+    bins = []
+    for channel in range(3):
+        channel_counts = counts[channel * 256:(channel + 1) * 256]
+        bins.extend(round(sum(channel_counts[i:i + step]) / total, 4) for i in range(0, 256, step))
+    return bins
+
+
+def _save_jpeg(image, path: str, size: int):
+    derivative = image.copy()
+    derivative.thumbnail((size, size))
+    # Re-encoded from pixels only: no EXIF (GPS, device) survives
+    derivative.save(path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+
+
+def preprocess_image(path: str, cache_dir: str) -> Dict[str, Any]:
+    """
+    Runs in a worker process. Derivatives and features for one upload,
+    cached by content hash so re-uploads and reprocessing cost one file read.
+    """
+    from PIL import Image, ImageOps, ImageStat
+    # Pillow only warns between this and twice it; the explicit check below rejects
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    entry_dir = os.path.join(cache_dir, digest[:2], digest)
+    meta_path = os.path.join(entry_dir, "meta.json")
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") == FEATURES_VERSION:
+            return dict(meta, cached=True)
+    except (OSError, ValueError):
+        pass
+
+    start = time.monotonic()
+    with Image.open(path) as original:
+        # The header is read by open(); nothing has been decoded yet
+        if original.width * original.height > IMAGE_MAX_PIXELS:
+            raise Image.DecompressionBombError(
+                f"{original.width}x{original.height} exceeds the {IMAGE_MAX_PIXELS} pixel limit"
+            )
+        exif = original.getexif()
+        had_exif = bool(exif)
+        has_gps = 0x8825 in exif  # GPSInfo IFD
+        image = ImageOps.exif_transpose(original).convert("RGB")
+        width, height = image.size
+
+    os.makedirs(entry_dir, exist_ok=True)
+    _save_jpeg(image, os.path.join(entry_dir, "thumb.jpg"), THUMBNAIL_SIZE)
+    _save_jpeg(image, os.path.join(entry_dir, "input.jpg"), MODEL_INPUT_SIZE)
+
+    model_input = image.copy()
+    model_input.thumbnail((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+    gray = model_input.convert("L")
+    stats = ImageStat.Stat(gray)
+    brightness = stats.mean[0] / 255
+    meta = {
+        "version": FEATURES_VERSION,
+        "sha256": digest,
+        "phash": _difference_hash(gray),
+        "width": width,
+        "height": height,
+        "had_exif": had_exif,
+        "had_gps": has_gps,
+        "brightness": round(brightness, 3),
+        "contrast": round(stats.stddev[0] / 255, 3),
+        "dark": brightness < DARK_BRIGHTNESS,
+        "histogram": _histogram(model_input),
+        "processing_ms": round((time.monotonic() - start) * 1000, 1),
+    }
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+    return dict(meta, cached=False)
+
+
+class ImageProcessor:
+    """
+    Bounded process pool for image preprocessing.
+
+    Decoding and resizing photos is CPU-bound and would stall the event loop,
+    so it runs in IMAGE_WORKERS spawned processes. At most IMAGE_MAX_PENDING
+    images wait or run at once; beyond that `process` raises
+    ImageProcessorBusy instead of queueing without limit.
+    """
+    def __init__(self, workers: int, max_pending: int, cache_dir: str, cache_url: str):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_dir = cache_dir
+        self.cache_url = cache_url
+        self.pending = 0
+        self.processed = 0
+        self.cache_hits = 0
+        self.rejected = 0
+        self.failures = 0
+        self.processing_ms = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the API process has threads (profiler, exporters)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def process(self, path: str) -> Dict[str, Any]:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ImageProcessorBusy(f"{self.pending} images already pending")
+        self.pending += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool(), preprocess_image, path, self.cache_dir
+            )
+        except BaseException:
+            self.pending -= 1
+            raise
+        # A timeout cannot stop the worker process, so the slot is only given
+        # back when the work itself finishes, not when the caller stops waiting
+        future.add_done_callback(self._finished)
+        try:
+            meta = await asyncio.wait_for(asyncio.shield(future), IMAGE_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            self.failures += 1
+            self._executor = None
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        if meta["cached"]:
+            self.cache_hits += 1
+        else:
+            self.processed += 1
+            self.processing_ms += meta["processing_ms"]
+        base = f"{self.cache_url}/{meta['sha256'][:2]}/{meta['sha256']}"
+        return dict(meta, thumbnail_url=f"{base}/thumb.jpg", model_input_url=f"{base}/input.jpg")
+
+    def _finished(self, future: asyncio.Future):
+        self.pending -= 1
+        if not future.cancelled():
+            # Retrieved here so an abandoned (timed-out) future does not log its error
+            future.exception()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "processed": self.processed,
+            "cache_hits": self.cache_hits,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "avg_processing_ms": round(self.processing_ms / self.processed, 1) if self.processed else None,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_processor = ImageProcessor(IMAGE_WORKERS, IMAGE_MAX_PENDING, IMAGE_CACHE_DIR, IMAGE_CACHE_URL)
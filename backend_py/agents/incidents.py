@@ -0,0 +1,377 @@
+"""
+Incident clustering: reports of the same problem (same category, close in
+space and time) are grouped into one incident, so routing and action
+planning run once per incident and later reports reuse the plan.
+
+IncidentClusterer assigns each complaint as it is processed, against a
+per-category grid of recent members kept in memory and synced from the
+database under an advisory lock (migration 0011).
+"""
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..db.connection import get_pool
+from ..geo.geohash import haversine_m
+
+INCIDENT_CLUSTERING = os.getenv("INCIDENT_CLUSTERING", "on").lower() not in ("0", "off", "false")
+# How long a report waits for its incident's first report to finish planning
+# before planning itself (the first report is usually mid-LLM-call)
+INCIDENT_PLAN_WAIT_SECONDS = float(os.getenv("INCIDENT_PLAN_WAIT_SECONDS", 20))
+PLAN_POLL_SECONDS = 0.5
+
+# (distance in metres, time window in hours) within which two reports of a
+# category are the same incident. INCIDENT_WINDOWS (JSON, e.g.
+# '{"Roads": [150, 72]}') overrides entries.
+CATEGORY_WINDOWS: Dict[str, Tuple[float, float]] = {
+    'Roads': (150, 72),
+    'Drainage': (300, 24),
+    'Water Supply': (400, 24),
+    'Sanitation': (100, 48),
+    'Streetlights': (200, 72),
+    'Emergency': (300, 6),
+}
+DEFAULT_WINDOW = (200, 24)
+
+
+def _window_overrides(raw: str) -> Dict[str, Tuple[float, float]]:
+    try:
+        overrides = json.loads(raw)
+        return {category: (float(distance), float(hours)) for category, (distance, hours) in overrides.items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"⚠️  Ignoring INCIDENT_WINDOWS ({raw!r}): {e}; using the default windows")
+        return {}
+
+
+CATEGORY_WINDOWS.update(_window_overrides(os.getenv("INCIDENT_WINDOWS", "{}")))
+# Categories that are never clustered (nothing to route)
+UNCLUSTERED = {None, 'Other'}
+
+# Context fields written by routing and action planning; stored on the
+# incident and copied onto every later member
+PLAN_FIELDS = (
+    'department', 'assigned_team', 'escalation_needed', 'routing_reasoning',
+    'action_plan', 'timeline', 'resources_needed', 'immediate_actions',
+)
+
+SEVERITY_RANK = {'Low': 1, 'Medium': 2, 'High': 3}
+# pg_advisory_xact_lock(key1, key2) namespace; key2 is the category's crc32
+INCIDENT_LOCK_ID = 4_207_312
+
+METRES_PER_DEGREE = 111_320.0
+
+# Memberships added (by any process) since a grid's watermark; also
+# EXPLAINed by db/plan_check.py
+SYNC_SQL = """
+SELECT c.id, c.incident_id, c.latitude, c.longitude, c.incident_seq,
+       EXTRACT(EPOCH FROM c.created_at) AS seen_at
+FROM complaints c JOIN incidents i ON i.id = c.incident_id
+WHERE c.incident_seq > $1 AND i.category = $2 AND c.latitude IS NOT NULL
+  AND c.created_at >= NOW() - make_interval(secs => $3)
+ORDER BY c.incident_seq
+"""
+
+
+def window_for(category: str) -> Tuple[float, float]:
+    return CATEGORY_WINDOWS.get(category, DEFAULT_WINDOW)
+
+
+def _lock_key(category: str) -> int:
+    key = zlib.crc32(category.encode())
+    return key - (1 << 32) if key >= (1 << 31) else key
+
+
+class Member:
+    __slots__ = ('complaint_id', 'incident_id', 'lat', 'lng', 'seen_at')
+
+    def __init__(self, complaint_id: int, incident_id: int, lat: float, lng: float, seen_at: float):
+        self.complaint_id = complaint_id
+        self.incident_id = incident_id
+        self.lat = lat
+        self.lng = lng
+        self.seen_at = seen_at
+
+
+class CategoryGrid:
+    """
+    Recent incident members of one category on a grid of `eps`-sized cells.
+
+    Rows are eps metres of latitude; within a row, cells are at least eps
+    metres of longitude wide at the row's poleward edge, so every point
+    within eps lies in the 3x3 block around a point's cell. Cells hold members
+    in arrival order and expired ones are dropped from the front whenever a
+    cell is visited, so lookups and inserts are amortized O(1).
+    """
+    def __init__(self, eps_m: float, window_s: float):
+        self.eps_m = eps_m
+        self.window_s = window_s
+        self._row_height = eps_m / METRES_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], deque] = defaultdict(deque)
+        self.members: Dict[int, Member] = {}
+        self.by_incident: Dict[int, set] = defaultdict(set)
+        # Highest incident_seq seen for this category (see IncidentClusterer._sync)
+        self.watermark = 0
+
+    def _cell_width(self, row: int) -> float:
+        poleward = max(abs(row), abs(row + 1)) * self._row_height
+        return self.eps_m / (METRES_PER_DEGREE * max(math.cos(math.radians(min(poleward, 89.0))), 1e-6))
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        row = math.floor(lat / self._row_height)
+        return row, math.floor(lng / self._cell_width(row))
+
+    def add(self, member: Member):
+        previous = self.members.get(member.complaint_id)
+        if previous is not None:
+            # Re-read after a merge elsewhere: only the incident changes
+            if previous.incident_id != member.incident_id:
+                self.by_incident[previous.incident_id].discard(previous)
+                previous.incident_id = member.incident_id
+                self.by_incident[member.incident_id].add(previous)
+            return
+        self.members[member.complaint_id] = member
+        self.by_incident[member.incident_id].add(member)
+        self.cells[self._cell(member.lat, member.lng)].append(member)
+
+    def _expire(self, cell: deque, cutoff: float):
+        while cell and cell[0].seen_at < cutoff:
+            member = cell.popleft()
+            if self.members.get(member.complaint_id) is member:
+                del self.members[member.complaint_id]
+                peers = self.by_incident[member.incident_id]
+                peers.discard(member)
+                if not peers:
+                    del self.by_incident[member.incident_id]
+
+    def neighbours(self, lat: float, lng: float, now: float) -> List[Tuple[float, Member]]:
+        """(distance, member) for members within eps and the time window."""
+        cutoff = now - self.window_s
+        row = math.floor(lat / self._row_height)
+        found = []
+        for r in (row - 1, row, row + 1):
+            col = math.floor(lng / self._cell_width(r))
+            for c in (col - 1, col, col + 1):
+                cell = self.cells.get((r, c))
+                if not cell:
+                    continue
+                self._expire(cell, cutoff)
+                if not cell:
+                    del self.cells[(r, c)]
+                    continue
+                for member in cell:
+                    if member.seen_at < cutoff:
+                        continue
+                    distance = haversine_m(lat, lng, member.lat, member.lng)
+                    if distance <= self.eps_m:
+                        found.append((distance, member))
+        return found
+
+    def merge(self, source_id: int, target_id: int):
+        members = self.by_incident.pop(source_id, set())
+        for member in members:
+            member.incident_id = target_id
+        self.by_incident[target_id] |= members
+
+
+class IncidentClusterer:
+    """
+    Incremental DBSCAN-style clustering of complaints into incidents.
+
+    A report joins the incident of any recent report of the same category
+    within that category's distance and time window. A report that bridges
+    two incidents merges them into the older one. With every report a core
+    point this is single-linkage DBSCAN, built up one point at a time.
+
+    Each process keeps its own grid. Assignments for a category are
+    serialized with a Postgres advisory lock, and under the lock the grid
+    first picks up memberships other processes (API, workers) committed since
+    its watermark, so all processes cluster consistently.
+    """
+    def __init__(self):
+        self.grids: Dict[str, CategoryGrid] = {}
+        self.opened = 0
+        self.joined = 0
+        self.merged = 0
+        self.plans_reused = 0
+
+    def _grid(self, category: str) -> CategoryGrid:
+        grid = self.grids.get(category)
+        if grid is None:
+            eps_m, window_h = window_for(category)
+            grid = self.grids[category] = CategoryGrid(eps_m, window_h * 3600)
+        return grid
+
+    async def _sync(self, conn, category: str, grid: CategoryGrid):
+        rows = await conn.fetch(SYNC_SQL, grid.watermark, category, grid.window_s)
+        for r in rows:
+            grid.add(Member(r['id'], r['incident_id'], r['latitude'], r['longitude'], float(r['seen_at'])))
+            grid.watermark = r['incident_seq']
+
+    async def assign(self, complaint_id: int, category: Optional[str], lat: Optional[float],
+                     lng: Optional[float], severity: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Attach the complaint to an incident, opening one if nothing is close.
+
+        Returns the incident row plus `role` ('opened', 'joined', or 'member'
+        when the complaint already belonged to it), or None if the complaint is
+        not clustered.
+        """
+        if not INCIDENT_CLUSTERING or category in UNCLUSTERED or lat is None or lng is None:
+            return None
+        grid = self._grid(category)
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    "SELECT incident_id, EXTRACT(EPOCH FROM created_at) AS created FROM complaints WHERE id = $1",
+                    complaint_id
+                )
+                if row is None:
+                    return None
+                if row['incident_id'] is not None:
+                    # Reprocessing: keep the existing membership
+                    incident = await conn.fetchrow("SELECT * FROM incidents WHERE id = $1", row['incident_id'])
+                    return dict(incident, role='member') if incident else None
+                created = float(row['created'])
+                if created < time.time() - grid.window_s:
+                    return None
+
+                await conn.execute("SELECT pg_advisory_xact_lock($1, $2)", INCIDENT_LOCK_ID, _lock_key(category))
+                await self._sync(conn, category, grid)
+                neighbours = grid.neighbours(lat, lng, time.time())
+                incident_ids = sorted({member.incident_id for _, member in neighbours})
+
+                if not incident_ids:
+                    incident = await conn.fetchrow(
+                        """
+                        INSERT INTO incidents (category, latitude, longitude, severity, first_seen, last_seen)
+                        VALUES ($1, $2, $3, $4, to_timestamp($5), NOW())
+                        RETURNING *
+                        """,
+                        category, lat, lng, severity, created
+                    )
+                    role, merged = 'opened', []
+                else:
+                    # Oldest incident survives; any others this report bridges fold into it
+                    target, merged = incident_ids[0], incident_ids[1:]
+                    if merged:
+                        await self._merge(conn, target, merged)
+                    incident = await conn.fetchrow(
+                        """
+                        UPDATE incidents
+                        SET member_count = member_count + 1,
+                            latitude = (latitude * member_count + $2) / (member_count + 1),
+                            longitude = (longitude * member_count + $3) / (member_count + 1),
+                            severity = CASE WHEN array_position($5::text[], $4::text)
+                                > COALESCE(array_position($5::text[], severity), 0) THEN $4 ELSE severity END,
+                            last_seen = NOW(), updated_at = NOW()
+                        WHERE id = $1
+                        RETURNING *
+                        """,
+                        target, lat, lng, severity, list(SEVERITY_RANK)
+                    )
+                    role = 'joined'
+
+                seq = await conn.fetchval(
+                    "UPDATE complaints SET incident_id = $1, incident_seq = nextval('complaint_incident_seq') "
+                    "WHERE id = $2 RETURNING incident_seq",
+                    incident['id'], complaint_id
+                )
+
+        # Committed: mirror it locally (nothing newer exists for this category yet)
+        for source in merged:
+            grid.merge(source, incident['id'])
+        grid.add(Member(complaint_id, incident['id'], lat, lng, created))
+        grid.watermark = max(grid.watermark, seq)
+        if role == 'opened':
+            self.opened += 1
+        else:
+            self.joined += 1
+            self.merged += len(merged)
+        return dict(incident, role=role)
+
+    async def _merge(self, conn, target: int, sources: List[int]):
+        moved = await conn.fetch(
+            "UPDATE complaints SET incident_id = $1, incident_seq = nextval('complaint_incident_seq') "
+            "WHERE incident_id = ANY($2::int[]) RETURNING latitude, longitude",
+            target, sources
+        )
+        await conn.execute(
+            "UPDATE incidents SET status = 'merged', merged_into = $1, member_count = 0, updated_at = NOW() "
+            "WHERE id = ANY($2::int[])",
+            target, sources
+        )
+        points = [(r['latitude'], r['longitude']) for r in moved if r['latitude'] is not None]
+        if points:
+            await conn.execute(
+                """
+                UPDATE incidents
+                SET latitude = (latitude * member_count + $2) / (member_count + $4),
+                    longitude = (longitude * member_count + $3) / (member_count + $4),
+                    member_count = member_count + $4,
+                    first_seen = LEAST(first_seen, (SELECT MIN(first_seen) FROM incidents WHERE id = ANY($5::int[])))
+                WHERE id = $1
+                """,
+                target, sum(p[0] for p in points), sum(p[1] for p in points), len(points), sources
+            )
+
+    async def wait_for_plan(self, incident_id: int) -> Optional[Dict[str, Any]]:
+        """The incident once it has a plan, following merges; None after INCIDENT_PLAN_WAIT_SECONDS."""
+        pool = await get_pool()
+        deadline = time.monotonic() + INCIDENT_PLAN_WAIT_SECONDS
+        while True:
+            async with pool.acquire() as conn:
+                incident = await conn.fetchrow("SELECT * FROM incidents WHERE id = $1", incident_id)
+            if incident is None:
+                return None
+            if incident['merged_into']:
+                incident_id = incident['merged_into']
+                continue
+            if incident['planned_at'] is not None or time.monotonic() >= deadline:
+                return dict(incident) if incident['planned_at'] is not None else None
+            await asyncio.sleep(PLAN_POLL_SECONDS)
+
+    async def save_plan(self, incident_id: int, complaint_id: int, context_data: Dict[str, Any]):
+        """Store this complaint's routing and action plan as the incident's."""
+        plan = {field: context_data.get(field) for field in PLAN_FIELDS}
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE incidents
+                SET plan = $2::jsonb, department = $3, planned_severity = $4, planned_by = $5,
+                    planned_at = NOW(), updated_at = NOW()
+                WHERE id = (SELECT COALESCE(merged_into, id) FROM incidents WHERE id = $1)
+                """,
+                incident_id, json.dumps(plan), plan['department'], context_data.get('severity'), complaint_id
+            )
+
+    def reuse_plan(self, incident: Dict[str, Any], severity: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The incident's plan if it covers this severity, as context updates; else None."""
+        if not incident.get('plan'):
+            return None
+        if SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(incident.get('planned_severity'), 0):
+            return None
+        plan = incident['plan']
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        self.plans_reused += 1
+        return {field: plan.get(field) for field in PLAN_FIELDS if plan.get(field) is not None}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": INCIDENT_CLUSTERING,
+            "opened": self.opened,
+            "joined": self.joined,
+            "merged": self.merged,
+            "plans_reused": self.plans_reused,
+            "tracked_members": {category: len(grid.members) for category, grid in self.grids.items()},
+        }
+
+
+incident_clusterer = IncidentClusterer()
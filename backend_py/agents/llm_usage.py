@@ -0,0 +1,62 @@
+from typing import Dict, Any, Optional
+
+from .prompts import BuiltPrompt, PromptTemplate, estimate_tokens
+
+
+class LLMUsageStats:
+    """
+    Process-wide token accounting per LLM agent.
+
+    Counts come from the response's `usage_metadata` when Gemini returns it
+    and from the prompt-size estimate otherwise; `estimated_calls` says how
+    many totals rest on estimates.
+    """
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, template: PromptTemplate, prompt: BuiltPrompt, response,
+               output_text: Optional[str] = None) -> Dict[str, Any]:
+        """Account one call; returns the usage to attach to the agent result."""
+        meta = getattr(response, 'usage_metadata', None)
+        input_tokens = getattr(meta, 'prompt_token_count', None) or None
+        output_tokens = getattr(meta, 'candidates_token_count', None) or None
+        estimated = input_tokens is None or output_tokens is None
+        if input_tokens is None:
+            input_tokens = prompt.estimated_tokens
+        if output_tokens is None:
+            output_tokens = estimate_tokens(output_text if output_text is not None else getattr(response, 'text', ''))
+
+        stats = self._agents.setdefault(template.agent_key, {
+            "calls": 0, "input_tokens": 0, "output_tokens": 0,
+            "estimated_calls": 0, "truncated_calls": 0,
+        })
+        stats["calls"] += 1
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["estimated_calls"] += estimated
+        stats["truncated_calls"] += bool(prompt.truncated)
+        stats["budget"] = template.budget
+        stats["prefix_tokens"] = template.prefix_tokens
+
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        if estimated:
+            usage["estimated"] = True
+        if prompt.truncated:
+            usage["truncated"] = list(prompt.truncated)
+        return usage
+
+    def snapshot(self) -> Dict[str, Any]:
+        agents = {}
+        for key, stats in self._agents.items():
+            calls = stats["calls"]
+            agents[key] = dict(stats,
+                               avg_input_tokens=round(stats["input_tokens"] / calls, 1),
+                               avg_output_tokens=round(stats["output_tokens"] / calls, 1))
+        return {
+            "agents": agents,
+            "total_input_tokens": sum(s["input_tokens"] for s in self._agents.values()),
+            "total_output_tokens": sum(s["output_tokens"] for s in self._agents.values()),
+        }
+
+
+llm_usage = LLMUsageStats()
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+from ..db.connection import get_pool
+
+# Agents switched to their rule-based fallback as pressure rises, in order
+SHED_ORDER = ('actionPlanning', 'routing', 'classification')
+
+# Leave a level only once every signal is below this fraction of its SLO
+RECOVER_RATIO = 0.7
+# Minimum time between shedding one more agent / restoring one
+STEP_SECONDS = 10.0
+RECOVER_SECONDS = 30.0
+# LLM latency samples older than this are ignored
+LATENCY_WINDOW_SECONDS = 60.0
+LATENCY_SAMPLES = 200
+
+
+class LoadShedder:
+    """
+    Adaptive controller that degrades LLM agents to their fallbacks under load.
+
+    Watches three signals: pipelines in flight, p95 LLM agent latency and
+    the time to acquire a pooled DB connection. While any of them breaches
+    its SLO, one more agent from SHED_ORDER is switched to `use_fallback`
+    every STEP_SECONDS. Agents are restored one at a time, in reverse order,
+    once every signal has stayed below RECOVER_RATIO of its SLO for
+    RECOVER_SECONDS.
+    """
+    def __init__(self, max_inflight: int, llm_p95_ms: float, pool_wait_ms: float):
+        self.slo = {"inflight": max_inflight, "llm_p95_ms": llm_p95_ms, "pool_wait_ms": pool_wait_ms}
+        self.level = 0
+        self.inflight = 0
+        self.pool_wait_ms = 0.0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._last_change = 0.0
+        self._last_breach = 0.0
+        self._coordinators = weakref.WeakSet()
+        self.transitions = 0
+
+    @property
+    def shed_agents(self) -> List[str]:
+        return list(SHED_ORDER[:self.level])
+
+    def register(self, coordinator):
+        """Track a coordinator so its agents follow the current level."""
+        self._coordinators.add(coordinator)
+        self._apply_to(coordinator)
+
+    def _apply_to(self, coordinator):
+        shed = set(self.shed_agents)
+        for key in SHED_ORDER:
+            if key in coordinator.llm_agents:
+                coordinator.agents[key].use_fallback = key in shed
+
+    @asynccontextmanager
+    async def track(self):
+        """Count a pipeline as in flight, including time spent queued for a slot."""
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+
+    def record_llm_latency(self, ms: float):
+        self._latencies.append((time.monotonic(), ms))
+
+    def llm_p95_ms(self) -> float:
+        cutoff = time.monotonic() - LATENCY_WINDOW_SECONDS
+        recent = sorted(ms for at, ms in self._latencies if at >= cutoff)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(0.95 * len(recent)))]
+
+    async def sample_pool_wait(self):
+        """Time one pool checkout; an exhausted pool counts as the time waited before giving up."""
+        pool = await get_pool()
+        start = time.monotonic()
+        try:
+            async with pool.acquire(timeout=self.slo["pool_wait_ms"] * 5 / 1000):
+                pass
+        except asyncio.TimeoutError:
+            pass
+        self.pool_wait_ms = (time.monotonic() - start) * 1000
+
+    def signals(self) -> Dict[str, float]:
+        return {"inflight": self.inflight, "llm_p95_ms": self.llm_p95_ms(), "pool_wait_ms": self.pool_wait_ms}
+
+    def evaluate(self, now: Optional[float] = None) -> int:
+        """Move at most one level based on the current signals; returns the level."""
+        now = time.monotonic() if now is None else now
+        signals = self.signals()
+        breached = any(signals[k] > self.slo[k] for k in self.slo)
+        relaxed = all(signals[k] <= self.slo[k] * RECOVER_RATIO for k in self.slo)
+
+        if breached:
+            self._last_breach = now
+
+        new_level = self.level
+        if breached and self.level < len(SHED_ORDER) and now - self._last_change >= STEP_SECONDS:
+            new_level = self.level + 1
+        elif (relaxed and self.level > 0 and now - self._last_breach >= RECOVER_SECONDS
+              and now - self._last_change >= RECOVER_SECONDS):
+            new_level = self.level - 1
+
+        if new_level != self.level:
+            print(f"{'⬇️' if new_level > self.level else '⬆️'}  Load shedding level {self.level} → {new_level} "
+                  f"(degraded: {', '.join(SHED_ORDER[:new_level]) or 'none'}; signals: "
+                  + ", ".join(f"{k}={v:.0f}" for k, v in signals.items()) + ")")
+            self.level = new_level
+            self._last_change = now
+            self.transitions += 1
+            for coordinator in list(self._coordinators):
+                self._apply_to(coordinator)
+        return self.level
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "level": self.level,
+            "degraded_agents": self.shed_agents,
+            "signals": {k: round(v, 1) for k, v in self.signals().items()},
+            "slo": self.slo,
+            "transitions": self.transitions,
+        }
+
+
+async def run_load_shedding_loop(interval_seconds: float = 2.0) -> None:
+    """Sample pool wait and re-evaluate the shedding level forever."""
+    while True:
+        try:
+            await load_shedder.sample_pool_wait()
+            load_shedder.evaluate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error evaluating load shedding: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+load_shedder = LoadShedder(
+    max_inflight=int(os.getenv("SHED_MAX_INFLIGHT", 16)),
+    llm_p95_ms=float(os.getenv("SHED_LLM_P95_MS", 8000)),
+    pool_wait_ms=float(os.getenv("SHED_POOL_WAIT_MS", 200)),
+)
@@ -1,7 +1,46 @@
 from .context import AgentContext
+from .forecasting import forecaster
 from typing import Dict, Any
 
+# Categories the coordinator runs the predictive agent for
+RECURRING_CATEGORIES = ['Sanitation', 'Roads', 'Water Supply', 'Drainage']
+
 class PredictiveAgent:
+    """
+    PredictiveAgent - Estimates recurrence risk for the complaint's ward/category
+
+    Reads a forecast from the shared, periodically refitted RecurrenceForecaster,
+    so per-complaint work is a constant-time lookup.
+    """
     name = "PredictiveAgent"
+
     async def execute(self, context: AgentContext) -> Dict[str, Any]:
-        return {"summary": "Predictive Agent Stub"}
+        if not forecaster.ready:
+            # First use in a process without the background refresh (CLI, scripts)
+            try:
+                await forecaster.refresh()
+            except Exception as e:
+                print(f"PredictiveAgent: recurrence model unavailable: {e}")
+
+        ward_number = context.get('ward_number')
+        category = context.get('category')
+        forecast = forecaster.lookup(ward_number, category)
+
+        if forecast is None:
+            await context.update(self.name, {
+                "recurrence_risk": 0.0,
+                "expected_volume": 0.0,
+                "severity_elevation": None
+            })
+            return {"summary": f"No recent {category} history in Ward {ward_number}"}
+
+        await context.update(self.name, {
+            "recurrence_risk": forecast['recurrence_risk'],
+            "expected_volume": forecast['expected_volume'],
+            "severity_elevation": forecast['severity_elevation']
+        })
+
+        elevation = forecast['severity_elevation'] or 'None'
+        return {
+            "summary": f"Recurrence risk: {forecast['recurrence_risk']:.0%}, Expected next 7 days: {forecast['expected_volume']}, Elevation: {elevation}"
+        }
@@ -0,0 +1,128 @@
+import os
+from typing import Dict, Any, List, Optional, Sequence
+
+# Rough Gemini tokenizer ratio for English/transliterated text; only used to
+# size prompts up front; the real counts come back with the response.
+CHARS_PER_TOKEN = 4
+# Free text never gets squeezed below this, whatever the other fields cost
+MIN_ELASTIC_TOKENS = 64
+# Cap for short scalar fields (category, ward, ...)
+SCALAR_MAX_TOKENS = 40
+OMISSION_MARKER = " … [{} chars omitted] … "
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_text(text: Optional[str], max_tokens: int) -> str:
+    """
+    Fit free text into `max_tokens`, keeping its opening and its end.
+
+    Complaints usually state the problem first and the location or a plea
+    last, so the middle goes. Cuts fall on word boundaries and the marker
+    says how much was dropped. Deterministic for a given input and budget.
+    """
+    text = " ".join((text or "").split())
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    keep = max(max_chars - len(OMISSION_MARKER.format(len(text))), 0)
+    head = text[:keep * 2 // 3].rsplit(" ", 1)[0]
+    tail = text[len(text) - (keep - len(head)):].split(" ", 1)[-1] if keep > len(head) else ""
+    omitted = len(text) - len(head) - len(tail)
+    return f"{head}{OMISSION_MARKER.format(omitted)}{tail}"
+
+
+def truncate_list(items: Optional[Sequence[Any]], max_tokens: int) -> str:
+    """Comma-join as many leading items as fit, noting how many were left out."""
+    items = [str(i) for i in items or []]
+    kept: List[str] = []
+    for index, item in enumerate(items):
+        if not kept:
+            item = truncate_text(item, max_tokens)
+        rest = len(items) - index - 1
+        suffix = f" (+{rest} more)" if rest else ""
+        if kept and estimate_tokens(", ".join(kept + [item]) + suffix) > max_tokens:
+            return ", ".join(kept) + f" (+{len(items) - index} more)"
+        kept.append(item)
+    return ", ".join(kept)
+
+
+class PromptField:
+    """
+    One per-call value in a prompt.
+
+    `kind` is 'scalar', 'list' or 'text'. The single elastic field (the
+    complaint text) gets whatever budget the prefix and other fields leave.
+    """
+    __slots__ = ('name', 'label', 'kind', 'max_tokens', 'elastic', 'empty')
+
+    def __init__(self, name: str, label: str, kind: str = 'scalar', max_tokens: int = SCALAR_MAX_TOKENS,
+                 elastic: bool = False, empty: str = 'None'):
+        self.name = name
+        self.label = label
+        self.kind = kind
+        self.max_tokens = max_tokens
+        self.elastic = elastic
+        self.empty = empty
+
+
+class BuiltPrompt:
+    __slots__ = ('text', 'estimated_tokens', 'truncated')
+
+    def __init__(self, text: str, estimated_tokens: int, truncated: List[str]):
+        self.text = text
+        self.estimated_tokens = estimated_tokens
+        self.truncated = truncated
+
+
+class PromptTemplate:
+    """
+    Static instructions followed by the per-call context, within a token budget.
+
+    The prefix (role, rules, output format) is rendered and measured once per
+    process. Putting it first, ahead of anything that varies, also makes
+    every call for an agent share the same leading tokens.
+    """
+    def __init__(self, agent_key: str, prefix: str, fields: Sequence[PromptField], budget: int):
+        self.agent_key = agent_key
+        self.prefix = prefix.strip() + "\n\n"
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.fields = list(fields)
+        env_key = "PROMPT_BUDGET_" + "".join("_" + c if c.isupper() else c.upper() for c in agent_key)
+        self.budget = int(os.getenv(env_key, budget))
+
+    def render(self, **values: Any) -> BuiltPrompt:
+        truncated: List[str] = []
+        lines: Dict[str, str] = {}
+        used = self.prefix_tokens
+        for field in self.fields:
+            if field.elastic:
+                continue
+            lines[field.name] = self._line(field, values.get(field.name), field.max_tokens, truncated)
+            used += estimate_tokens(lines[field.name]) + 1
+        for field in self.fields:
+            if field.elastic:
+                remaining = max(self.budget - used, MIN_ELASTIC_TOKENS)
+                lines[field.name] = self._line(field, values.get(field.name), remaining, truncated)
+                used += estimate_tokens(lines[field.name]) + 1
+        text = self.prefix + "\n".join(lines[f.name] for f in self.fields)
+        return BuiltPrompt(text, estimate_tokens(text), truncated)
+
+    @staticmethod
+    def _render(field: PromptField, value: Any, max_tokens: int) -> str:
+        budget = max(max_tokens - estimate_tokens(field.label) - 2, 1)
+        if field.kind == 'list':
+            return truncate_list(value, budget) if value else field.empty
+        if value is None or value == "":
+            return field.empty
+        rendered = truncate_text(str(value), budget)
+        return f'"{rendered}"' if field.kind == 'text' else rendered
+
+    @classmethod
+    def _line(cls, field: PromptField, value: Any, max_tokens: int, truncated: List[str]) -> str:
+        rendered = cls._render(field, value, max_tokens)
+        if rendered != cls._render(field, value, 1 << 30):
+            truncated.append(field.name)
+        return f"{field.label}: {rendered}"
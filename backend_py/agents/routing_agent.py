@@ -1,9 +1,37 @@
 import os
-import json
-import re
 import google.generativeai as genai
 from typing import Dict, Any
 from .context import AgentContext
+from .prompts import PromptTemplate, PromptField
+from .llm_usage import llm_usage
+from .streaming import generate_json
+
+PROMPT = PromptTemplate('routing', """
+You are a Routing Agent responsible for assigning civic complaints.
+
+Available departments:
+- GHMC Sanitation
+- GHMC Roads
+- GHMC Electrical
+- GHMC Water Works
+- GHMC Engineering
+
+Respond ONLY with valid JSON:
+{
+  "department": "department name",
+  "assigned_team": "specific team or role",
+  "escalation_needed": true/false,
+  "reasoning": "brief explanation"
+}
+
+Context:
+""", [
+    PromptField('category', '- Category'),
+    PromptField('severity', '- Severity'),
+    PromptField('ward_number', '- Ward'),
+    PromptField('impact_scope', '- Impact scope'),
+], budget=350)
+
 
 class RoutingAgent:
     """RoutingAgent - Assigns complaints to appropriate departments and teams"""
@@ -27,31 +55,12 @@ class RoutingAgent:
             return await self._fallback_execution(context, category, severity, ward_number)
             
         try:
-            prompt = f"""You are a Routing Agent responsible for assigning civic complaints.
-
-Context:
-- Category: {category}
-- Severity: {severity}
-- Ward: {ward_number}
-- Impact scope: {impact_scope}
-
-Available departments:
-- GHMC Sanitation
-- GHMC Roads
-- GHMC Electrical
-- GHMC Water Works
-- GHMC Engineering
-
-Respond ONLY with valid JSON:
-{{
-  "department": "department name",
-  "assigned_team": "specific team or role",
-  "escalation_needed": true/false,
-  "reasoning": "brief explanation"
-}}"""
-
-            response = await self.model.generate_content_async(prompt)
-            parsed = self._parse_json(response.text)
+            prompt = PROMPT.render(
+                category=category, severity=severity, ward_number=ward_number, impact_scope=impact_scope
+            )
+            streamed = await generate_json(self.model, prompt.text)
+            usage = llm_usage.record(PROMPT, prompt, streamed.response, streamed.text)
+            parsed = streamed.data
             
             await context.update(self.name, {
                 "department": parsed.get("department"),
@@ -61,7 +70,8 @@ Respond ONLY with valid JSON:
             })
             
             return {
-                "summary": f"Department: {parsed.get('department')}, Team: {parsed.get('assigned_team')}"
+                "summary": f"Department: {parsed.get('department')}, Team: {parsed.get('assigned_team')}",
+                "usage": usage
             }
             
         except Exception:
@@ -91,10 +101,3 @@ Respond ONLY with valid JSON:
             "routing_reasoning": "Fallback Logic"
         })
         return {"summary": f"Department: {department}, Team: {team} (Fallback)"}
-
-    def _parse_json(self, text):
-        try:
-            cleaned = re.sub(r'```json\n?|```\n?', '', text).strip()
-            return json.loads(cleaned)
-        except Exception:
-            return {}
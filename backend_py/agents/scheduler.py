@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+import os
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+from .understanding_agent import URGENCY_KEYWORDS
+from .gis_agent import facilities_near
+
+# Priority levels, most urgent first; the index is what gets stored and sorted
+PRIORITIES = ('emergency', 'elevated', 'routine')
+EMERGENCY, ELEVATED, ROUTINE = range(len(PRIORITIES))
+
+# Urgency keywords that signal a threat to life or property
+LIFE_SAFETY_KEYWORDS = frozenset({'accident', 'dead', 'death', 'injury', 'injured', 'fire',
+                                  'explosion', 'danger', 'hazard', 'emergency'}) & frozenset(URGENCY_KEYWORDS)
+# Whole words only ("deadline" is not "dead", "fired" is not "fire"); plurals count
+_KEYWORD_RE = re.compile(r"\b(" + "|".join(map(re.escape, URGENCY_KEYWORDS)) + r")s?\b")
+# Facility types whose neighbourhood raises the priority
+SENSITIVE_FACILITIES = frozenset({'hospitals', 'schools'})
+
+LIFE_SAFETY_WEIGHT = 3
+URGENCY_WEIGHT = 1
+FACILITY_WEIGHT = 1
+EMERGENCY_SCORE = 3
+ELEVATED_SCORE = 1
+
+# A waiting job gains one priority level per AGING_SECONDS
+DEFAULT_AGING_SECONDS = 30.0
+WAIT_SAMPLES = 1000
+
+
+def pre_score(text: Optional[str], lat: Optional[float] = None, lng: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Cheap priority estimate computed before any agent runs.
+
+    Uses the same urgency keywords as UnderstandingAgent's rule-based path and
+    the same facility list as the GIS agent, so it costs one regex scan and
+    a handful of distance checks.
+    """
+    found = set(_KEYWORD_RE.findall((text or "").lower()))
+    score = 0
+    reasons: List[str] = []
+    for keyword in URGENCY_KEYWORDS:
+        if keyword in found:
+            score += LIFE_SAFETY_WEIGHT if keyword in LIFE_SAFETY_KEYWORDS else URGENCY_WEIGHT
+            reasons.append(keyword)
+    sensitive = [name for type_, name in facilities_near(lat, lng) if type_ in SENSITIVE_FACILITIES]
+    if sensitive:
+        score += FACILITY_WEIGHT
+        reasons.append(f"near {sensitive[0]}")
+
+    if score >= EMERGENCY_SCORE:
+        level = EMERGENCY
+    elif score >= ELEVATED_SCORE:
+        level = ELEVATED
+    else:
+        level = ROUTINE
+    return {"priority": level, "label": PRIORITIES[level], "score": score, "reasons": reasons}
+
+
+class WaitStats:
+    """Rolling queue-wait samples per priority level."""
+    def __init__(self, samples: int = WAIT_SAMPLES):
+        self._waits = {level: deque(maxlen=samples) for level in range(len(PRIORITIES))}
+        self._counts = {level: 0 for level in range(len(PRIORITIES))}
+
+    def record(self, priority: int, wait_ms: float):
+        self._waits[priority].append(wait_ms)
+        self._counts[priority] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        result = {}
+        for level, waits in self._waits.items():
+            ordered = sorted(waits)
+            result[PRIORITIES[level]] = {
+                "count": self._counts[level],
+                "p50_ms": _percentile(ordered, 0.50),
+                "p95_ms": _percentile(ordered, 0.95),
+                "max_ms": round(ordered[-1], 1) if ordered else None,
+            }
+        return result
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+class PriorityScheduler:
+    """
+    Admission control in front of the coordinator pipeline.
+
+    At most `concurrency` pipelines run at once and `reserved` of those slots
+    are kept for emergencies. Waiters are dispatched by effective priority,
+    which improves by one level every `aging_seconds` so routine work still
+    gets through under sustained emergency load.
+    """
+    def __init__(self, concurrency: int, reserved: int, aging_seconds: float = DEFAULT_AGING_SECONDS):
+        if reserved >= concurrency:
+            raise ValueError("reserved slots must leave room for non-emergency work")
+        self.concurrency = concurrency
+        self.reserved = reserved
+        self.aging_seconds = aging_seconds
+        self.running = 0
+        self.running_general = 0
+        self._waiters: List[Tuple[int, float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.wait_stats = WaitStats()
+
+    def _effective(self, priority: int, enqueued: float, now: float) -> int:
+        return max(priority - int((now - enqueued) / self.aging_seconds), 0)
+
+    def _can_start(self, priority: int) -> bool:
+        if self.running >= self.concurrency:
+            return False
+        return priority == EMERGENCY or self.running_general < self.concurrency - self.reserved
+
+    def _start(self, priority: int):
+        self.running += 1
+        if priority != EMERGENCY:
+            self.running_general += 1
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._waiters:
+            candidates = [w for w in self._waiters if not w[3].done() and self._can_start(w[0])]
+            if not candidates:
+                break
+            chosen = min(candidates, key=lambda w: (self._effective(w[0], w[1], now), w[1], w[2]))
+            self._waiters.remove(chosen)
+            self._start(chosen[0])
+            chosen[3].set_result(None)
+        self._waiters = [w for w in self._waiters if not w[3].done()]
+
+    async def acquire(self, priority: int) -> float:
+        """Wait for a slot; returns the time spent queued in milliseconds."""
+        enqueued = time.monotonic()
+        if not self._waiters and self._can_start(priority):
+            self._start(priority)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            waiter = (priority, enqueued, next(self._seq), future)
+            self._waiters.append(waiter)
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release(priority)
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        wait_ms = (time.monotonic() - enqueued) * 1000
+        self.wait_stats.record(priority, wait_ms)
+        return wait_ms
+
+    def release(self, priority: int):
+        self.running -= 1
+        if priority != EMERGENCY:
+            self.running_general -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        wait_ms = await self.acquire(priority)
+        try:
+            yield wait_ms
+        finally:
+            self.release(priority)
+
+    def snapshot(self) -> Dict[str, Any]:
+        queued = {label: 0 for label in PRIORITIES}
+        for priority, *_ in self._waiters:
+            queued[PRIORITIES[priority]] += 1
+        return {
+            "concurrency": self.concurrency,
+            "reserved_for_emergency": self.reserved,
+            "running": self.running,
+            "queued": queued,
+            "wait_ms": self.wait_stats.summary(),
+        }
+
+
+# Shared by every request in the API process
+pipeline_scheduler = PriorityScheduler(
+    concurrency=int(os.getenv("PIPELINE_CONCURRENCY", 8)),
+    reserved=int(os.getenv("PIPELINE_RESERVED_EMERGENCY", 2)),
+    aging_seconds=float(os.getenv("PIPELINE_AGING_SECONDS", DEFAULT_AGING_SECONDS)),
+)
@@ -1,7 +1,215 @@
+import math
+import re
 from .context import AgentContext
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+# ----------------------------------------------------------------------
+# Lexicon
+# ----------------------------------------------------------------------
+# Weights > 0 signal distress, weights < 0 signal calm/satisfaction.
+# Covers English plus the transliterated Hindi and Telugu citizens write.
+DISTRESS_TERMS = {
+    # English
+    'emergency': 3.0, 'urgent': 2.0, 'urgently': 2.0, 'immediately': 1.5, 'asap': 1.5,
+    'danger': 2.5, 'dangerous': 2.5, 'hazard': 2.0, 'risk': 1.5, 'unsafe': 2.0,
+    'dead': 3.0, 'died': 3.0, 'death': 3.0, 'injured': 3.0, 'injury': 2.5, 'accident': 2.5,
+    'fire': 3.0, 'collapse': 2.5, 'collapsed': 2.5, 'electrocution': 3.0, 'flood': 2.0, 'flooded': 2.0,
+    'sick': 2.0, 'ill': 1.5, 'disease': 2.0, 'dengue': 2.5, 'malaria': 2.5, 'mosquitoes': 1.0,
+    'children': 1.0, 'kids': 1.0, 'elderly': 1.0, 'patients': 1.0,
+    'unbearable': 2.0, 'bad': 1.0, 'terrible': 1.5, 'horrible': 1.5, 'worst': 1.5, 'pathetic': 1.5,
+    'suffering': 2.0, 'helpless': 2.0, 'desperate': 2.0, 'scared': 1.5, 'afraid': 1.5,
+    'stink': 1.0, 'stinking': 1.0, 'smell': 0.5, 'foul': 1.0,
+    'frustrated': 1.5, 'angry': 1.5, 'ignored': 1.5, 'nobody': 1.0, 'again': 0.5, 'still': 0.5,
+    'help': 1.0, 'please': 0.5,
+    # Hindi (transliterated)
+    'khatra': 2.5, 'khatarnak': 2.5, 'maut': 3.0, 'mar': 1.5, 'ghayal': 3.0, 'aag': 3.0,
+    'bimari': 2.0, 'bimar': 2.0, 'pareshan': 1.5, 'pareshani': 1.5, 'gandagi': 1.0,
+    'badbu': 1.0, 'bachao': 2.5, 'madad': 1.0, 'jaldi': 1.5, 'turant': 2.0, 'bachche': 1.0,
+    'dubara': 0.5, 'phir': 0.5,
+    # Telugu (transliterated)
+    'pramadam': 2.5, 'aapada': 2.5, 'chavu': 3.0, 'chanipoyaru': 3.0, 'gaayam': 2.5,
+    'jabbu': 2.0, 'rogalu': 2.0, 'ibbandi': 1.5, 'kampu': 1.0, 'durvasana': 1.0,
+    'tondaraga': 1.5, 'ventane': 2.0, 'pillalu': 1.0, 'sahayam': 1.0, 'malli': 0.5,
+    # Calm / satisfied
+    'thanks': -1.0, 'thank': -1.0, 'resolved': -1.5, 'fixed': -1.5, 'good': -0.5,
+    'appreciate': -1.0, 'minor': -1.0, 'small': -0.5, 'slight': -0.5, 'dhanyavaad': -1.0,
+    'shukriya': -1.0, 'dhanyavadalu': -1.0, 'theek': -0.5, 'baagundi': -0.5,
+}
+
+# Two-word phrases, matched before single tokens
+DISTRESS_PHRASES = {
+    ('no', 'water'): 2.0, ('no', 'electricity'): 1.5, ('no', 'response'): 1.5, ('no', 'action'): 1.5,
+    ('fed', 'up'): 1.5, ('many', 'days'): 1.0, ('for', 'weeks'): 1.5, ('for', 'months'): 2.0,
+    ('paani', 'nahi'): 2.0, ('koi', 'sunta'): 1.5, ('kai', 'din'): 1.0,
+    ('neeru', 'ledu'): 2.0, ('neellu', 'ledu'): 2.0, ('chala', 'rojulu'): 1.0, ('evaru', 'pattinchukovadam'): 1.5,
+}
+
+# Negators that flip the word right after them ("not fixed"; "not working, dangerous"
+# leaves "dangerous" alone) ...
+PREFIX_NEGATORS = frozenset({'not', 'no', 'never', 'nothing', 'without', "isn't", "wasn't", "don't",
+                             "didn't", "hasn't", "haven't", 'isnt', 'dont', 'didnt', 'mat', 'na'})
+# ... and the postfix negators of Hindi/Telugu that flip the previous one ("theek nahi")
+POSTFIX_NEGATORS = frozenset({'nahi', 'nahin', 'nhi', 'ledu', 'kaadu', 'kadu', 'leda', 'ledhu'})
+# Most tokens a postfix negator may follow its term by
+NEGATION_WINDOW = 3
+# Words a prefix negator reaches across ("not a good road")
+NEGATION_SKIP = frozenset({'a', 'an', 'the'})
+
+INTENSIFIERS = {
+    'very': 1.5, 'extremely': 2.0, 'really': 1.3, 'totally': 1.5, 'completely': 1.5, 'so': 1.3,
+    'too': 1.3, 'highly': 1.5, 'severely': 2.0,
+    'bahut': 1.5, 'bohot': 1.5, 'bahot': 1.5, 'ekdum': 1.5, 'bilkul': 1.5,
+    'chala': 1.5, 'marii': 1.5, 'baaga': 1.3, 'chaala': 1.5,
+}
+
+# Distress score (0..1) at which severity is adjusted
+HIGH_DISTRESS = 0.8
+MEDIUM_DISTRESS = 0.5
+# Raw score giving a distress of 1 - 1/e
+DISTRESS_SCALE = 3.0
+
+# Punctuation is kept as tokens: it ends negation and phrases at clause boundaries
+_TOKEN_RE = re.compile(r"[a-z']+|[!?.,;:]")
+_PUNCTUATION = frozenset('!?.,;:')
+
+
+def _compile_lexicon() -> Dict[str, float]:
+    """Merge single terms and phrases into one dict keyed by token or 'a b'."""
+    compiled = dict(DISTRESS_TERMS)
+    for (a, b), weight in DISTRESS_PHRASES.items():
+        compiled[f"{a} {b}"] = weight
+    return compiled
+
+_LEXICON = _compile_lexicon()
+_PHRASE_HEADS = frozenset(a for a, _ in DISTRESS_PHRASES)
+
+
+def score_text(text: Optional[str]) -> Dict[str, Any]:
+    """
+    Score the distress expressed in a complaint.
+
+    Single pass over the tokens with O(1) lexicon lookups; a negator flips the
+    sign of the word next to it (within its clause) and intensifiers scale the
+    next one.
+    """
+    raw_text = text or ''
+    tokens = _TOKEN_RE.findall(raw_text.lower())
+    exclamations = tokens.count('!')
+    caps_words = sum(1 for w in raw_text.split() if len(w) > 2 and w.isupper())
+
+    total = 0.0
+    terms: List[str] = []
+    negate = False
+    boost = 1.0
+    last: Optional[Tuple[float, int, int]] = None  # (signed contribution, index in terms, token position)
+
+    i = 0
+    n = len(tokens)
+    while i < n:
+        tok = tokens[i]
+        if tok in _PUNCTUATION:
+            negate = False
+            boost = 1.0
+            last = None
+            i += 1
+            continue
+
+        weight = None
+        term = tok
+        if tok in _PHRASE_HEADS and i + 1 < n:
+            phrase = f"{tok} {tokens[i + 1]}"
+            weight = _LEXICON.get(phrase)
+            if weight is not None:
+                term = phrase
+                i += 1
+        if weight is None and tok in POSTFIX_NEGATORS:
+            if last is not None and i - last[2] <= NEGATION_WINDOW:
+                contribution, idx, _ = last
+                total -= 2 * contribution
+                terms[idx] = f"{terms[idx]} ({tok})"
+                last = None
+            i += 1
+            continue
+        if weight is None and tok in PREFIX_NEGATORS:
+            negate = True
+            i += 1
+            continue
+        if weight is None and tok in INTENSIFIERS:
+            boost *= INTENSIFIERS[tok]
+            i += 1
+            continue
+        if weight is None:
+            weight = _LEXICON.get(tok)
+
+        if weight is not None:
+            contribution = weight * boost
+            if negate:
+                contribution = -contribution
+                term = f"not {term}"
+                negate = False
+            total += contribution
+            terms.append(term)
+            last = (contribution, len(terms) - 1, i)
+            boost = 1.0
+        elif tok not in NEGATION_SKIP:
+            # Negators and intensifiers only reach the word right after them
+            boost = 1.0
+            negate = False
+        i += 1
+
+    # Shouting raises intensity but never creates distress on its own
+    if total > 0:
+        total *= 1.0 + 0.1 * min(exclamations + caps_words, 5)
+
+    distress = 1.0 - math.exp(-max(total, 0.0) / DISTRESS_SCALE)
+    if total > 0.5:
+        sentiment = 'negative'
+    elif total < -0.5:
+        sentiment = 'positive'
+    else:
+        sentiment = 'neutral'
+
+    return {
+        "sentiment": sentiment,
+        "distress_score": round(distress, 3),
+        "raw_score": round(total, 2),
+        "distress_terms": terms,
+        "severity_adjustment": severity_for_distress(distress),
+    }
+
+
+def score_batch(texts: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """Score many texts (historical backfills); same output as score_text."""
+    return [score_text(t) for t in texts]
+
+
+def severity_for_distress(distress: float) -> Optional[str]:
+    if distress >= HIGH_DISTRESS:
+        return 'High'
+    if distress >= MEDIUM_DISTRESS:
+        return 'Medium'
+    return None
+
 
 class SentimentAgent:
+    """
+    SentimentAgent - Local lexicon-based sentiment and distress scoring
+
+    No LLM call: scores English and transliterated Hindi/Telugu text in a
+    single pass and raises severity via `severity_adjustment` when distress is high.
+    """
     name = "SentimentToneAgent"
+
     async def execute(self, context: AgentContext) -> Dict[str, Any]:
-        return {"summary": "Sentiment Agent Stub"}
+        result = score_text(context.get('original_text'))
+
+        await context.update(self.name, {
+            "sentiment": result['sentiment'],
+            "distress_score": result['distress_score'],
+            "severity_adjustment": result['severity_adjustment']
+        })
+
+        return {
+            "summary": f"Sentiment: {result['sentiment']}, Distress: {result['distress_score']:.2f}, Adjustment: {result['severity_adjustment'] or 'None'}"
+        }
+
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, Optional
+
+from .context import AgentContext
+from .predictive_agent import RECURRING_CATEGORIES
+from ..profiling import record_span
+from ..tracing import span
+
+# Agents that may run ahead of the LLM classification, in pipeline order
+SPECULATIVE_AGENTS = ('routing', 'actionPlanning')
+
+# Context fields each speculative agent reads. Its output is committed only if
+# these hold the same values in the real context when its turn comes.
+# impact_scope is deliberately left out of routing: the rule-based classifier
+# always answers 'Street', so requiring it would make nearly every run a miss.
+SPECULATION_INPUTS = {
+    'routing': ('category', 'severity', 'ward_number'),
+    'actionPlanning': ('category', 'severity', 'department', 'issue_type', 'nearby_facilities'),
+}
+
+# Classification fields that must agree for the speculation to count as a hit
+AGREEMENT_FIELDS = ('category', 'severity')
+
+
+class SpeculativeStep:
+    """Output of one agent run on the forked context, waiting to be committed."""
+    __slots__ = ('agent_key', 'inputs', 'delta', 'result', 'execution_time_ms', 'degraded')
+
+    def __init__(self, agent_key, inputs, delta, result, execution_time_ms, degraded):
+        self.agent_key = agent_key
+        self.inputs = inputs
+        self.delta = delta
+        self.result = result
+        self.execution_time_ms = execution_time_ms
+        self.degraded = degraded
+
+    def matches(self, context: AgentContext) -> bool:
+        return all(context.get(key) == value for key, value in self.inputs.items())
+
+
+class Speculation:
+    """
+    Routing and action planning run on a forked context seeded with the
+    rule-based classification while the LLM classification is in flight.
+
+    The coordinator calls `resolve()` once the real classification is in:
+    on disagreement the background task is cancelled and everything is
+    discarded. On agreement, `take()` hands out each step whose inputs still
+    match the real context; anything else is re-run the normal way.
+    """
+    def __init__(self, coordinator, fork: AgentContext, provisional: Dict[str, Any]):
+        self.coordinator = coordinator
+        self.fork = fork
+        self.provisional = provisional
+        self.steps: Dict[str, SpeculativeStep] = {}
+        self.hit: Optional[bool] = None
+        self.wait_ms = 0.0
+        # Committed agent key -> its speculative execution time
+        self.committed: Dict[str, int] = {}
+        self.discarded = 0
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        coordinator, fork = self.coordinator, self.fork
+        category = fork.get('category')
+        if category and category != 'Other':
+            await self._step('routing')
+
+        # Mirror the coordinator's severity decision so action planning sees
+        # the same final severity. Both agents are local and cheap; their
+        # output here is scratch and never committed.
+        await coordinator.agents['sentiment'].execute(fork)
+        if category in RECURRING_CATEGORIES:
+            await coordinator.agents['predictive'].execute(fork)
+        severity = fork.get('severity')
+        final_severity = coordinator._get_highest_severity(
+            [severity, fork.get('severity_elevation'), fork.get('severity_adjustment')]
+        )
+        if final_severity != severity:
+            await fork.update(coordinator.name, {'severity': final_severity})
+        fork.take_changes()
+
+        if final_severity in ['Medium', 'High']:
+            await self._step('actionPlanning')
+
+    async def _step(self, agent_key: str):
+        agent = self.coordinator.agents[agent_key]
+        degraded = agent_key in self.coordinator.llm_agents and agent.use_fallback
+        inputs = {key: self.fork.get(key) for key in SPECULATION_INPUTS[agent_key]}
+        start_time = time.time() * 1000
+        try:
+            with span(f"speculation.{agent_key}", **{"agent.name": agent.name}):
+                result = await agent.execute(self.fork)
+        except Exception as e:
+            # The real pipeline re-runs the agent and reports the error there
+            print(f"  ⚠️  Speculative {agent.name} failed: {e}")
+            self.fork.take_changes()
+            return
+        end_time = time.time() * 1000
+        record_span(f"{agent.name} (speculative)", start_time, end_time)
+        self.steps[agent_key] = SpeculativeStep(
+            agent_key, inputs, self.fork.take_changes(), result,
+            int(end_time - start_time), degraded
+        )
+
+    def resolve(self, context: AgentContext) -> bool:
+        """Compare the real classification (or, while it streams, the one
+        proposed so far) with the provisional one."""
+        self.hit = all(context.peek(key) == self.provisional.get(key) for key in AGREEMENT_FIELDS)
+        if not self.hit:
+            self.cancel()
+        return self.hit
+
+    async def take(self, agent_key: str, context: AgentContext) -> Optional[SpeculativeStep]:
+        """The speculative output for `agent_key`, if it can be committed as-is."""
+        if not self.hit:
+            return None
+        if not self._task.done():
+            start = time.monotonic()
+            try:
+                await self._task
+            except Exception as e:
+                print(f"  ⚠️  Speculative branch failed: {e}")
+            self.wait_ms += (time.monotonic() - start) * 1000
+        step = self.steps.pop(agent_key, None)
+        if step is None:
+            return None
+        if not step.matches(context):
+            self.discarded += 1
+            return None
+        self.committed[agent_key] = step.execution_time_ms
+        return step
+
+    def cancel(self):
+        if not self._task.done():
+            self._task.cancel()
+
+    def summary(self) -> Dict[str, Any]:
+        # Committed agents overlapped the LLM classification; any time spent
+        # waiting for the branch to finish afterwards is paid back
+        saved = sum(self.committed.values()) - self.wait_ms if self.hit else 0
+        return {
+            "hit": self.hit,
+            "provisional": {key: self.provisional.get(key) for key in AGREEMENT_FIELDS},
+            "committed": list(self.committed),
+            "wait_ms": round(self.wait_ms),
+            "saved_ms": round(saved),
+        }
+
+
+class SpeculationStats:
+    """Process-wide speculation counters."""
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.committed_agents = 0
+        self.discarded_agents = 0
+        self.saved_ms = 0.0
+
+    def record(self, speculation: Speculation):
+        self.attempts += 1
+        if speculation.hit:
+            self.hits += 1
+            self.saved_ms += sum(speculation.committed.values()) - speculation.wait_ms
+        else:
+            self.misses += 1
+        self.committed_agents += len(speculation.committed)
+        self.discarded_agents += speculation.discarded + len(speculation.steps)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / self.attempts, 3) if self.attempts else None,
+            "committed_agents": self.committed_agents,
+            "discarded_agents": self.discarded_agents,
+            "saved_ms_total": round(self.saved_ms),
+            "saved_ms_avg": round(self.saved_ms / self.hits, 1) if self.hits else None,
+        }
+
+
+speculation_stats = SpeculationStats(enabled=os.getenv("PIPELINE_SPECULATION", "1") != "0")
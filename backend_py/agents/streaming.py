@@ -0,0 +1,241 @@
+import json
+import os
+import time
+from typing import Dict, Any, Callable, Awaitable, Iterable, List, Optional, Tuple
+
+from ..tracing import span
+
+# Extra attempts when a streamed response turns out not to be JSON
+STREAM_RETRIES = int(os.getenv("LLM_STREAM_RETRIES", 1))
+
+_WHITESPACE = " \t\r\n"
+_VALUE_START = '"-0123456789tfn[{'
+_CLOSERS = {'[': ']', '{': '}'}
+
+
+class MalformedJSON(ValueError):
+    """The model's output can no longer become the JSON object we asked for."""
+
+
+class IncrementalJSONParser:
+    """
+    Parses a single top-level JSON object as it streams in.
+
+    `feed()` returns the (key, value) pairs completed by the new text, so a
+    field is available as soon as its closing quote or bracket arrives rather
+    than when the whole object ends. A Markdown code fence before the object
+    is tolerated and anything after it is ignored; anything else that cannot
+    lead to a valid object raises MalformedJSON on the chunk where it appears.
+    """
+    def __init__(self):
+        self.state = 'start'
+        self.data: Dict[str, Any] = {}
+        self._fence = ''
+        self._key = ''
+        self._raw: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self.state == 'end'
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        completed: List[Tuple[str, Any]] = []
+        for ch in text:
+            if self.state == 'end':
+                # Whatever follows the object (a closing fence, chatter) is ignored
+                break
+            self._step(ch, completed)
+        return completed
+
+    def finish(self) -> Dict[str, Any]:
+        if self.state != 'end':
+            raise MalformedJSON(f"response ended inside the JSON object (state {self.state})")
+        return self.data
+
+    def _step(self, ch: str, completed: List[Tuple[str, Any]]):
+        state = self.state
+        if state == 'start':
+            if self._fence:
+                # Inside an opening ```json fence line
+                self._fence += ch
+                if len(self._fence) <= 3 and not '```'.startswith(self._fence):
+                    raise MalformedJSON(f"unexpected text before the JSON object: {self._fence!r}")
+                if ch == '{' and len(self._fence) > 3:
+                    self._fence = ''
+                    self.state = 'key_or_end'
+                elif ch == '\n':
+                    self._fence = ''
+                elif len(self._fence) > 16:
+                    raise MalformedJSON(f"unexpected text before the JSON object: {self._fence!r}")
+                return
+            if ch in _WHITESPACE:
+                return
+            if ch == '{':
+                self.state = 'key_or_end'
+            elif ch == '`':
+                self._fence = ch
+            else:
+                raise MalformedJSON(f"expected '{{' but got {ch!r}")
+            return
+
+        if state in ('key_or_end', 'key'):
+            if ch in _WHITESPACE:
+                return
+            if ch == '"':
+                self._key, self._escape = '', False
+                self.state = 'in_key'
+                return
+            if ch == '}' and state == 'key_or_end':
+                self.state = 'end'
+                return
+            raise MalformedJSON(f"expected a key but got {ch!r}")
+
+        if state == 'in_key':
+            if self._escape:
+                self._key += '\\' + ch
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._key = json.loads(f'"{self._key}"')
+                self.state = 'colon'
+            else:
+                self._key += ch
+            return
+
+        if state == 'colon':
+            if ch in _WHITESPACE:
+                return
+            if ch != ':':
+                raise MalformedJSON(f"expected ':' after key {self._key!r} but got {ch!r}")
+            self.state = 'value_start'
+            return
+
+        if state == 'value_start':
+            if ch in _WHITESPACE:
+                return
+            if ch not in _VALUE_START:
+                raise MalformedJSON(f"invalid value for {self._key!r} starting with {ch!r}")
+            self._raw = [ch]
+            self._stack = [ch] if ch in _CLOSERS else []
+            self._in_string = ch == '"'
+            self._escape = False
+            self.state = 'value'
+            return
+
+        if state == 'value':
+            self._value_char(ch, completed)
+            return
+
+        if state == 'after_value':
+            if ch in _WHITESPACE:
+                return
+            if ch == ',':
+                self.state = 'key'
+            elif ch == '}':
+                self.state = 'end'
+            else:
+                raise MalformedJSON(f"expected ',' or '}}' after {self._key!r} but got {ch!r}")
+            return
+
+    def _value_char(self, ch: str, completed: List[Tuple[str, Any]]):
+        raw = self._raw
+        if self._in_string:
+            raw.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if not self._stack:
+                    self._complete(completed)
+            return
+
+        if self._stack:
+            raw.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                self._stack.append(ch)
+            elif ch in ']}':
+                if _CLOSERS[self._stack.pop()] != ch:
+                    raise MalformedJSON(f"mismatched {ch!r} in {self._key!r}")
+                if not self._stack:
+                    self._complete(completed)
+            return
+
+        # Bare number or literal: ends at whitespace, ',' or '}'
+        if ch in _WHITESPACE or ch in ',}':
+            self._complete(completed)
+            self._step(ch, completed)
+            return
+        raw.append(ch)
+        if len(raw) > 64:
+            raise MalformedJSON(f"runaway literal in {self._key!r}")
+
+    def _complete(self, completed: List[Tuple[str, Any]]):
+        text = ''.join(self._raw)
+        try:
+            value = json.loads(text)
+        except ValueError:
+            raise MalformedJSON(f"invalid value for {self._key!r}: {text[:40]!r}")
+        self.data[self._key] = value
+        completed.append((self._key, value))
+        self.state = 'after_value'
+
+
+class StreamedJSON:
+    __slots__ = ('data', 'text', 'response', 'attempts')
+
+    def __init__(self, data: Dict[str, Any], text: str, response, attempts: int):
+        self.data = data
+        self.text = text
+        self.response = response
+        self.attempts = attempts
+
+
+async def generate_json(model, prompt: str, early_fields: Iterable[str] = (),
+                        on_early: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                        retries: int = STREAM_RETRIES) -> StreamedJSON:
+    """
+    Stream a JSON object from the model, parsing as chunks arrive.
+
+    Once every key in `early_fields` has been parsed, `on_early` is awaited
+    with those values while the model keeps writing the rest (again on a
+    retry, with that attempt's values). They come from an unfinished,
+    unvalidated response, so treat them as provisional. If the output
+    turns malformed the stream is abandoned at once and the call retried, up
+    to `retries` times; after that MalformedJSON propagates so the agent can
+    use its fallback.
+    """
+    early_fields = tuple(early_fields)
+    for attempt in range(1, retries + 2):
+        parser = IncrementalJSONParser()
+        published = not (early_fields and on_early)
+        chunks: List[str] = []
+        with span("llm.generate", **{"llm.attempt": attempt, "llm.prompt_chars": len(prompt)}) as current:
+            start = time.monotonic()
+            response = await model.generate_content_async(prompt, stream=True)
+            try:
+                async for chunk in response:
+                    text = chunk.text
+                    if not chunks:
+                        current.set(**{"llm.first_chunk_ms": round((time.monotonic() - start) * 1000, 1)})
+                    chunks.append(text)
+                    parser.feed(text)
+                    if not published and all(key in parser.data for key in early_fields):
+                        published = True
+                        await on_early({key: parser.data[key] for key in early_fields})
+                    if parser.done:
+                        break
+                current.set(**{"llm.chunks": len(chunks), "llm.output_chars": sum(map(len, chunks))})
+                return StreamedJSON(parser.finish(), ''.join(chunks), response, attempt)
+            except MalformedJSON as e:
+                current.set(**{"llm.chunks": len(chunks), "llm.malformed": str(e)})
+                print(f"  ⚠️  Malformed LLM output (attempt {attempt}): {e}")
+                if attempt > retries:
+                    raise
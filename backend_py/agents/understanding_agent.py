@@ -1,9 +1,35 @@
 import os
-import json
-import re
 import google.generativeai as genai
 from typing import Dict, Any, List, Optional
 from .context import AgentContext
+from .prompts import PromptTemplate, PromptField
+from .llm_usage import llm_usage
+from .streaming import generate_json
+
+# Keywords the rule-based path treats as urgency indicators (also used by the
+# priority pre-score in scheduler.py)
+URGENCY_KEYWORDS = ['emergency', 'urgent', 'immediate', 'critical', 'broken', 'accident', 'dead', 'death', 'injury', 'injured', 'major', 'severe', 'danger', 'hazard', 'fire', 'explosion']
+
+PROMPT = PromptTemplate('understanding', """
+You are an Understanding Agent in a multi-agent civic complaint system.
+
+Your task: Analyze the complaint text and extract:
+1. Issue type (e.g., garbage accumulation, pothole, water leak, broken streetlight)
+2. Urgency indicators (keywords like "emergency", "3 days", "overflowing", "broken")
+3. Affected area description (street name, landmark, area)
+4. Duration (how long the issue has existed, if mentioned)
+
+Respond ONLY with valid JSON in this exact format:
+{
+  "issue_type": "brief description of the issue",
+  "urgency_indicators": ["keyword1", "keyword2"],
+  "affected_area": "area description",
+  "duration": "duration if mentioned, or null"
+}
+""", [
+    PromptField('original_text', 'Complaint text', kind='text', elastic=True),
+], budget=600)
+
 
 class UnderstandingAgent:
     """
@@ -28,26 +54,10 @@ class UnderstandingAgent:
             return await self._fallback_execution(context, text)
         
         try:
-            prompt = f"""You are an Understanding Agent in a multi-agent civic complaint system.
-
-Your task: Analyze the complaint text and extract:
-1. Issue type (e.g., garbage accumulation, pothole, water leak, broken streetlight)
-2. Urgency indicators (keywords like "emergency", "3 days", "overflowing", "broken")
-3. Affected area description (street name, landmark, area)
-4. Duration (how long the issue has existed, if mentioned)
-
-Complaint text: "{text}"
-
-Respond ONLY with valid JSON in this exact format:
-{{
-  "issue_type": "brief description of the issue",
-  "urgency_indicators": ["keyword1", "keyword2"],
-  "affected_area": "area description",
-  "duration": "duration if mentioned, or null"
-}}"""
-
-            response = await self.model.generate_content_async(prompt)
-            parsed = self._parse_json(response.text)
+            prompt = PROMPT.render(original_text=text)
+            streamed = await generate_json(self.model, prompt.text)
+            usage = llm_usage.record(PROMPT, prompt, streamed.response, streamed.text)
+            parsed = streamed.data
             
             # Update shared context
             await context.update(self.name, {
@@ -60,7 +70,8 @@ Respond ONLY with valid JSON in this exact format:
             urgency_level = 'High' if parsed.get("urgency_indicators") else 'Normal'
             
             return {
-                "summary": f"Issue type: {parsed.get('issue_type')}, Urgency: {urgency_level}, Duration: {parsed.get('duration') or 'Not specified'}"
+                "summary": f"Issue type: {parsed.get('issue_type')}, Urgency: {urgency_level}, Duration: {parsed.get('duration') or 'Not specified'}",
+                "usage": usage
             }
             
         except Exception as e:
@@ -88,8 +99,7 @@ Respond ONLY with valid JSON in this exact format:
         if 'accident' in lowercase_text or 'crash' in lowercase_text or 'collision' in lowercase_text:
             issue_type = 'Accident'
 
-        urgency_keywords = ['emergency', 'urgent', 'immediate', 'critical', 'broken', 'accident', 'dead', 'death', 'injury', 'injured', 'major', 'severe', 'danger', 'hazard', 'fire', 'explosion']
-        urgency_indicators = [kw for kw in urgency_keywords if kw in lowercase_text]
+        urgency_indicators = [kw for kw in URGENCY_KEYWORDS if kw in lowercase_text]
         
         await context.update(self.name, {
             "issue_type": issue_type,
@@ -101,11 +111,3 @@ Respond ONLY with valid JSON in this exact format:
         return {
             "summary": f"Issue type: {issue_type} (Fallback logic)"
         }
-
-    def _parse_json(self, text: str) -> Dict[str, Any]:
-        try:
-            cleaned = re.sub(r'```json\n?|```\n?', '', text).strip()
-            return json.loads(cleaned)
-        except Exception as e:
-            print(f"JSON extract error: {e}")
-            return {}
@@ -1,7 +1,115 @@
+import os
+from typing import Dict, Any, Optional
+
+from ..db.connection import get_pool
+from ..geo.spatial import build_spatial_filter
 from .context import AgentContext
-from typing import Dict, Any
+from .gis_agent import NEIGHBOURHOOD_RADIUS_M
+from .imaging import image_processor, upload_path, hamming, ImageProcessorBusy
+
+# Max dHash bit distance for two photos to count as the same scene
+DUPLICATE_MAX_DISTANCE = int(os.getenv("IMAGE_DUPLICATE_MAX_DISTANCE", 10))
+# Nearby complaints this recent are compared for near-duplicate photos
+DUPLICATE_WINDOW_DAYS = 30
+DUPLICATE_CANDIDATES = 50
+
 
 class VisionAgent:
+    """
+    VisionAgent - Local image analysis (no LLM)
+
+    Preprocesses the uploaded photo off the event loop: EXIF-stripped
+    thumbnail and model-input derivatives, a perceptual hash, brightness and
+    a colour histogram. The hashes flag re-submitted photos: an identical
+    file anywhere, or a near-identical one from a complaint nearby.
+    """
     name = "VisualIntelligenceAgent"
+
+    def __init__(self):
+        self.use_database = True
+
     async def execute(self, context: AgentContext, image_url: str) -> Dict[str, Any]:
-        return {"summary": "Vision Agent Stub"}
+        path = upload_path(image_url)
+        if path is None:
+            return {"summary": "Image not stored locally; not analysed"}
+        try:
+            image = await image_processor.process(path)
+        except ImageProcessorBusy:
+            return {"summary": "Image analysis skipped (image workers busy)"}
+        except Exception as e:
+            # A corrupt or oversized upload must not take the rest of the pipeline down
+            print(f"VisionAgent error: {e}")
+            return {"summary": f"Image could not be analysed: {type(e).__name__}"}
+
+        duplicate = await self._find_duplicate(context, image)
+        features = {
+            "width": image['width'],
+            "height": image['height'],
+            "brightness": image['brightness'],
+            "contrast": image['contrast'],
+            "dark": image['dark'],
+            "histogram": image['histogram'],
+            "had_gps": image['had_gps'],
+        }
+        await context.update(self.name, {
+            "image_sha256": image['sha256'],
+            "image_phash": image['phash'],
+            "image_thumbnail_url": image['thumbnail_url'],
+            "image_features": features,
+            "duplicate_of": duplicate['id'] if duplicate else None,
+        })
+
+        notes = [f"{image['width']}x{image['height']}", f"brightness {image['brightness']:.2f}"]
+        if image['dark']:
+            notes.append("likely taken at night")
+        if duplicate:
+            notes.append(f"{duplicate['match']} duplicate of complaint #{duplicate['id']}")
+        return {
+            "summary": "Image: " + ", ".join(notes),
+            "image": dict(features, phash=image['phash'], cached=image['cached'],
+                          processing_ms=image['processing_ms']),
+            "duplicate": duplicate,
+        }
+
+    async def _find_duplicate(self, context: AgentContext, image: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Earliest complaint with the same file, else the closest near-identical photo nearby."""
+        if not self.use_database:
+            return None
+        complaint_id = getattr(context, 'complaint_id', None)
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                exact = await conn.fetchval(
+                    "SELECT min(id) FROM complaints WHERE image_sha256 = $1 AND id <> $2",
+                    image['sha256'], complaint_id
+                )
+                if exact:
+                    return {"id": exact, "match": "exact", "distance": 0}
+
+                lat, lng = context.get('latitude'), context.get('longitude')
+                if lat is None or lng is None:
+                    return None
+                params = []
+                spatial = build_spatial_filter(params, near=(lat, lng), radius_m=NEIGHBOURHOOD_RADIUS_M)
+                params.extend([complaint_id, DUPLICATE_CANDIDATES])
+                n = len(params)
+                rows = await conn.fetch(
+                    f"""
+                    SELECT c.id, c.image_phash FROM complaints c
+                    WHERE {' AND '.join(spatial['where'])} AND c.image_phash IS NOT NULL
+                      AND c.created_at >= NOW() - INTERVAL '{DUPLICATE_WINDOW_DAYS} days' AND c.id <> ${n - 1}
+                    ORDER BY c.created_at DESC
+                    LIMIT ${n}
+                    """,
+                    *params
+                )
+        except Exception as e:
+            print(f"VisionAgent duplicate lookup failed: {e}")
+            return None
+
+        best = None
+        for row in rows:
+            distance = hamming(image['phash'], row['image_phash'])
+            if distance <= DUPLICATE_MAX_DISTANCE and (best is None or distance < best['distance']):
+                best = {"id": row['id'], "match": "near", "distance": distance}
+        return best
@@ -15,11 +15,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "X-Trace-Id"],
 )
 
+# Opt-in request profiling (X-Profile header or PROFILE_SAMPLE_RATE)
+from .profiling import ProfilingMiddleware
+app.add_middleware(ProfilingMiddleware)
+
+# Trace id per request; spans exported when TRACE_EXPORT is set
+from .tracing import TracingMiddleware
+app.add_middleware(TracingMiddleware)
+
 # Include routers
-from .routers import complaints
+from .routers import complaints, heatmap, forecast, sentiment, scheduler, llm, profiles, zones, incidents, feed, metrics
 app.include_router(complaints.router, prefix="/api")
+app.include_router(heatmap.router, prefix="/api")
+app.include_router(forecast.router, prefix="/api")
+app.include_router(sentiment.router, prefix="/api")
+app.include_router(scheduler.router, prefix="/api")
+app.include_router(llm.router, prefix="/api")
+app.include_router(profiles.router, prefix="/api")
+app.include_router(zones.router, prefix="/api")
+app.include_router(incidents.router, prefix="/api")
+app.include_router(feed.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+
+# Background tasks
+import asyncio
+from .agents.forecasting import run_refresh_loop
+from .agents.load_shedding import run_load_shedding_loop
+from .agents.imaging import image_processor
+from .geo.zones import zone_registry, run_zone_watch_loop, ZONES_WATCH_SECONDS
+from .db.connection import close_pool
+from .db.listener import listener
+from .change_feed import run_prune_loop
+_background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    interval = float(os.getenv("FORECAST_REFRESH_SECONDS", 900))
+    _background_tasks.append(asyncio.create_task(run_refresh_loop(interval)))
+    _background_tasks.append(asyncio.create_task(
+        run_load_shedding_loop(float(os.getenv("SHED_INTERVAL_SECONDS", 2)))
+    ))
+    await zone_registry.get()
+    _background_tasks.append(asyncio.create_task(run_zone_watch_loop(ZONES_WATCH_SECONDS)))
+    _background_tasks.append(asyncio.create_task(listener.run()))
+    _background_tasks.append(asyncio.create_task(run_prune_loop()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    image_processor.shutdown()
+    await close_pool()
 
 # Serve static files (uploads)
 from fastapi.staticfiles import StaticFiles
@@ -47,8 +96,27 @@ async def root():
             "complaints": {
                 "create": "POST /api/complaints",
                 "list": "GET /api/complaints",
+                "export": "GET /api/complaints/export",
                 "get": "GET /api/complaints/:id",
                 "update": "PATCH /api/complaints/:id"
+            },
+            "heatmap": "GET /api/heatmap",
+            "forecast": "GET /api/forecast",
+            "sentiment_batch": "POST /api/sentiment/batch",
+            "scheduler_stats": "GET /api/scheduler/stats",
+            "llm_usage": "GET /api/llm/usage",
+            "profiles": "GET /api/profiles",
+            "zones": "GET /api/zones",
+            "zones_reload": "POST /api/zones/reload",
+            "incidents": "GET /api/incidents",
+            "feed": "WebSocket /api/feed",
+            "metrics": {
+                "load_shedding": "GET /api/metrics/load-shedding",
+                "speculation": "GET /api/metrics/speculation",
+                "images": "GET /api/metrics/images",
+                "incidents": "GET /api/metrics/incidents",
+                "query_cache": "GET /api/metrics/query-cache",
+                "change_feed": "GET /api/metrics/change-feed"
             }
         },
         "documentation": "See README.md for API details"
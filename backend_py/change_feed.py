@@ -0,0 +1,274 @@
+"""
+Push feed of complaint events for dashboards (WebSocket /api/feed).
+
+Triggers on `complaints` (migration 0013) record each creation,
+classification and status change in `complaint_events` and announce it on
+the complaint_events channel. Every API process receives those through its
+one shared LISTEN connection (db/listener.py) and fans each event out to
+its subscribers, so a write on any node reaches dashboards on every node.
+
+Each subscriber holds at most one pending event per complaint: while a slow
+client is still receiving, newer events for the same complaint replace the
+queued one (its `kinds` list keeps what happened in between). If more than
+CHANGE_FEED_MAX_PENDING complaints are queued the buffer is dropped and the
+client is told to resync from the REST endpoints instead. Every event
+carries its `seq`; a client reconnecting with `since=<seq>` first receives
+what it missed, read back from `complaint_events`.
+"""
+import asyncio
+import json
+import os
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from .db.connection import get_pool
+from .db.listener import listener
+
+# Distinct complaints queued for one client before it is told to resync
+CHANGE_FEED_MAX_PENDING = int(os.getenv("CHANGE_FEED_MAX_PENDING", 500))
+# Most missed events replayed on resume; further behind than this means resync
+CHANGE_FEED_BACKFILL_LIMIT = int(os.getenv("CHANGE_FEED_BACKFILL_LIMIT", 1000))
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", 5000))
+CHANGE_FEED_RETENTION_HOURS = float(os.getenv("CHANGE_FEED_RETENTION_HOURS", 24))
+CHANGE_FEED_PRUNE_SECONDS = float(os.getenv("CHANGE_FEED_PRUNE_SECONDS", 600))
+
+EVENTS_CHANNEL = "complaint_events"
+
+EVENT_SELECT = """
+    SELECT seq, kind, complaint_id AS id, status, category, severity, department, zone_name,
+           floor(extract(epoch FROM created_at) * 1000)::bigint AS at
+    FROM complaint_events
+"""
+
+
+def _event(row: Dict[str, Any]) -> Dict[str, Any]:
+    event = dict(row)
+    event['kinds'] = [event.pop('kind')]
+    return event
+
+
+class FeedFilter:
+    """Server-side subscription filter; each field is a set of accepted values (None = any)."""
+    FIELDS = (('departments', 'department'), ('zones', 'zone_name'), ('severities', 'severity'))
+
+    def __init__(self, departments: Optional[Set[str]] = None, zones: Optional[Set[str]] = None,
+                 severities: Optional[Set[str]] = None):
+        # Compared case-insensitively, like the list endpoint's department filter
+        self.departments = {d.lower() for d in departments} if departments else None
+        self.zones = {z.lower() for z in zones} if zones else None
+        self.severities = {s.lower() for s in severities} if severities else None
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        for attr, field in self.FIELDS:
+            accepted = getattr(self, attr)
+            if accepted is not None and (event.get(field) or '').lower() not in accepted:
+                return False
+        return True
+
+    def sql(self, params: List[Any]) -> str:
+        """The same filter as a WHERE fragment over complaint_events."""
+        where = []
+        for attr, field in self.FIELDS:
+            accepted = getattr(self, attr)
+            if accepted is not None:
+                params.append(sorted(accepted))
+                where.append(f"lower({field}) = ANY(${len(params)}::text[])")
+        return " AND ".join(where) or "TRUE"
+
+    def describe(self) -> Dict[str, Any]:
+        return {attr: sorted(getattr(self, attr)) if getattr(self, attr) else None for attr, _ in self.FIELDS}
+
+
+class Subscriber:
+    def __init__(self, feed_filter: FeedFilter):
+        self.filter = feed_filter
+        # complaint id -> its latest undelivered event
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.ready = asyncio.Event()
+        self.overflowed = False
+
+    def offer(self, event: Dict[str, Any]) -> int:
+        """Queue an event if it passes the filter; returns 1 if it replaced a queued one."""
+        if not self.filter.matches(event):
+            return 0
+        queued = self.pending.get(event['id'])
+        coalesced = 0
+        if queued is not None:
+            event = dict(event, kinds=queued['kinds'] + [k for k in event['kinds'] if k not in queued['kinds']])
+            coalesced = 1
+        elif len(self.pending) >= CHANGE_FEED_MAX_PENDING:
+            self.pending.clear()
+            self.overflowed = True
+        self.pending[event['id']] = event
+        self.ready.set()
+        return coalesced
+
+    def overflow(self):
+        self.pending.clear()
+        self.overflowed = True
+        self.ready.set()
+
+    def discard(self, seqs: Set[int]):
+        """Forget queued events the client already received (during backfill)."""
+        for complaint_id in [i for i, e in self.pending.items() if e['seq'] in seqs]:
+            del self.pending[complaint_id]
+
+    def take(self):
+        overflowed, self.overflowed = self.overflowed, False
+        events = sorted(self.pending.values(), key=lambda e: e['seq'])
+        self.pending = {}
+        self.ready.clear()
+        return overflowed, events
+
+
+class ChangeFeed:
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.last_seq = 0
+        self.received = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.resyncs = 0
+        self.backfilled = 0
+        self._catch_up_task: Optional[asyncio.Task] = None
+
+    def _on_notify(self, payload: str):
+        event = json.loads(payload)
+        event['kinds'] = [event.pop('kind')]
+        self._publish(event)
+
+    def _publish(self, event: Dict[str, Any]):
+        self.received += 1
+        self.last_seq = max(self.last_seq, event['seq'])
+        for subscriber in self.subscribers:
+            self.coalesced += subscriber.offer(event)
+
+    def _on_listener_state(self, connected: bool):
+        # Events committed while the connection was down were never announced here
+        if connected and self.last_seq:
+            self._catch_up_task = asyncio.get_running_loop().create_task(self._catch_up(self.last_seq))
+
+    async def _catch_up(self, after_seq: int):
+        try:
+            pool = await get_pool()
+            rows = await pool.fetch(f"{EVENT_SELECT} WHERE seq > $1 ORDER BY seq LIMIT $2",
+                                    after_seq, CHANGE_FEED_BACKFILL_LIMIT + 1)
+        except Exception as e:
+            print(f"Change feed catch-up failed: {e}")
+            rows = None
+        if rows is None or len(rows) > CHANGE_FEED_BACKFILL_LIMIT:
+            for subscriber in self.subscribers:
+                subscriber.overflow()
+            return
+        for row in rows:
+            self._publish(_event(row))
+
+    async def _current_seq(self) -> int:
+        if not self.last_seq:
+            pool = await get_pool()
+            self.last_seq = max(self.last_seq, await pool.fetchval("SELECT COALESCE(MAX(seq), 0) FROM complaint_events"))
+        return self.last_seq
+
+    async def _backfill(self, websocket: WebSocket, subscriber: Subscriber, since: int) -> None:
+        """Send the client's missed events, or a resync if they are no longer all available."""
+        params: List[Any] = [since]
+        where = subscriber.filter.sql(params)
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            oldest = await conn.fetchval("SELECT MIN(seq) FROM complaint_events")
+            rows = await conn.fetch(
+                f"{EVENT_SELECT} WHERE seq > $1 AND {where} ORDER BY seq LIMIT ${len(params) + 1}",
+                *params, CHANGE_FEED_BACKFILL_LIMIT + 1
+            )
+        # Older than retention, or from before a reset: the client cannot catch up event by event
+        if len(rows) > CHANGE_FEED_BACKFILL_LIMIT or since > self.last_seq or (oldest is not None and since < oldest - 1):
+            subscriber.overflow()
+            return
+        if rows:
+            events = [_event(r) for r in rows]
+            await websocket.send_json({"type": "events", "events": events})
+            subscriber.discard({e['seq'] for e in events})
+            self.backfilled += len(events)
+
+    async def _send_loop(self, websocket: WebSocket, subscriber: Subscriber):
+        while True:
+            await subscriber.ready.wait()
+            overflowed, events = subscriber.take()
+            if overflowed:
+                self.resyncs += 1
+                await websocket.send_json({"type": "resync", "seq": self.last_seq})
+            if events:
+                await websocket.send_json({"type": "events", "events": events})
+                self.delivered += len(events)
+
+    @staticmethod
+    async def _receive_until_closed(websocket: WebSocket):
+        # Clients have nothing to say; reading is how a disconnect is noticed
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    def full(self) -> bool:
+        return len(self.subscribers) >= CHANGE_FEED_MAX_SUBSCRIBERS
+
+    async def serve(self, websocket: WebSocket, feed_filter: FeedFilter, since: Optional[int] = None) -> None:
+        """Stream events to an accepted WebSocket until the client goes away."""
+        subscriber = Subscriber(feed_filter)
+        # Registered before the backfill query so nothing committed meanwhile is missed
+        self.subscribers.add(subscriber)
+        tasks: Iterable[asyncio.Task] = ()
+        try:
+            await websocket.send_json({
+                "type": "hello", "seq": await self._current_seq(), "filter": feed_filter.describe(),
+            })
+            if since is not None:
+                await self._backfill(websocket, subscriber, since)
+            tasks = (asyncio.create_task(self._send_loop(websocket, subscriber)),
+                     asyncio.create_task(self._receive_until_closed(websocket)))
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        except (WebSocketDisconnect, OSError):
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            for task in tasks:
+                task.cancel()
+
+    async def prune(self) -> int:
+        pool = await get_pool()
+        result = await pool.execute(
+            "DELETE FROM complaint_events WHERE created_at < NOW() - $1 * INTERVAL '1 hour'",
+            CHANGE_FEED_RETENTION_HOURS
+        )
+        return int(result.split()[-1])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "listening": listener.connected,
+            "subscribers": len(self.subscribers),
+            "last_seq": self.last_seq,
+            "received": self.received,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "backfilled": self.backfilled,
+            "resyncs": self.resyncs,
+        }
+
+
+async def run_prune_loop(interval_seconds: float = CHANGE_FEED_PRUNE_SECONDS) -> None:
+    """Drop change-feed events older than CHANGE_FEED_RETENTION_HOURS (runs as a background task)."""
+    while True:
+        try:
+            await change_feed.prune()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Change feed prune failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+change_feed = ChangeFeed()
+listener.subscribe(EVENTS_CHANNEL, change_feed._on_notify, change_feed._on_listener_state)
@@ -0,0 +1,40 @@
+import json
+from typing import Dict, Any, Tuple
+
+# Write the coordinator's final context back onto the complaint row.
+# Shared by the API, the reprocessing CLI and anything else that runs the pipeline.
+UPDATE_RESULTS_SQL = """
+UPDATE complaints
+SET category = $1, severity = $2, department = $3,
+    zone_name = $4, ward_number = $5, ai_summary = $6,
+    suggested_action = $7, action_plan = $8, degraded_agents = $10,
+    image_sha256 = $11, image_phash = $12, image_thumbnail_url = $13, duplicate_of = $14,
+    zone_dataset_version = $15, location_source = COALESCE($16, location_source),
+    address_match = $17, address_distance_m = $18, location_mismatch = $19, updated_at = NOW()
+WHERE id = $9
+"""
+
+
+def result_update_args(context_data: Dict[str, Any], complaint_id: int) -> Tuple[Any, ...]:
+    """Map context fields to the UPDATE_RESULTS_SQL parameters."""
+    return (
+        context_data.get('category'),
+        context_data.get('severity'),
+        context_data.get('department'),
+        context_data.get('zone_name'),
+        context_data.get('ward_number'),
+        f"{context_data.get('issue_type') or 'Complaint'} reported in {context_data.get('zone_name') or 'area'}",
+        context_data.get('routing_reasoning') or f"Route to {context_data.get('department')}",
+        json.dumps(context_data.get('action_plan')),
+        complaint_id,
+        context_data.get('degraded_agents') or [],
+        context_data.get('image_sha256'),
+        context_data.get('image_phash'),
+        context_data.get('image_thumbnail_url'),
+        context_data.get('duplicate_of'),
+        context_data.get('zone_dataset_version'),
+        context_data.get('location_source'),
+        context_data.get('address_match'),
+        context_data.get('address_distance_m'),
+        bool(context_data.get('location_mismatch')),
+    )
@@ -1,24 +1,95 @@
+import asyncio
 import os
+import time
 import asyncpg
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Optional
 
-_pool: asyncpg.Pool | None = None
+from ..tracing import TRACE_EXPORT, span, record_span
+
+_pool: "TracedPool | None" = None
+_pool_lock = asyncio.Lock()
+
+# Statement text kept on query spans
+TRACE_STATEMENT_CHARS = 500
+RESET_QUERY_PREFIX = "SELECT pg_advisory_unlock_all()"
+
+
+class _TracedAcquire:
+    """`pool.acquire()` that times the wait for a free connection, separate from
+    the queries run on it. Usable with `async with` or `await`, like asyncpg's."""
+    __slots__ = ('_pool', '_timeout', '_connection')
+
+    def __init__(self, pool: asyncpg.Pool, timeout: Optional[float]):
+        self._pool = pool
+        self._timeout = timeout
+        self._connection = None
+
+    async def _acquire(self) -> asyncpg.Connection:
+        with span("db.acquire") as current:
+            connection = await self._pool.acquire(timeout=self._timeout)
+            current.set(**{"db.pool_size": self._pool.get_size(), "db.pool_idle": self._pool.get_idle_size()})
+        return connection
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self._connection = await self._acquire()
+        return self._connection
+
+    async def __aexit__(self, *exc_info):
+        connection, self._connection = self._connection, None
+        await self._pool.release(connection)
+
+
+class TracedPool:
+    """An asyncpg pool whose acquires are traced as spans; everything else is the pool's own."""
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _TracedAcquire:
+        return _TracedAcquire(self._pool, timeout)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
+def _log_query(record):
+    # Query loggers run via call_soon in the querying task's context, right
+    # after the query, so the span lands under the caller's current span
+    end_ns = time.time_ns()
+    # asyncpg's reset query runs as the connection goes back to the pool
+    name = "db.release" if record.query.startswith(RESET_QUERY_PREFIX) else "db.query"
+    record_span(
+        name, end_ns - int(record.elapsed * 1e9), end_ns,
+        error=f"{type(record.exception).__name__}: {record.exception}" if record.exception else None,
+        **{"db.statement": " ".join(record.query.split())[:TRACE_STATEMENT_CHARS]}
+    )
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    conn.add_query_logger(_log_query)
 
 async def init_pool() -> None:
     """Create a global asyncpg connection pool."""
     global _pool
-    if _pool is None:
-        try:
-           
-            dsn = f"postgresql://{os.getenv('DB_USER', 'postgres')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'geosmart_db')}"
-            _pool = await asyncpg.create_pool(
-                dsn=dsn,
-                min_size=1,
-                max_size=10,
-            )
-        except Exception as e:
-            print(f"Failed to connect to DB: {e}")
-            raise
+    # Startup tasks and the first requests all get here at once; without the
+    # lock each would create its own pool and DB_POOL_MAX_SIZE would not hold
+    async with _pool_lock:
+        if _pool is None:
+            try:
+                dsn = f"postgresql://{os.getenv('DB_USER', 'postgres')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'geosmart_db')}"
+                pool = await asyncpg.create_pool(
+                    dsn=dsn,
+                    min_size=1,
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                    # Queries are traced through a logger installed on each new connection
+                    init=_init_connection if TRACE_EXPORT else None,
+                )
+                _pool = TracedPool(pool)
+            except Exception as e:
+                print(f"Failed to connect to DB: {e}")
+                raise
 
 async def close_pool() -> None:
     """Close the global pool (called on shutdown)."""
@@ -27,7 +98,7 @@ async def close_pool() -> None:
         await _pool.close()
         _pool = None
 
-async def get_pool() -> asyncpg.Pool:
+async def get_pool() -> TracedPool:
     """Return the global pool, initializing it if needed."""
     if _pool is None:
         await init_pool()
@@ -0,0 +1,183 @@
+"""
+Postgres-backed job queue for the agent pipeline (table `pipeline_jobs`).
+
+Jobs are claimed with FOR UPDATE SKIP LOCKED so any number of workers can poll
+the same table without blocking each other. A claimed job carries a lease
+that its worker extends by heartbeat; jobs whose lease runs out (the worker
+crashed or hung) are put back in the queue by `reap_expired`. Every write
+made on behalf of a claimed job is fenced on `locked_by`, so a worker that
+lost its lease cannot overwrite the results of the worker that took over.
+"""
+import json
+import random
+from typing import List, Optional
+
+import asyncpg
+
+NOTIFY_CHANNEL = "pipeline_jobs"
+DEFAULT_MAX_ATTEMPTS = 5
+# Retry delay: BACKOFF_BASE_SECONDS * 2^(attempt - 1), capped, with jitter
+BACKOFF_BASE_SECONDS = 5.0
+BACKOFF_MAX_SECONDS = 600.0
+# Matches agents/scheduler.py: a waiting job gains one priority level per interval
+DEFAULT_AGING_SECONDS = 30.0
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker may now own it."""
+
+
+def backoff_seconds(attempt: int) -> float:
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(attempt - 1, 0))
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def enqueue(conn: asyncpg.Connection, complaint_id: int, priority: int = 2,
+                  reasons: Optional[List[str]] = None,
+                  max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Optional[int]:
+    """Queue the pipeline for a complaint; returns None if it already has a live job."""
+    job_id = await conn.fetchval(
+        """
+        INSERT INTO pipeline_jobs (complaint_id, priority, priority_reasons, max_attempts)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (complaint_id) WHERE status IN ('queued', 'running') DO NOTHING
+        RETURNING id
+        """,
+        complaint_id, priority, json.dumps(reasons or []), max_attempts
+    )
+    if job_id is not None:
+        await conn.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, str(job_id))
+    return job_id
+
+
+# Also EXPLAINed by db/plan_check.py
+CLAIM_SQL = """
+UPDATE pipeline_jobs j
+SET status = 'running', attempts = j.attempts + 1, locked_by = $1,
+    lease_expires_at = NOW() + make_interval(secs => $2),
+    heartbeat_at = NOW(), updated_at = NOW(),
+    started_at = COALESCE(j.started_at, NOW()),
+    queue_wait_ms = COALESCE(j.queue_wait_ms, (EXTRACT(EPOCH FROM NOW() - j.created_at) * 1000)::int)
+FROM (
+    SELECT id FROM pipeline_jobs
+    WHERE status = 'queued' AND run_after <= NOW() AND priority <= $4
+    ORDER BY GREATEST(priority - FLOOR(EXTRACT(EPOCH FROM NOW() - run_after) / $5), 0),
+             run_after, id
+    LIMIT $3
+    FOR UPDATE SKIP LOCKED
+) next_jobs
+WHERE j.id = next_jobs.id
+RETURNING j.id, j.complaint_id, j.attempts, j.max_attempts, j.priority
+"""
+
+
+async def claim(conn: asyncpg.Connection, worker_id: str, limit: int, lease_seconds: float,
+                max_priority: int = 2, aging_seconds: float = DEFAULT_AGING_SECONDS) -> List[asyncpg.Record]:
+    """
+    Atomically take up to `limit` runnable jobs and lease them to `worker_id`.
+
+    Only jobs with priority <= `max_priority` are eligible (0 claims emergencies
+    only). Jobs are taken most urgent first, a waiting job gaining one level per
+    `aging_seconds` so routine work is not starved.
+    """
+    return await conn.fetch(
+        CLAIM_SQL,
+        worker_id, float(lease_seconds), limit, max_priority, float(aging_seconds)
+    )
+
+
+async def wait_stats(conn: asyncpg.Connection, window_minutes: int = 60) -> List[asyncpg.Record]:
+    """Per-priority queue wait percentiles for jobs first claimed in the window."""
+    return await conn.fetch(
+        """
+        SELECT priority, COUNT(*) AS count,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY queue_wait_ms) AS p50_ms,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY queue_wait_ms) AS p95_ms,
+               MAX(queue_wait_ms) AS max_ms
+        FROM pipeline_jobs
+        WHERE started_at >= NOW() - make_interval(mins => $1)
+        GROUP BY priority
+        ORDER BY priority
+        """,
+        window_minutes
+    )
+
+
+async def heartbeat(conn: asyncpg.Connection, job_id: int, worker_id: str, lease_seconds: float):
+    """Extend the lease; raises LeaseLost if the job is no longer ours."""
+    extended = await conn.fetchval(
+        """
+        UPDATE pipeline_jobs
+        SET lease_expires_at = NOW() + make_interval(secs => $3), heartbeat_at = NOW()
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        RETURNING id
+        """,
+        job_id, worker_id, float(lease_seconds)
+    )
+    if extended is None:
+        raise LeaseLost(f"Lost lease on job {job_id}")
+
+
+async def complete(conn: asyncpg.Connection, job_id: int, worker_id: str, error: Optional[str] = None):
+    """Mark a job done (or failed for good, with `error`). Run inside the
+    transaction that writes the results so both commit or neither does."""
+    finished = await conn.fetchval(
+        """
+        UPDATE pipeline_jobs
+        SET status = CASE WHEN $3::text IS NULL THEN 'done' ELSE 'failed' END,
+            last_error = $3, locked_by = NULL, lease_expires_at = NULL,
+            finished_at = NOW(), updated_at = NOW()
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        RETURNING id
+        """,
+        job_id, worker_id, error
+    )
+    if finished is None:
+        raise LeaseLost(f"Lost lease on job {job_id}")
+
+
+async def retry_later(conn: asyncpg.Connection, job_id: int, worker_id: str, attempt: int, error: str):
+    """Release a failed attempt back to the queue after a backoff delay."""
+    await conn.execute(
+        """
+        UPDATE pipeline_jobs
+        SET status = 'queued', last_error = $4, locked_by = NULL, lease_expires_at = NULL,
+            run_after = NOW() + make_interval(secs => $3), updated_at = NOW()
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        """,
+        job_id, worker_id, backoff_seconds(attempt), error
+    )
+
+
+async def reap_expired(conn: asyncpg.Connection) -> int:
+    """Requeue (or fail, when out of attempts) running jobs whose lease expired."""
+    rows = await conn.fetch(
+        """
+        UPDATE pipeline_jobs j
+        SET status = CASE WHEN j.attempts >= j.max_attempts THEN 'failed' ELSE 'queued' END,
+            last_error = 'lease expired (worker ' || COALESCE(j.locked_by, '?') || ')',
+            finished_at = CASE WHEN j.attempts >= j.max_attempts THEN NOW() END,
+            locked_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+        FROM (
+            SELECT id FROM pipeline_jobs
+            WHERE status = 'running' AND lease_expires_at < NOW()
+            FOR UPDATE SKIP LOCKED
+        ) expired
+        WHERE j.id = expired.id
+        RETURNING j.id
+        """
+    )
+    return len(rows)
+
+
+async def release(conn: asyncpg.Connection, job_id: int, worker_id: str):
+    """Hand an interrupted job straight back to the queue without using up an attempt."""
+    await conn.execute(
+        """
+        UPDATE pipeline_jobs
+        SET status = 'queued', attempts = GREATEST(attempts - 1, 0), locked_by = NULL,
+            lease_expires_at = NULL, run_after = NOW(), updated_at = NOW()
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        """,
+        job_id, worker_id
+    )
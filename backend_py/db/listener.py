@@ -0,0 +1,76 @@
+"""
+One Postgres LISTEN connection per process, shared by every subscriber.
+
+Modules register a callback per channel (and optionally a state hook told
+when the connection comes up or goes away) at import time; the app's
+startup hook runs `listener.run()`. Callbacks run on the event loop and
+must not block.
+"""
+import asyncio
+from typing import Callable, Dict, List
+
+from .connection import get_pool
+
+LISTENER_RETRY_SECONDS = 2.0
+
+
+class NotificationListener:
+    def __init__(self):
+        self.connected = False
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._state_hooks: List[Callable[[bool], None]] = []
+
+    def subscribe(self, channel: str, callback: Callable[[str], None],
+                  on_state: Callable[[bool], None] = None) -> None:
+        """Call `callback(payload)` for each notification on `channel`."""
+        self._handlers.setdefault(channel, []).append(callback)
+        if on_state is not None:
+            self._state_hooks.append(on_state)
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for callback in self._handlers.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Error handling {channel} notification: {e}")
+
+    def _set_state(self, connected: bool):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        for hook in self._state_hooks:
+            hook(connected)
+
+    async def run(self) -> None:
+        """Hold the LISTEN connection, reconnecting if it drops (runs as a background task)."""
+        while True:
+            connection = None
+            pool = None
+            lost = asyncio.Event()
+            try:
+                pool = await get_pool()
+                connection = await pool.acquire()
+                connection.add_termination_listener(lambda _: lost.set())
+                for channel in self._handlers:
+                    await connection.add_listener(channel, self._dispatch)
+                self._set_state(True)
+                await lost.wait()
+                print("⚠️  LISTEN connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"LISTEN connection error: {e}")
+            finally:
+                self._set_state(False)
+                # A terminated connection has already been returned to the pool
+                if connection is not None and not lost.is_set():
+                    for channel in self._handlers:
+                        try:
+                            await connection.remove_listener(channel, self._dispatch)
+                        except Exception:
+                            pass
+                    await pool.release(connection)
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+
+
+listener = NotificationListener()
@@ -0,0 +1,152 @@
+"""
+Versioned schema migrations.
+
+Migrations are SQL files in db/migrations named NNNN_description.sql and are
+applied in order, each inside its own transaction, with the applied versions
+recorded in `schema_migrations`. A file whose first line is
+`-- migrate:no-transaction` is instead run statement by statement outside a
+transaction (required for CREATE INDEX CONCURRENTLY).
+
+Usage:
+    python -m backend_py.db.migrate            # apply pending migrations
+    python -m backend_py.db.migrate --status   # list applied / pending
+"""
+import argparse
+import asyncio
+import hashlib
+import re
+from pathlib import Path
+from typing import List, Dict, NamedTuple
+
+import asyncpg
+from dotenv import load_dotenv
+
+from .connection import get_pool, close_pool
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+# pg_advisory_lock key so two processes never migrate at the same time
+MIGRATION_LOCK_ID = 4_207_311
+
+_FILENAME_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+    checksum: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Return the migration files in version order."""
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME_RE.match(path.name)
+        if not match:
+            raise ValueError(f"Badly named migration file: {path.name}")
+        sql = path.read_text()
+        migrations.append(Migration(
+            int(match.group(1)), match.group(2), sql, hashlib.sha256(sql.encode()).hexdigest()
+        ))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version numbers")
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a no-transaction migration into statements (one per `;` line end,
+    ignoring those inside a `$$` body such as a DO block)."""
+    statements, current, in_body = [], [], False
+    for line in sql.splitlines():
+        if not in_body and line.strip().startswith("--"):
+            continue
+        current.append(line)
+        if line.count("$$") % 2:
+            in_body = not in_body
+        if not in_body and line.rstrip().endswith(";"):
+            statements.append("\n".join(current).strip()[:-1].strip())
+            current = []
+    tail = "\n".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return [stmt for stmt in statements if stmt]
+
+
+async def applied_versions(conn: asyncpg.Connection) -> Dict[int, str]:
+    await conn.execute(MIGRATIONS_TABLE_SQL)
+    rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+    return {r['version']: r['checksum'] for r in rows}
+
+
+async def migrate(conn: asyncpg.Connection) -> List[str]:
+    """Apply every pending migration; returns the names applied."""
+    applied_now = []
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    try:
+        applied = await applied_versions(conn)
+        for m in discover():
+            if m.version in applied:
+                if applied[m.version] != m.checksum:
+                    print(f"⚠️  Migration {m.version:04d}_{m.name} changed after being applied")
+                continue
+
+            print(f"  → Applying {m.version:04d}_{m.name}...")
+            if m.transactional:
+                async with conn.transaction():
+                    await conn.execute(m.sql)
+                    await _record(conn, m)
+            else:
+                for statement in split_statements(m.sql):
+                    await conn.execute(statement)
+                await _record(conn, m)
+            applied_now.append(f"{m.version:04d}_{m.name}")
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    return applied_now
+
+
+async def _record(conn: asyncpg.Connection, m: Migration):
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+        m.version, m.name, m.checksum
+    )
+
+
+async def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument('--status', action='store_true', help="List applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            if args.status:
+                applied = await applied_versions(conn)
+                for m in discover():
+                    state = "applied" if m.version in applied else "pending"
+                    print(f"{m.version:04d}_{m.name}: {state}")
+                return
+            names = await migrate(conn)
+            print(f"✅ Applied {len(names)} migration(s)" if names else "✅ Schema is up to date")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+-- Baseline schema. Written with IF NOT EXISTS so it also applies cleanly to
+-- databases created by the old db/setup.py script.
+
+CREATE TABLE IF NOT EXISTS complaints (
+    id SERIAL PRIMARY KEY,
+    text TEXT NOT NULL,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    address TEXT,
+    category TEXT,
+    severity TEXT,
+    department TEXT,
+    zone_name TEXT,
+    ward_number INTEGER,
+    ai_summary TEXT,
+    suggested_action TEXT,
+    action_plan JSONB,
+    status TEXT DEFAULT 'pending',
+    image_url TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Covering index so conditional GETs on /complaints/{id} are index-only
+CREATE INDEX IF NOT EXISTS idx_complaints_id_updated_at ON complaints (id) INCLUDE (updated_at);
+
+-- Geohash (precision 9) for spatial prefix-range scans. "C" collation keeps
+-- B-tree order identical to geohash cell order.
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS geohash TEXT COLLATE "C";
+CREATE INDEX IF NOT EXISTS idx_complaints_geohash ON complaints (geohash);
+
+-- Per-cell complaint counts at several geohash precisions, kept up to date
+-- incrementally on insert, classification and status change.
+CREATE TABLE IF NOT EXISTS complaint_grid_counts (
+    cell TEXT COLLATE "C" NOT NULL,
+    precision SMALLINT NOT NULL,
+    day DATE NOT NULL,
+    category TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (precision, cell, day, category, severity, status)
+);
+
+CREATE TABLE IF NOT EXISTS agent_executions (
+    id SERIAL PRIMARY KEY,
+    complaint_id INTEGER REFERENCES complaints(id),
+    agent_name TEXT NOT NULL,
+    input_data JSONB,
+    output_data JSONB,
+    execution_time_ms INTEGER,
+    status TEXT,
+    error_message TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Fields each step changed; replaces the full input_data snapshot for new rows
+ALTER TABLE agent_executions ADD COLUMN IF NOT EXISTS context_delta JSONB;
+
+CREATE TABLE IF NOT EXISTS reprocess_runs (
+    id SERIAL PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    filters JSONB,
+    dry_run BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE TABLE IF NOT EXISTS reprocess_checkpoints (
+    run_id INTEGER NOT NULL REFERENCES reprocess_runs(id) ON DELETE CASCADE,
+    complaint_id INTEGER NOT NULL REFERENCES complaints(id),
+    status TEXT NOT NULL,
+    changed BOOLEAN,
+    error_message TEXT,
+    processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (run_id, complaint_id)
+);
+
+CREATE TABLE IF NOT EXISTS agent_context (
+    id SERIAL PRIMARY KEY,
+    complaint_id INTEGER REFERENCES complaints(id),
+    context_data JSONB,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
@@ -0,0 +1,24 @@
+-- migrate:no-transaction
+-- Indexes for the list, detail, stats and GIS-history queries. Built
+-- CONCURRENTLY so they can be applied to a live database without blocking
+-- writes; each statement runs on its own outside a transaction.
+
+-- GET /complaints filtered by status/severity, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_complaints_status_severity_created
+    ON complaints (status, severity, created_at DESC);
+
+-- GET /complaints without filters (ORDER BY created_at DESC LIMIT n)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_complaints_created_at
+    ON complaints (created_at DESC);
+
+-- GIS agent historical issues and the recurrence model, per ward/category
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_complaints_ward_category
+    ON complaints (ward_number, category);
+
+-- GET /complaints/{id}?include=executions|context
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agent_executions_complaint_created
+    ON agent_executions (complaint_id, created_at);
+
+-- AgentContext load/save
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agent_context_complaint
+    ON agent_context (complaint_id);
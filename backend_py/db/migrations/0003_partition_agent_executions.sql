@@ -0,0 +1,65 @@
+-- Range-partition agent_executions by month on created_at. The existing
+-- table is swapped for a partitioned one and its rows copied across; new
+-- partitions are created ahead of time and old ones detached and archived by
+-- `python -m backend_py.db.partitions`.
+
+ALTER TABLE agent_executions RENAME TO agent_executions_unpartitioned;
+ALTER INDEX IF EXISTS idx_agent_executions_complaint_created
+    RENAME TO idx_agent_executions_unpartitioned_complaint_created;
+
+-- Keep the id sequence (and so existing ids) for the new table
+ALTER SEQUENCE agent_executions_id_seq OWNED BY NONE;
+ALTER SEQUENCE agent_executions_id_seq AS BIGINT;
+
+CREATE TABLE agent_executions (
+    id BIGINT NOT NULL DEFAULT nextval('agent_executions_id_seq'),
+    complaint_id INTEGER REFERENCES complaints(id),
+    agent_name TEXT NOT NULL,
+    input_data JSONB,
+    output_data JSONB,
+    execution_time_ms INTEGER,
+    status TEXT,
+    error_message TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    context_delta JSONB,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE agent_executions_id_seq OWNED BY agent_executions.id;
+
+-- Safety net for rows outside every monthly partition; the maintenance
+-- command keeps it empty by creating partitions months in advance.
+CREATE TABLE agent_executions_default PARTITION OF agent_executions DEFAULT;
+
+-- One partition per month from the oldest existing row to three months ahead
+DO $$
+DECLARE
+    part_month DATE;
+    last_month DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::date + INTERVAL '3 months';
+BEGIN
+    SELECT COALESCE(date_trunc('month', MIN(created_at) AT TIME ZONE 'UTC')::date,
+                    date_trunc('month', NOW() AT TIME ZONE 'UTC')::date)
+    INTO part_month
+    FROM agent_executions_unpartitioned;
+
+    WHILE part_month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF agent_executions FOR VALUES FROM (%L) TO (%L)',
+            'agent_executions_p' || to_char(part_month, 'YYYYMM'),
+            part_month::timestamp AT TIME ZONE 'UTC',
+            (part_month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+        part_month := part_month + INTERVAL '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO agent_executions (id, complaint_id, agent_name, input_data, output_data,
+                              execution_time_ms, status, error_message, created_at, context_delta)
+SELECT id, complaint_id, agent_name, input_data, output_data,
+       execution_time_ms, status, error_message, COALESCE(created_at, NOW()), context_delta
+FROM agent_executions_unpartitioned;
+
+DROP TABLE agent_executions_unpartitioned;
+
+-- Partitioned index: created on every current and future partition
+CREATE INDEX idx_agent_executions_complaint_created ON agent_executions (complaint_id, created_at);
@@ -0,0 +1,31 @@
+-- Job queue for running the agent pipeline outside the API process.
+-- Workers (`python -m backend_py.worker`) claim rows with FOR UPDATE SKIP
+-- LOCKED, hold a lease they extend by heartbeat, and retry with backoff.
+
+CREATE TABLE IF NOT EXISTS pipeline_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    complaint_id INTEGER NOT NULL REFERENCES complaints(id),
+    status TEXT NOT NULL DEFAULT 'queued',  -- queued | running | done | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_by TEXT,
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- At most one live job per complaint
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pipeline_jobs_live_complaint
+    ON pipeline_jobs (complaint_id) WHERE status IN ('queued', 'running');
+
+-- Claim: next runnable queued job
+CREATE INDEX IF NOT EXISTS idx_pipeline_jobs_queued
+    ON pipeline_jobs (run_after, id) WHERE status = 'queued';
+
+-- Reaper: running jobs whose lease has expired
+CREATE INDEX IF NOT EXISTS idx_pipeline_jobs_running_lease
+    ON pipeline_jobs (lease_expires_at) WHERE status = 'running';
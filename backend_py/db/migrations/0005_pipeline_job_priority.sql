@@ -0,0 +1,16 @@
+-- Priority scheduling for pipeline_jobs: 0 = emergency, 1 = elevated,
+-- 2 = routine (see agents/scheduler.py). queue_wait_ms is the time from
+-- enqueue to first claim, kept for per-priority SLA reporting.
+
+ALTER TABLE pipeline_jobs ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 2;
+ALTER TABLE pipeline_jobs ADD COLUMN IF NOT EXISTS priority_reasons JSONB;
+ALTER TABLE pipeline_jobs ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE pipeline_jobs ADD COLUMN IF NOT EXISTS queue_wait_ms INTEGER;
+
+DROP INDEX IF EXISTS idx_pipeline_jobs_queued;
+CREATE INDEX IF NOT EXISTS idx_pipeline_jobs_queued
+    ON pipeline_jobs (priority, run_after, id) WHERE status = 'queued';
+
+-- Wait-time reporting over recent jobs
+CREATE INDEX IF NOT EXISTS idx_pipeline_jobs_started_at
+    ON pipeline_jobs (started_at) WHERE started_at IS NOT NULL;
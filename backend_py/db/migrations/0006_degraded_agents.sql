@@ -0,0 +1,8 @@
+-- Agents that ran on their rule-based fallback because the load shedder had
+-- degraded them. Non-empty rows are candidates for reprocessing
+-- (python -m backend_py.reprocess --degraded).
+
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS degraded_agents TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_complaints_degraded
+    ON complaints (id) WHERE degraded_agents <> '{}';
@@ -0,0 +1,7 @@
+-- Trace id of the request or job that produced each agent step, linking the
+-- row to its spans (TRACE_EXPORT) and to the X-Trace-Id the client received.
+
+ALTER TABLE agent_executions ADD COLUMN IF NOT EXISTS trace_id TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_agent_executions_trace_id
+    ON agent_executions (trace_id) WHERE trace_id IS NOT NULL;
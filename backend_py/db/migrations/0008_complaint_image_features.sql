@@ -0,0 +1,11 @@
+-- Written by the vision agent: content hash and perceptual (dHash) hash of
+-- the uploaded photo, its EXIF-free thumbnail, and the earlier complaint the
+-- photo duplicates, if any.
+
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS image_sha256 TEXT;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS image_phash TEXT;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS image_thumbnail_url TEXT;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS duplicate_of INTEGER REFERENCES complaints(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_complaints_image_sha256
+    ON complaints (image_sha256) WHERE image_sha256 IS NOT NULL;
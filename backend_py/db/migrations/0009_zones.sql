@@ -0,0 +1,17 @@
+-- Zone/ward boundaries for the GIS agent (ZONES_SOURCE=db), loaded with
+-- `python -m backend_py.geo.zones import <file.geojson>`. Geometries are
+-- GeoJSON in lng/lat order. The agent never queries this table per request:
+-- it is compiled into a binary index (see geo/zones.py).
+
+CREATE TABLE IF NOT EXISTS zones (
+    id SERIAL PRIMARY KEY,
+    zone_name TEXT NOT NULL,
+    ward_number INTEGER,
+    geometry JSONB NOT NULL,
+    properties JSONB NOT NULL DEFAULT '{}',
+    dataset_version TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Which zone dataset the complaint's zone/ward came from
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS zone_dataset_version TEXT;
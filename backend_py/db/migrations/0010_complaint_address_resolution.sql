@@ -0,0 +1,13 @@
+-- Address resolution against the offline gazetteer (geo/gazetteer.py).
+-- location_source is 'gps' when the client sent coordinates and 'address'
+-- when they were taken from the resolved address. address_distance_m is the
+-- distance between the GPS point and the place the address names;
+-- location_mismatch flags complaints where the two disagree.
+
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS location_source TEXT;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS address_match TEXT;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS address_distance_m INTEGER;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS location_mismatch BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_complaints_location_mismatch
+    ON complaints (id) WHERE location_mismatch;
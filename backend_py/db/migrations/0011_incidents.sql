@@ -0,0 +1,38 @@
+-- Incidents: clusters of complaints about the same problem (same category,
+-- close in space and time), built incrementally by agents/incidents.py.
+-- Routing and action planning run once per incident and the result is kept
+-- in `plan`, which later member complaints reuse.
+
+CREATE TABLE IF NOT EXISTS incidents (
+    id SERIAL PRIMARY KEY,
+    category TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open',            -- open | merged
+    merged_into INTEGER REFERENCES incidents(id),
+    latitude DOUBLE PRECISION NOT NULL,              -- centroid of the members
+    longitude DOUBLE PRECISION NOT NULL,
+    member_count INTEGER NOT NULL DEFAULT 1,
+    severity TEXT,                                   -- highest member severity
+    department TEXT,
+    plan JSONB,                                      -- routing + action planning context fields
+    planned_severity TEXT,
+    planned_by INTEGER REFERENCES complaints(id) ON DELETE SET NULL,
+    planned_at TIMESTAMP WITH TIME ZONE,
+    first_seen TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_seen TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_incidents_open_last_seen
+    ON incidents (last_seen DESC) WHERE status = 'open';
+
+-- incident_seq comes from a sequence and is assigned while the clusterer
+-- holds the category's lock, so each process can pick up the memberships
+-- other processes added since it last looked.
+CREATE SEQUENCE IF NOT EXISTS complaint_incident_seq;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS incident_id INTEGER REFERENCES incidents(id) ON DELETE SET NULL;
+ALTER TABLE complaints ADD COLUMN IF NOT EXISTS incident_seq BIGINT;
+
+CREATE INDEX IF NOT EXISTS idx_complaints_incident_id
+    ON complaints (incident_id) WHERE incident_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_complaints_incident_seq
+    ON complaints (incident_seq) WHERE incident_seq IS NOT NULL;
@@ -0,0 +1,28 @@
+-- Every insert, update and delete on complaints sends a NOTIFY on
+-- complaint_changes, delivered to listeners when the transaction commits.
+-- Each API process keeps the query cache (db/query_cache.py) coherent by
+-- dropping the entries a change affects. `at` is the write time in epoch
+-- milliseconds so listeners can measure delivery lag.
+
+CREATE OR REPLACE FUNCTION notify_complaint_change() RETURNS trigger AS $$
+DECLARE
+    changed complaints%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    PERFORM pg_notify('complaint_changes', json_build_object(
+        'id', changed.id,
+        'op', lower(TG_OP),
+        'at', floor(extract(epoch FROM clock_timestamp()) * 1000)
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS complaints_notify_change ON complaints;
+CREATE TRIGGER complaints_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON complaints
+    FOR EACH ROW EXECUTE FUNCTION notify_complaint_change();
@@ -0,0 +1,66 @@
+-- Change feed: one row per complaint event a dashboard cares about
+-- (created, classified, status changed), written by triggers and announced
+-- on complaint_events with NOTIFY. `seq` is the resume point for WebSocket
+-- clients (/api/feed?since=); rows older than CHANGE_FEED_RETENTION_HOURS
+-- are pruned by the API.
+
+CREATE TABLE IF NOT EXISTS complaint_events (
+    seq BIGSERIAL PRIMARY KEY,
+    complaint_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,                              -- created | classified | status
+    status TEXT,
+    category TEXT,
+    severity TEXT,
+    department TEXT,
+    zone_name TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_complaint_events_created_at ON complaint_events (created_at);
+
+CREATE OR REPLACE FUNCTION record_complaint_event() RETURNS trigger AS $$
+DECLARE
+    event complaint_events%ROWTYPE;
+BEGIN
+    INSERT INTO complaint_events (complaint_id, kind, status, category, severity, department, zone_name)
+    VALUES (
+        NEW.id,
+        CASE
+            WHEN TG_OP = 'INSERT' THEN 'created'
+            WHEN NEW.status IS DISTINCT FROM OLD.status THEN 'status'
+            ELSE 'classified'
+        END,
+        NEW.status, NEW.category, NEW.severity, NEW.department, NEW.zone_name
+    )
+    RETURNING * INTO event;
+    PERFORM pg_notify('complaint_events', json_build_object(
+        'seq', event.seq,
+        'kind', event.kind,
+        'id', event.complaint_id,
+        'status', event.status,
+        'category', event.category,
+        'severity', event.severity,
+        'department', event.department,
+        'zone_name', event.zone_name,
+        'at', floor(extract(epoch FROM event.created_at) * 1000)
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS complaints_event_created ON complaints;
+CREATE TRIGGER complaints_event_created
+    AFTER INSERT ON complaints
+    FOR EACH ROW EXECUTE FUNCTION record_complaint_event();
+
+-- Only updates that change what a dashboard shows become events
+DROP TRIGGER IF EXISTS complaints_event_changed ON complaints;
+CREATE TRIGGER complaints_event_changed
+    AFTER UPDATE ON complaints
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.category IS DISTINCT FROM NEW.category
+          OR OLD.severity IS DISTINCT FROM NEW.severity
+          OR OLD.department IS DISTINCT FROM NEW.department
+          OR OLD.zone_name IS DISTINCT FROM NEW.zone_name)
+    EXECUTE FUNCTION record_complaint_event();
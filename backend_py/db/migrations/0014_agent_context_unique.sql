@@ -0,0 +1,35 @@
+-- migrate:no-transaction
+-- One agent_context row per complaint. Each pipeline run (including
+-- reprocessing and worker retries) replaces the row instead of adding
+-- another, so AgentContext's first save is an upsert on complaint_id.
+-- Existing duplicates are collapsed to the most recently updated row first
+-- (rows without updated_at count as oldest). An index left invalid by a
+-- failed build is dropped first, so rerunning after a failure rebuilds it.
+
+DELETE FROM agent_context
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY complaint_id ORDER BY updated_at DESC NULLS LAST, id DESC
+        ) AS rank
+        FROM agent_context
+    ) ranked
+    WHERE rank > 1
+);
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'idx_agent_context_complaint_unique' AND NOT i.indisvalid
+    ) THEN
+        DROP INDEX idx_agent_context_complaint_unique;
+    END IF;
+END
+$$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_agent_context_complaint_unique
+    ON agent_context (complaint_id);
+
+-- Covered by the unique index
+DROP INDEX CONCURRENTLY IF EXISTS idx_agent_context_complaint;
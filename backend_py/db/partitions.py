@@ -0,0 +1,204 @@
+"""
+Partition maintenance for agent_executions.
+
+agent_executions is range-partitioned by month on created_at (migration 0003)
+with partitions named agent_executions_pYYYYMM. This command:
+
+1. creates the partitions for the current month and the next few months,
+2. detaches partitions that ended before the retention window,
+3. streams each detached partition to a gzip-compressed NDJSON file through
+   a server-side cursor and drops it once the file is safely written.
+
+A partition that was detached but not archived (e.g. the run was interrupted)
+is picked up again on the next run.
+
+Usage:
+    python -m backend_py.db.partitions --retention-months 6 --archive-dir archive/agent_executions
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import List, Tuple
+
+import asyncpg
+from dotenv import load_dotenv
+
+from .connection import get_pool, close_pool
+
+PARENT_TABLE = "agent_executions"
+DEFAULT_PARTITION = "agent_executions_default"
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_RETENTION_MONTHS = 6
+ARCHIVE_FETCH_SIZE = 2000
+
+_PARTITION_RE = re.compile(r"^agent_executions_p(\d{4})(\d{2})$")
+
+
+def add_months(month: date, count: int) -> date:
+    """First day of the month `count` months after `month`."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    today = datetime.now(timezone.utc).date()
+    return today.replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> date:
+    match = _PARTITION_RE.match(name)
+    if not match:
+        raise ValueError(f"Not a monthly partition: {name}")
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+async def missing_months(conn: asyncpg.Connection, months_ahead: int) -> List[date]:
+    """Months from this one to `months_ahead` out that have no partition yet."""
+    start = current_month()
+    missing = []
+    for offset in range(months_ahead + 1):
+        month = add_months(start, offset)
+        if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", partition_name(month)):
+            missing.append(month)
+    return missing
+
+
+async def ensure_partitions(conn: asyncpg.Connection, months_ahead: int) -> List[str]:
+    """Create any missing partitions from this month to `months_ahead` months out."""
+    created = []
+    for month in await missing_months(conn, months_ahead):
+        name = partition_name(month)
+        await conn.execute(
+            f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+        )
+        created.append(name)
+    return created
+
+
+async def attached_partitions(conn: asyncpg.Connection) -> List[str]:
+    rows = await conn.fetch(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+        """,
+        PARENT_TABLE
+    )
+    return sorted(r['relname'] for r in rows if _PARTITION_RE.match(r['relname']))
+
+
+async def detached_partitions(conn: asyncpg.Connection) -> List[str]:
+    """Monthly partition tables that exist but are no longer attached."""
+    rows = await conn.fetch(
+        """
+        SELECT relname
+        FROM pg_class
+        WHERE relkind = 'r' AND NOT relispartition
+          AND relname ~ '^agent_executions_p[0-9]{6}$'
+          AND relnamespace = 'public'::regnamespace
+        """
+    )
+    return sorted(r['relname'] for r in rows)
+
+
+async def detach_expired(conn: asyncpg.Connection, retention_months: int, dry_run: bool = False) -> List[str]:
+    """Detach partitions whose whole month lies before the retention window."""
+    cutoff = add_months(current_month(), -retention_months)
+    expired = [name for name in await attached_partitions(conn) if partition_month(name) < cutoff]
+    if not dry_run:
+        for name in expired:
+            await conn.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+    return expired
+
+
+async def archive_partition(conn: asyncpg.Connection, name: str, archive_dir: Path) -> Tuple[Path, int]:
+    """
+    Stream a detached partition to `<archive_dir>/<name>.ndjson.gz` and drop it.
+
+    Rows are read through a server-side cursor so memory stays flat however
+    large the month was. The file is written under a temporary name and only
+    renamed, and the table dropped, once every row has been flushed.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{name}.ndjson.gz"
+    tmp_path = path.with_name(path.name + ".tmp")
+    rows = 0
+    async with conn.transaction():
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+            async for record in conn.cursor(
+                f"SELECT row_to_json(t)::text AS line FROM {name} t ORDER BY created_at, id",
+                prefetch=ARCHIVE_FETCH_SIZE
+            ):
+                out.write(record['line'])
+                out.write("\n")
+                rows += 1
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        await conn.execute(f"DROP TABLE {name}")
+    return path, rows
+
+
+async def run_maintenance(
+    conn: asyncpg.Connection,
+    months_ahead: int,
+    retention_months: int,
+    archive_dir: Path,
+    dry_run: bool = False,
+):
+    if dry_run:
+        missing = [partition_name(m) for m in await missing_months(conn, months_ahead)]
+        print(f"Would create: {', '.join(missing) or 'nothing'}")
+        expired = await detach_expired(conn, retention_months, dry_run=True)
+        print(f"Would detach and archive: {', '.join(expired + await detached_partitions(conn)) or 'nothing'}")
+        return
+
+    for name in await ensure_partitions(conn, months_ahead):
+        print(f"  + Created {name}")
+    for name in await detach_expired(conn, retention_months):
+        print(f"  - Detached {name}")
+    for name in await detached_partitions(conn):
+        path, rows = await archive_partition(conn, name, archive_dir)
+        print(f"  ↓ Archived {rows} rows from {name} to {path}")
+
+    stray = await conn.fetchval(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION}")
+    if stray:
+        print(f"⚠️  {stray} rows in {DEFAULT_PARTITION}; they fall outside every monthly partition")
+
+
+async def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Create, detach and archive agent_executions partitions")
+    parser.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD,
+                        help="Future monthly partitions to keep ready")
+    parser.add_argument('--retention-months', type=int,
+                        default=int(os.getenv("AGENT_EXECUTIONS_RETENTION_MONTHS", DEFAULT_RETENTION_MONTHS)),
+                        help="Full months of traces to keep online before the current one")
+    parser.add_argument('--archive-dir', type=Path,
+                        default=Path(os.getenv("AGENT_EXECUTIONS_ARCHIVE_DIR", "archive/agent_executions")),
+                        help="Directory for the .ndjson.gz archives")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would change")
+    args = parser.parse_args(argv)
+
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            await run_maintenance(conn, args.months_ahead, args.retention_months, args.archive_dir, args.dry_run)
+    finally:
+        await close_pool()
+    print("✅ Partition maintenance complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,257 @@
+"""
+EXPLAIN-based check that the hot queries are served by indexes.
+
+Seeds a realistic dataset inside a transaction, ANALYZEs it, EXPLAINs every
+hot query used by the routers and agents, and fails if any plan contains a
+sequential scan on one of the large tables. The transaction is always rolled
+back, so it is safe to run against a development database after migrating.
+
+Usage:
+    python -m backend_py.db.plan_check --rows 20000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List, Any, Tuple, Dict
+
+import asyncpg
+from dotenv import load_dotenv
+
+from .connection import get_pool, close_pool
+from . import jobs
+from ..agents import incidents
+from ..change_feed import EVENT_SELECT, CHANGE_FEED_BACKFILL_LIMIT, FeedFilter
+from ..geo import geohash
+from ..geo.spatial import build_spatial_filter
+
+# Tables large enough that a sequential scan on them is a bug
+HOT_TABLES = {'complaints', 'agent_executions', 'agent_context', 'pipeline_jobs', 'incidents',
+              'complaint_events'}
+
+CATEGORIES = ['Sanitation', 'Roads', 'Streetlights', 'Water Supply', 'Drainage', 'Other']
+# Most complaints end up resolved; pending/High are the rare, selective filters
+STATUS_WEIGHTS = {'resolved': 80, 'in-progress': 12, 'pending': 8}
+SEVERITY_WEIGHTS = {'Low': 50, 'Medium': 40, 'High': 10}
+AGENTS_PER_COMPLAINT = 6
+# Share of complaints with an analysed photo
+IMAGE_SHARE = 0.3
+# Seeded complaints per incident
+INCIDENT_SIZE = 5
+# Memberships a warm clusterer has not seen yet when it syncs
+INCIDENT_SYNC_BACKLOG = 50
+# Events a reconnecting dashboard has missed
+FEED_RESUME_BACKLOG = 200
+# Nearly every job has finished; the claim must find the few queued ones by index
+JOB_STATUS_WEIGHTS = {'done': 97, 'failed': 1, 'running': 1, 'queued': 1}
+WARDS = 150
+
+
+class _Rollback(Exception):
+    pass
+
+
+def hot_queries(sample_id: int, incident_watermark: int, feed_seq: int) -> List[Tuple[str, str, List[Any]]]:
+    """(label, sql, params) for the queries issued on every request or agent run.
+
+    Mirrors routers/complaints.py, agents/context.py, agents/gis_agent.py,
+    agents/vision_agent.py, agents/incidents.py, change_feed.py and db/jobs.py.
+    The /stats overview aggregates the whole table by design and is not listed.
+    """
+    near_params: List[Any] = []
+    near = build_spatial_filter(near_params, near=(17.43, 78.45), radius_m=500)
+    bbox_params: List[Any] = []
+    bbox = build_spatial_filter(bbox_params, bbox=(17.42, 78.44, 17.44, 78.46))
+    photo_params: List[Any] = []
+    photo = build_spatial_filter(photo_params, near=(17.43, 78.45), radius_m=500)
+    photo_params.extend([sample_id, 50])
+    feed_params: List[Any] = [feed_seq]
+    feed_where = FeedFilter(departments={'roads & infrastructure'}, severities={'high'}).sql(feed_params)
+    feed_params.append(CHANGE_FEED_BACKFILL_LIMIT + 1)
+    return [
+        ("list: newest first",
+         "SELECT c.* FROM complaints c WHERE 1=1 ORDER BY c.created_at DESC LIMIT 20 OFFSET 0", []),
+        ("list: status + severity",
+         "SELECT c.* FROM complaints c WHERE 1=1 AND c.status = $1 AND c.severity = $2 "
+         "ORDER BY c.created_at DESC LIMIT 20 OFFSET 0", ['pending', 'High']),
+        ("list: status + severity total",
+         "SELECT COUNT(*) FROM complaints c WHERE 1=1 AND c.status = $1 AND c.severity = $2",
+         ['pending', 'High']),
+        ("list: near",
+         f"SELECT c.*, {near['distance']} AS distance_m FROM complaints c "
+         f"WHERE {' AND '.join(near['where'])} ORDER BY distance_m ASC LIMIT 20", near_params),
+        ("list: bbox",
+         f"SELECT c.* FROM complaints c WHERE {' AND '.join(bbox['where'])} "
+         f"ORDER BY c.created_at DESC LIMIT 20", bbox_params),
+        ("detail: row",
+         "SELECT * FROM complaints WHERE id = $1", [sample_id]),
+        ("detail: etag",
+         "SELECT updated_at FROM complaints WHERE id = $1", [sample_id]),
+        ("detail: executions",
+         "SELECT agent_name, execution_time_ms, status, context_delta, output_data, trace_id, created_at "
+         "FROM agent_executions WHERE complaint_id = $1 "
+         "AND created_at >= (SELECT created_at FROM complaints WHERE id = $1) "
+         "ORDER BY created_at ASC, id ASC", [sample_id]),
+        ("context: load",
+         "SELECT context_data FROM agent_context WHERE complaint_id = $1", [sample_id]),
+        ("gis: historical issues",
+         "SELECT category, COUNT(*) as count FROM complaints WHERE ward_number = $1 "
+         "GROUP BY category ORDER BY count DESC LIMIT 3", [90]),
+        ("vision: exact duplicate",
+         "SELECT min(id) FROM complaints WHERE image_sha256 = $1 AND id <> $2", ['ab' * 32, sample_id]),
+        ("vision: similar photos nearby",
+         f"SELECT c.id, c.image_phash FROM complaints c "
+         f"WHERE {' AND '.join(photo['where'])} AND c.image_phash IS NOT NULL "
+         f"AND c.created_at >= NOW() - INTERVAL '30 days' AND c.id <> ${len(photo_params) - 1} "
+         f"ORDER BY c.created_at DESC LIMIT ${len(photo_params)}", photo_params),
+        ("incidents: sync",
+         incidents.SYNC_SQL, [incident_watermark, 'Roads', incidents.window_for('Roads')[1] * 3600.0]),
+        ("feed: catch-up",
+         f"{EVENT_SELECT} WHERE seq > $1 ORDER BY seq LIMIT $2", [feed_seq, CHANGE_FEED_BACKFILL_LIMIT + 1]),
+        ("feed: resume oldest",
+         "SELECT MIN(seq) FROM complaint_events", []),
+        ("feed: resume filtered",
+         f"{EVENT_SELECT} WHERE seq > $1 AND {feed_where} ORDER BY seq LIMIT ${len(feed_params)}", feed_params),
+        ("jobs: claim emergencies",
+         jobs.CLAIM_SQL, ['plan-check', 120.0, 2, 0, jobs.DEFAULT_AGING_SECONDS]),
+        ("jobs: claim",
+         jobs.CLAIM_SQL, ['plan-check', 120.0, 2, 2, jobs.DEFAULT_AGING_SECONDS]),
+    ]
+
+
+async def seed(conn: asyncpg.Connection, rows: int) -> int:
+    """Insert `rows` synthetic complaints with traces, contexts, jobs and incidents
+    (their complaint_events rows come from the triggers); returns a sample id."""
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    statuses = list(STATUS_WEIGHTS)
+    severities = list(SEVERITY_WEIGHTS)
+    records = []
+    for _ in range(rows):
+        lat = rng.uniform(17.20, 17.60)
+        lng = rng.uniform(78.20, 78.70)
+        created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        photo = rng.random() < IMAGE_SHARE
+        records.append((
+            "Seeded complaint for plan check", lat, lng, rng.choice(CATEGORIES),
+            rng.choices(severities, weights=list(SEVERITY_WEIGHTS.values()))[0],
+            rng.choices(statuses, weights=list(STATUS_WEIGHTS.values()))[0],
+            rng.randint(1, WARDS), geohash.encode(lat, lng),
+            f"{rng.getrandbits(256):064x}" if photo else None,
+            f"{rng.getrandbits(64):016x}" if photo else None,
+            created, created,
+        ))
+    await conn.copy_records_to_table(
+        'complaints', records=records,
+        columns=['text', 'latitude', 'longitude', 'category', 'severity', 'status',
+                 'ward_number', 'geohash', 'image_sha256', 'image_phash', 'created_at', 'updated_at'],
+    )
+    first_id = await conn.fetchval("SELECT MAX(id) FROM complaints") - rows + 1
+    await conn.execute(
+        """
+        INSERT INTO agent_executions (complaint_id, agent_name, context_delta, output_data,
+                                      execution_time_ms, status, created_at)
+        SELECT c.id, 'Agent' || g, '{}'::jsonb, '{}'::jsonb, 100, 'success', c.created_at
+        FROM complaints c CROSS JOIN generate_series(1, $2) AS g
+        WHERE c.id >= $1
+        """,
+        first_id, AGENTS_PER_COMPLAINT
+    )
+    await conn.execute(
+        "INSERT INTO agent_context (complaint_id, context_data) "
+        "SELECT id, '{}'::jsonb FROM complaints WHERE id >= $1",
+        first_id
+    )
+    job_statuses = list(JOB_STATUS_WEIGHTS)
+    await conn.copy_records_to_table(
+        'pipeline_jobs', records=[
+            (first_id + i, rng.choices(job_statuses, weights=list(JOB_STATUS_WEIGHTS.values()))[0],
+             rng.randint(0, 2), record[-1], record[-1])
+            for i, record in enumerate(records)
+        ],
+        columns=['complaint_id', 'status', 'priority', 'run_after', 'created_at'],
+    )
+    # Every INCIDENT_SIZE-th complaint opens an incident the following ones join
+    opened = await conn.fetch(
+        "INSERT INTO incidents (category, latitude, longitude, first_seen, last_seen) "
+        "SELECT category, latitude, longitude, created_at, created_at FROM complaints "
+        "WHERE id >= $1 AND (id - $1) % $2 = 0 ORDER BY id RETURNING id",
+        first_id, INCIDENT_SIZE
+    )
+    await conn.execute(
+        "UPDATE complaints c SET incident_id = m.incident_id, incident_seq = nextval('complaint_incident_seq') "
+        "FROM unnest($1::int[], $2::int[]) AS m(complaint_id, incident_id) WHERE c.id = m.complaint_id",
+        list(range(first_id, first_id + rows)),
+        [opened[i // INCIDENT_SIZE]['id'] for i in range(rows)]
+    )
+    for table in HOT_TABLES:
+        await conn.execute(f"ANALYZE {table}")
+    return first_id + rows // 2
+
+
+def _hot_table(relation: str) -> bool:
+    # Monthly partitions (agent_executions_p202501, ...) count as their parent
+    return relation in HOT_TABLES or any(relation.startswith(f"{t}_") for t in HOT_TABLES)
+
+
+def seq_scans(plan: Dict[str, Any]) -> List[str]:
+    """Relations in HOT_TABLES (or their partitions) that the plan reads with a Seq Scan."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and _hot_table(plan.get("Relation Name", "")):
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def check_plans(conn: asyncpg.Connection, rows: int) -> List[str]:
+    """Seed, EXPLAIN every hot query and roll back; returns failure descriptions."""
+    failures: List[str] = []
+    try:
+        async with conn.transaction():
+            sample_id = await seed(conn, rows)
+            watermark = await conn.fetchval("SELECT MAX(incident_seq) FROM complaints") - INCIDENT_SYNC_BACKLOG
+            feed_seq = await conn.fetchval("SELECT MAX(seq) FROM complaint_events") - FEED_RESUME_BACKLOG
+            for label, sql, params in hot_queries(sample_id, watermark, feed_seq):
+                raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *params)
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                # A Seq Scan of an empty partition (e.g. next month's) costs nothing
+                scanned = [r['relname'] for r in await conn.fetch(
+                    "SELECT relname FROM pg_class WHERE relname = ANY($1::text[]) AND relpages > 0",
+                    seq_scans(plan)
+                )]
+                if scanned:
+                    failures.append(f"{label}: Seq Scan on {', '.join(sorted(set(scanned)))}")
+                    print(f"  ✗ {label}: Seq Scan on {', '.join(sorted(set(scanned)))}")
+                else:
+                    print(f"  ✓ {label}: {plan['Node Type']}")
+            raise _Rollback()
+    except _Rollback:
+        pass
+    return failures
+
+
+async def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Fail if a hot query plans a sequential scan")
+    parser.add_argument('--rows', type=int, default=20000, help="Synthetic complaints to seed")
+    args = parser.parse_args(argv)
+
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            print(f"Seeding {args.rows} complaints and checking plans...")
+            failures = await check_plans(conn, args.rows)
+    finally:
+        await close_pool()
+
+    if failures:
+        print(f"❌ {len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} plan a sequential scan")
+        sys.exit(1)
+    print("✅ All hot queries use indexes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+In-process cache of read-endpoint results (complaint list, single complaint, stats).
+
+Entries are keyed by endpoint and normalized parameters, evicted LRU once
+their estimated size passes QUERY_CACHE_MAX_BYTES. A trigger on `complaints`
+(migration 0012) sends NOTIFY on every insert, update and delete; through
+the process's shared LISTEN connection (db/listener.py) each change drops
+the entries it can affect: that complaint's own entries and every
+list/stats entry. While the LISTEN connection is down nothing is cached, so
+a missed notification can never leave a stale entry behind.
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+
+from .listener import listener
+
+QUERY_CACHE = os.getenv("QUERY_CACHE", "on").lower() not in ("0", "off", "false")
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# Larger results (e.g. big list pages) are not worth a slot
+QUERY_CACHE_MAX_ENTRY_BYTES = int(os.getenv("QUERY_CACHE_MAX_ENTRY_BYTES", 1024 * 1024))
+# Backstop against a LISTEN connection that dies without the client noticing
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", 300))
+
+CHANGES_CHANNEL = "complaint_changes"
+
+# Tag of entries that depend on every complaint (lists, stats)
+ALL_COMPLAINTS = "*"
+
+
+def _size_of(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class QueryCache:
+    """LRU of endpoint results with tag-based invalidation."""
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.listening = False
+        self.bytes = 0
+        # key -> (stored_at, size, tag, value)
+        self._entries: "OrderedDict[tuple, Tuple[float, int, Any, Any]]" = OrderedDict()
+        self._tags: Dict[Any, Set[tuple]] = {}
+        # Bumped by every invalidation; a result read before a change is not stored after it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.last_invalidation_lag_ms: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return QUERY_CACHE and self.listening
+
+    def get(self, key: tuple) -> Optional[Any]:
+        if not self.active:
+            self.bypassed += 1
+            return None
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[3]
+
+    def put(self, key: tuple, value: Any, tag: Any, generation: int) -> None:
+        """Store a result read while `generation` was current (skipped if anything changed since)."""
+        if not self.active or generation != self.generation:
+            return
+        size = _size_of(value)
+        if size > self.max_entry_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic(), size, tag, value)
+        self._tags.setdefault(tag, set()).add(key)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key: tuple):
+        _, size, tag, _ = self._entries.pop(key)
+        self.bytes -= size
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def invalidate(self, complaint_id: Optional[int]) -> None:
+        """Drop everything a change to this complaint can affect."""
+        self.generation += 1
+        self.invalidations += 1
+        for tag in (complaint_id, ALL_COMPLAINTS):
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    def _on_notify(self, payload: str):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            self.clear()
+            return
+        self.invalidate(change.get('id'))
+        if change.get('at'):
+            self.last_invalidation_lag_ms = round(time.time() * 1000 - change['at'], 1)
+
+    def _on_listener_state(self, connected: bool):
+        # Changes made while disconnected were never seen, so start empty either way
+        self.listening = connected
+        self.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": QUERY_CACHE,
+            "listening": self.listening,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "last_invalidation_lag_ms": self.last_invalidation_lag_ms,
+        }
+
+
+query_cache = QueryCache(QUERY_CACHE_MAX_BYTES, QUERY_CACHE_MAX_ENTRY_BYTES, QUERY_CACHE_TTL_SECONDS)
+listener.subscribe(CHANGES_CHANNEL, query_cache._on_notify, query_cache._on_listener_state)
@@ -26,48 +26,21 @@ if missing:
 # load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
 from backend_py.db.connection import init_pool, close_pool, get_pool
-
-SCHEMA_SQL = """
-CREATE TABLE IF NOT EXISTS complaints (
-    id SERIAL PRIMARY KEY,
-    text TEXT NOT NULL,
-    latitude DOUBLE PRECISION,
-    longitude DOUBLE PRECISION,
-    address TEXT,
-    category TEXT,
-    severity TEXT,
-    department TEXT,
-    zone_name TEXT,
-    ward_number INTEGER,
-    ai_summary TEXT,
-    suggested_action TEXT,
-    action_plan JSONB,
-    status TEXT DEFAULT 'pending',
-    image_url TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
-
-CREATE TABLE IF NOT EXISTS agent_executions (
-    id SERIAL PRIMARY KEY,
-    complaint_id INTEGER REFERENCES complaints(id),
-    agent_name TEXT NOT NULL,
-    input_data JSONB,
-    output_data JSONB,
-    execution_time_ms INTEGER,
-    status TEXT,
-    error_message TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
-
-CREATE TABLE IF NOT EXISTS agent_context (
-    id SERIAL PRIMARY KEY,
-    complaint_id INTEGER REFERENCES complaints(id),
-    context_data JSONB,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
-"""
+from backend_py.db.migrate import migrate
+from backend_py.geo import geohash, heatmap
+
+async def backfill_geohashes(conn) -> int:
+    """Populate complaints.geohash for rows created before the column existed."""
+    rows = await conn.fetch(
+        "SELECT id, latitude, longitude FROM complaints "
+        "WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL"
+    )
+    if rows:
+        await conn.executemany(
+            "UPDATE complaints SET geohash = $1 WHERE id = $2",
+            [(geohash.encode(r['latitude'], r['longitude']), r['id']) for r in rows]
+        )
+    return len(rows)
 
 async def run_setup():
     print("Initializing database...")
@@ -82,8 +55,12 @@ async def run_setup():
         pool = await get_pool()
         print("✅ Database connection pool created.")
         async with pool.acquire() as conn:
-            await conn.execute(SCHEMA_SQL)
-        print("✅ Database schema created/updated.")
+            applied = await migrate(conn)
+            backfilled = await backfill_geohashes(conn)
+            await heatmap.rebuild(conn)
+        print(f"✅ Database schema created/updated ({len(applied)} migration(s) applied).")
+        print(f"✅ Geohash backfilled for {backfilled} complaints.")
+        print("✅ Heatmap rollup rebuilt.")
     except Exception as e:
         print(f"Error setting up database: {e}")
     finally:
@@ -0,0 +1,475 @@
+"""
+Offline evaluation of the agents against a labelled corpus.
+
+Usage:
+    python -m backend_py.evaluate eval/corpus.jsonl --paths fallback,llm --cassette eval/cassette.jsonl
+    python -m backend_py.evaluate eval/corpus.jsonl --paths fallback,replay --cassette eval/cassette.jsonl
+    python -m backend_py.evaluate eval/corpus.jsonl --stages classification,pipeline --workers 4 --output report.json
+
+Corpus: one JSON object per line with `text`, `latitude`, `longitude`, and
+optionally `id`, `address`, expected labels (`category`, `severity`,
+`department`, `issue_type`; top level or under `expected`) and a `context`
+object of upstream values to hand to the agents under test.
+
+Paths:
+    fallback  rule-based agents only
+    llm       live Gemini calls (needs GEMINI_API_KEY); with --cassette every
+              response is recorded so later runs can replay it
+    replay    responses served from --cassette only; prompts not in it are
+              counted as misses and the agent falls back
+
+Stages are each LLM agent in isolation plus the full CoordinatorAgent
+pipeline. In isolation an agent's inputs come from the rule-based upstream
+agents with labelled values substituted (routing sees the expected category
+and severity), so one stage's score does not depend on another's mistakes.
+Everything runs on in-memory contexts; nothing is written to the database.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import types
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .agents.context import AgentContext
+from .agents.forecasting import forecaster
+from .reprocess import RateLimiter, build_coordinator
+
+PATHS = ('fallback', 'llm', 'replay')
+STAGES = ('understanding', 'classification', 'routing', 'actionPlanning', 'pipeline')
+LLM_AGENTS = ('understanding', 'classification', 'routing', 'actionPlanning')
+LABELS = ('issue_type', 'category', 'severity', 'department')
+
+# Labels each stage is scored on (when the corpus has them)
+STAGE_LABELS = {
+    'understanding': ('issue_type',),
+    'classification': ('category', 'severity'),
+    'routing': ('department',),
+    'actionPlanning': (),
+    'pipeline': ('category', 'severity', 'department'),
+}
+# Rule-based upstream steps, and the labels substituted after each one; the
+# context after a step is the input of the stage named alongside it
+UPSTREAM = (
+    ('understanding', ('issue_type',), None),
+    ('gis', (), 'classification'),
+    ('classification', ('category', 'severity'), 'routing'),
+    ('routing', ('department',), 'actionPlanning'),
+)
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:32]
+
+
+# ----------------------------------------------------------------------
+# Cassette
+# ----------------------------------------------------------------------
+class CassetteMiss(Exception):
+    """No recorded response for this prompt."""
+
+
+class _ReplayedResponse:
+    """A recorded streamed response, chunk by chunk."""
+    def __init__(self, entry: Dict[str, Any], realtime: bool):
+        self._entry = entry
+        self._realtime = realtime
+        self.text = ''.join(entry['chunks'])
+        usage = entry.get('usage')
+        self.usage_metadata = types.SimpleNamespace(**usage) if usage else None
+
+    async def __aiter__(self):
+        for chunk, delay in zip(self._entry['chunks'], self._entry['delays']):
+            if self._realtime and delay:
+                await asyncio.sleep(delay)
+            yield types.SimpleNamespace(text=chunk)
+
+
+class _RecordingResponse:
+    """Passes a live stream through while recording it into the cassette."""
+    def __init__(self, response, key: str, agent_key: str, cassette: "Cassette"):
+        self._response = response
+        self._key = key
+        self._agent_key = agent_key
+        self._cassette = cassette
+        self._chunks: List[str] = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._chunks)
+
+    @property
+    def usage_metadata(self):
+        return getattr(self._response, 'usage_metadata', None)
+
+    async def __aiter__(self):
+        # Recorded as it is consumed: the agent stops reading at the end of the
+        # JSON object (or at malformed output), and replaying exactly what it
+        # read reproduces the same outcome
+        entry = {'key': self._key, 'agent': self._agent_key, 'chunks': self._chunks, 'delays': [], 'usage': None}
+        last = time.monotonic()
+        async for chunk in self._response:
+            now = time.monotonic()
+            entry['delays'].append(round(now - last, 4))
+            last = now
+            self._chunks.append(chunk.text)
+            meta = self.usage_metadata
+            if getattr(meta, 'prompt_token_count', None):
+                entry['usage'] = {'prompt_token_count': meta.prompt_token_count,
+                                  'candidates_token_count': getattr(meta, 'candidates_token_count', None)}
+            self._cassette.put(self._key, entry)
+            yield chunk
+
+
+class Cassette:
+    """Recorded LLM responses keyed by a hash of the exact prompt (JSONL file)."""
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.entries = entries or {}
+        self.recorded: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "Cassette":
+        entries = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry['key']] = entry
+        return cls(entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        self.entries[key] = entry
+        self.recorded[key] = entry
+
+    @staticmethod
+    def append(path: str, entries: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+
+
+class CassetteModel:
+    """
+    Stands in for an agent's Gemini model.
+
+    With `live` set every call goes to it and the response is recorded;
+    without it responses are replayed and a prompt that was never recorded
+    raises CassetteMiss (which the agent treats like any LLM failure).
+    """
+    def __init__(self, agent_key: str, cassette: Cassette, counters: Dict[str, int],
+                 live=None, realtime: bool = False):
+        self.agent_key = agent_key
+        self.cassette = cassette
+        self.counters = counters
+        self.live = live
+        self.realtime = realtime
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        key = prompt_key(prompt)
+        if self.live is not None:
+            response = await self.live.generate_content_async(prompt, stream=True)
+            return _RecordingResponse(response, key, self.agent_key, self.cassette)
+        entry = self.cassette.get(key)
+        if entry is None:
+            self.counters['cassette_misses'] += 1
+            raise CassetteMiss(f"no recorded {self.agent_key} response for prompt {key}")
+        self.counters['cassette_hits'] += 1
+        return _ReplayedResponse(entry, self.realtime)
+
+
+# ----------------------------------------------------------------------
+# Evaluation
+# ----------------------------------------------------------------------
+def load_corpus(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            expected = dict(record.get('expected') or {})
+            for label in LABELS:
+                if label in record and label not in expected:
+                    expected[label] = record[label]
+            record['expected'] = expected
+            record.setdefault('id', number)
+            records.append(record)
+            if limit and len(records) >= limit:
+                break
+    return records
+
+
+def _matches(predicted: Any, expected: Any) -> bool:
+    return str(predicted or '').strip().lower() == str(expected).strip().lower()
+
+
+def build_path(path: str, args, cassette: Cassette, counters: Dict[str, int], limiter: Optional[RateLimiter]):
+    """A non-persisting coordinator whose LLM agents use the given path."""
+    coordinator = build_coordinator(True, limiter if path == 'llm' else None)
+    for key in ('gis', 'vision'):
+        coordinator.agents[key].use_database = args.with_db
+    for key in LLM_AGENTS:
+        agent = coordinator.agents[key]
+        if path == 'fallback':
+            agent.use_fallback = True
+            continue
+        if path == 'llm':
+            live = getattr(agent, 'model', None)
+            if live is None:
+                raise SystemExit("❌ The llm path needs GEMINI_API_KEY")
+            agent.model = CassetteModel(key, cassette, counters, live=live) if args.cassette else live
+        else:
+            agent.model = CassetteModel(key, cassette, counters, realtime=args.realtime)
+        agent.use_fallback = False
+    coordinator.llm_agents = set() if path == 'fallback' else set(LLM_AGENTS)
+    return coordinator
+
+
+async def upstream_contexts(record: Dict[str, Any], baseline) -> Dict[str, AgentContext]:
+    """Input context for each isolated stage: rule-based upstream output,
+    overridden by the record's `context` and its labels."""
+    context = AgentContext(record['id'], persist=False)
+    seed = {
+        "original_text": record['text'],
+        "latitude": record.get('latitude'),
+        "longitude": record.get('longitude'),
+        "address": record.get('address'),
+    }
+    seed.update(record.get('context') or {})
+    await context.update('Evaluator', seed)
+    inputs = {'understanding': context.fork()}
+    labelled: Dict[str, Any] = {}
+    for agent_key, labels, next_stage in UPSTREAM:
+        await baseline.agents[agent_key].execute(context)
+        labelled.update({label: record['expected'][label] for label in labels if label in record['expected']})
+        await context.update('Evaluator', dict(record.get('context') or {}, **labelled))
+        if next_stage:
+            inputs[next_stage] = context.fork()
+    return inputs
+
+
+def _measurement(path: str, stage: str, record: Dict[str, Any], latency_ms: float,
+                 predicted: Dict[str, Any], tokens: Tuple[int, int], llm_fallback: bool,
+                 error: Optional[str] = None) -> Dict[str, Any]:
+    scored = {}
+    for label in STAGE_LABELS[stage]:
+        if label in record['expected']:
+            scored[label] = _matches(predicted.get(label), record['expected'][label])
+    return {
+        "path": path, "stage": stage, "id": record['id'], "latency_ms": latency_ms,
+        "correct": scored, "input_tokens": tokens[0], "output_tokens": tokens[1],
+        "llm_fallback": llm_fallback, "error": error,
+    }
+
+
+async def evaluate_record(record: Dict[str, Any], paths: Dict[str, Any], stages: List[str],
+                          baseline) -> List[Dict[str, Any]]:
+    results = []
+    inputs = await upstream_contexts(record, baseline)
+    for path, coordinator in paths.items():
+        for stage in stages:
+            if stage == 'pipeline':
+                results.append(await _run_pipeline(path, record, coordinator))
+                continue
+            context = inputs[stage].fork()
+            start = time.perf_counter()
+            try:
+                output = await coordinator.agents[stage].execute(context)
+                error = None
+            except Exception as e:
+                output, error = {}, str(e)
+            latency = (time.perf_counter() - start) * 1000
+            usage = output.get('usage') or {}
+            results.append(_measurement(
+                path, stage, record, latency, context.get_all(),
+                (usage.get('input_tokens', 0), usage.get('output_tokens', 0)),
+                path != 'fallback' and not usage, error
+            ))
+    return results
+
+
+async def _run_pipeline(path: str, record: Dict[str, Any], coordinator) -> Dict[str, Any]:
+    complaint = {
+        "id": record['id'],
+        "text": record['text'],
+        "latitude": record.get('latitude'),
+        "longitude": record.get('longitude'),
+        "address": record.get('address'),
+        "image_url": record.get('image_url'),
+    }
+    start = time.perf_counter()
+    processed = await coordinator.process_complaint(complaint)
+    latency = (time.perf_counter() - start) * 1000
+    log = processed.get('execution_log', [])
+    tokens = (sum(e.get('tokens', {}).get('input_tokens', 0) for e in log),
+              sum(e.get('tokens', {}).get('output_tokens', 0) for e in log))
+    llm_fallback = path != 'fallback' and any(
+        e['name'] in {coordinator.agents[k].name for k in LLM_AGENTS} and 'tokens' not in e for e in log
+    )
+    error = None if processed.get('success') else "pipeline fell back to manual review"
+    return _measurement(path, 'pipeline', record, latency, processed['result'], tokens, llm_fallback, error)
+
+
+async def evaluate_shard(records: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Evaluate records in this process; returns raw measurements and new cassette entries."""
+    if not args.with_db:
+        # Predictive agent: no history offline, so no recurrence-based elevation
+        forecaster.fit([], datetime.now(timezone.utc).date())
+    cassette = Cassette.load(args.cassette)
+    counters = defaultdict(int)
+    limiter = RateLimiter(args.llm_rate / args.workers) if args.llm_rate else None
+    baseline = build_path('fallback', args, cassette, counters, None)
+    paths = {path: build_path(path, args, cassette, counters, limiter) for path in args.paths}
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(record):
+        async with semaphore:
+            return await evaluate_record(record, paths, args.stages, baseline)
+
+    batches = await asyncio.gather(*(run(r) for r in records))
+    return {
+        "measurements": [m for batch in batches for m in batch],
+        "recorded": list(cassette.recorded.values()),
+        "counters": dict(counters),
+    }
+
+
+def _run_shard_process(records: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    load_dotenv()
+    return asyncio.run(evaluate_shard(records, args))
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+def summarize(measurements: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+    for m in measurements:
+        groups[(m['stage'], m['path'])].append(m)
+    report: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    for (stage, path), rows in sorted(groups.items(), key=lambda g: (STAGES.index(g[0][0]), g[0][1])):
+        latencies = sorted(m['latency_ms'] for m in rows)
+        accuracy = {}
+        for label in STAGE_LABELS[stage]:
+            scored = [m['correct'][label] for m in rows if label in m['correct']]
+            if scored:
+                accuracy[label] = {"correct": sum(scored), "labelled": len(scored),
+                                   "accuracy": round(sum(scored) / len(scored), 3)}
+        report[stage][path] = {
+            "n": len(rows),
+            "errors": sum(1 for m in rows if m['error']),
+            "llm_fallbacks": sum(1 for m in rows if m['llm_fallback']),
+            "accuracy": accuracy,
+            "latency_ms": {"p50": _percentile(latencies, 0.50), "p95": _percentile(latencies, 0.95),
+                           "max": round(latencies[-1], 1) if latencies else None,
+                           "mean": round(sum(latencies) / len(latencies), 1) if latencies else None},
+            "tokens": {"input": sum(m['input_tokens'] for m in rows),
+                       "output": sum(m['output_tokens'] for m in rows)},
+        }
+    return dict(report)
+
+
+def print_report(report: Dict[str, Dict[str, Any]], counters: Dict[str, int]):
+    for stage, paths in report.items():
+        print(f"\n📊 {stage}")
+        print(f"  {'path':<9} {'n':>5} {'accuracy':<50} {'p50 ms':>8} {'p95 ms':>8} {'tokens in/out':>15} {'llm→rules':>9}")
+        for path, s in paths.items():
+            accuracy = ", ".join(f"{label} {a['accuracy']:.1%}" for label, a in s['accuracy'].items()) or "-"
+            print(f"  {path:<9} {s['n']:>5} {accuracy:<50} {s['latency_ms']['p50'] or 0:>8.1f} "
+                  f"{s['latency_ms']['p95'] or 0:>8.1f} {s['tokens']['input']:>7}/{s['tokens']['output']:<7} "
+                  f"{s['llm_fallbacks']:>9}")
+    if counters:
+        print(f"\n📼 Cassette: {counters.get('cassette_hits', 0)} replayed, {counters.get('cassette_misses', 0)} missing")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score the agents against a labelled complaint corpus")
+    parser.add_argument('corpus', help="Labelled JSONL corpus")
+    parser.add_argument('--paths', default='fallback',
+                        help=f"Comma-separated paths to compare: {', '.join(PATHS)} (default: fallback)")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Comma-separated stages (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--cassette', help="JSONL file of recorded LLM responses (replayed, and appended to by the llm path)")
+    parser.add_argument('--realtime', action='store_true', help="Replay recorded responses with their original timing")
+    parser.add_argument('--with-db', action='store_true',
+                        help="Let the GIS and predictive agents query the database (default: fully offline)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes to spread the corpus over")
+    parser.add_argument('--concurrency', type=int, default=4, help="Records in flight per process")
+    parser.add_argument('--llm-rate', type=float, default=2.0, help="Max live LLM calls per second in total (0 = unlimited)")
+    parser.add_argument('--limit', type=int, help="Only the first N records")
+    parser.add_argument('--output', help="Also write the report (and per-record results) as JSON")
+    args = parser.parse_args(argv)
+    args.paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    args.stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    for path in args.paths:
+        if path not in PATHS:
+            parser.error(f"unknown path {path!r}")
+    for stage in args.stages:
+        if stage not in STAGES:
+            parser.error(f"unknown stage {stage!r}")
+    if 'replay' in args.paths and not args.cassette:
+        parser.error("the replay path needs --cassette")
+    args.workers = max(1, args.workers)
+    return args
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    records = load_corpus(args.corpus, args.limit)
+    if not records:
+        print("Nothing to evaluate")
+        return
+    args.workers = min(args.workers, len(records))
+    print(f"🧪 Evaluating {len(records)} record(s): paths {', '.join(args.paths)}; "
+          f"stages {', '.join(args.stages)}; {args.workers} worker(s)")
+
+    start = time.time()
+    shards = [records[i::args.workers] for i in range(args.workers)]
+    if args.workers == 1:
+        outputs = [_run_shard_process(shards[0], args)]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            outputs = list(pool.map(_run_shard_process, shards, [args] * len(shards)))
+
+    measurements = [m for out in outputs for m in out['measurements']]
+    counters = defaultdict(int)
+    for out in outputs:
+        for name, value in out['counters'].items():
+            counters[name] += value
+    recorded = {e['key']: e for out in outputs for e in out['recorded']}
+    if args.cassette and recorded:
+        Cassette.append(args.cassette, list(recorded.values()))
+        print(f"📼 Recorded {len(recorded)} response(s) to {args.cassette}")
+
+    report = summarize(measurements)
+    print_report(report, dict(counters))
+    print(f"\n✓ Done in {time.time() - start:.1f}s")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"paths": args.paths, "stages": args.stages, "records": len(records),
+                       "report": report, "cassette": dict(counters), "results": measurements}, f, indent=2)
+        print(f"📝 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Offline gazetteer: resolves free-text addresses to coordinates.
+
+Places (localities, landmarks, roads) are read from a CSV
+(GAZETTEER_FILE: name, kind, latitude, longitude, radius_m, aliases with `|`
+between aliases) into an inverted index from normalized tokens to place
+names. Misspelt query tokens are matched to indexed tokens within one or two
+edits through a precomputed deletion table, so a lookup is a few dictionary
+probes and no external geocoder is called.
+
+A name matches when the address covers most of its idf-weighted tokens
+(every number in it must match exactly: "Road No 10" is not "Road No 12").
+Among matches, the best covered wins, then the most specific (smallest
+radius), so "near Apollo Hospital, Jubilee Hills" resolves to the hospital.
+
+Usage:
+    python -m backend_py.geo.gazetteer "Opp KBR park, Road no 12 Banjara hills"
+"""
+import csv
+import math
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .geohash import haversine_m
+
+GAZETTEER_FILE = os.getenv("GAZETTEER_FILE", str(Path(__file__).resolve().parent / "data" / "gazetteer.csv"))
+# Fraction of a name's token weight the address must cover
+GAZETTEER_MIN_SCORE = float(os.getenv("GAZETTEER_MIN_SCORE", 0.75))
+# GPS further than a place's radius plus this from the place the address names is flagged
+GAZETTEER_TOLERANCE_M = float(os.getenv("GAZETTEER_TOLERANCE_M", 1000))
+
+# A fuzzy token match counts for this much of the token's weight
+FUZZY_WEIGHT = 0.8
+# Tokens shorter than this are only matched exactly
+FUZZY_MIN_LENGTH = 4
+# Tokens at least this long may be two edits away; shorter ones one
+FUZZY_TWO_EDITS_LENGTH = 8
+
+ABBREVIATIONS = {
+    "rd": "road", "st": "street", "ave": "avenue", "ln": "lane", "hosp": "hospital",
+    "stn": "station", "rly": "railway", "num": "no", "number": "no", "nagr": "nagar",
+    "clny": "colony", "mkt": "market", "univ": "university", "hitech": "hitec",
+}
+# Directions and filler that never identify a place
+STOPWORDS = {
+    "near", "nr", "opp", "opposite", "behind", "beside", "besides", "next", "to", "the", "of",
+    "at", "in", "and", "front", "side", "hyderabad", "hyd", "telangana", "india",
+    "plot", "flat", "house", "door",
+}
+
+
+def normalize(text: Optional[str]) -> List[str]:
+    """Lower-case ASCII tokens with abbreviations expanded and filler and PIN codes removed."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    # "No.10" -> "no", "10"
+    tokens = re.findall(r"[a-z]+|\d+", text)
+    normalized = []
+    for token in tokens:
+        token = ABBREVIATIONS.get(token, token)
+        if token in STOPWORDS or (token.isdigit() and len(token) == 6):
+            continue
+        normalized.append(token)
+    return normalized
+
+
+def _deletes(token: str, max_edits: int) -> Set[str]:
+    """All strings reachable from `token` by deleting up to `max_edits` characters."""
+    variants = {token}
+    frontier = {token}
+    for _ in range(max_edits):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, giving up (limit + 1) once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _max_edits(token: str) -> int:
+    if len(token) < FUZZY_MIN_LENGTH:
+        return 0
+    return 2 if len(token) >= FUZZY_TWO_EDITS_LENGTH else 1
+
+
+class Place:
+    __slots__ = ('name', 'kind', 'latitude', 'longitude', 'radius_m')
+
+    def __init__(self, name: str, kind: str, latitude: float, longitude: float, radius_m: float):
+        self.name = name
+        self.kind = kind
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_m = radius_m
+
+
+class Gazetteer:
+    def __init__(self, places: List[Tuple[Place, List[str]]]):
+        """`places`: each place with its names (the canonical name first, then aliases)."""
+        self.places = [place for place, _ in places]
+        # One entry per (place, name): its distinct tokens
+        self._names: List[Tuple[int, Tuple[str, ...]]] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for place_id, (_, names) in enumerate(places):
+            for name in names:
+                tokens = tuple(dict.fromkeys(normalize(name)))
+                if not tokens:
+                    continue
+                for token in tokens:
+                    self._postings[token].append(len(self._names))
+                self._names.append((place_id, tokens))
+        n = len(self._names)
+        self._idf = {token: math.log(1 + n / len(ids)) for token, ids in self._postings.items()}
+        self._name_weight = [sum(self._idf[t] for t in tokens) for _, tokens in self._names]
+        self._deletions: Dict[str, Set[str]] = defaultdict(set)
+        for token in self._postings:
+            for variant in _deletes(token, _max_edits(token)):
+                self._deletions[variant].add(token)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Gazetteer":
+        places = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                place = Place(row["name"].strip(), row["kind"].strip(), float(row["latitude"]),
+                              float(row["longitude"]), float(row.get("radius_m") or 1000))
+                aliases = [a.strip() for a in (row.get("aliases") or "").split("|") if a.strip()]
+                places.append((place, [place.name] + aliases))
+        return cls(places)
+
+    def _match_token(self, token: str) -> Dict[str, float]:
+        """Indexed tokens this query token stands for, with the credit each one gets."""
+        if token in self._postings:
+            return {token: 1.0}
+        max_edits = _max_edits(token)
+        if not max_edits:
+            return {}
+        matches = {}
+        for variant in _deletes(token, max_edits):
+            for candidate in self._deletions.get(variant, ()):
+                if candidate not in matches and not candidate.isdigit() and \
+                        _edit_distance(token, candidate, max_edits) <= max_edits:
+                    matches[candidate] = FUZZY_WEIGHT
+        return matches
+
+    def resolve(self, address: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The place an address names, or None."""
+        credit: Dict[str, float] = {}
+        for token in normalize(address):
+            for indexed, weight in self._match_token(token).items():
+                credit[indexed] = max(credit.get(indexed, 0.0), weight)
+        if not credit:
+            return None
+
+        candidates = {name_id for token in credit for name_id in self._postings[token]}
+        best = None
+        for name_id in candidates:
+            place_id, tokens = self._names[name_id]
+            if any(t.isdigit() and t not in credit for t in tokens):
+                continue
+            score = sum(self._idf[t] * credit.get(t, 0.0) for t in tokens) / self._name_weight[name_id]
+            if score < GAZETTEER_MIN_SCORE:
+                continue
+            place = self.places[place_id]
+            key = (round(score, 2), -place.radius_m, len(tokens))
+            if best is None or key > best[0]:
+                best = (key, place, score, tokens)
+        if best is None:
+            return None
+        _, place, score, tokens = best
+        return {
+            "name": place.name,
+            "kind": place.kind,
+            "latitude": place.latitude,
+            "longitude": place.longitude,
+            "radius_m": place.radius_m,
+            "score": round(score, 3),
+            "matched_name": " ".join(tokens),
+        }
+
+
+def check_location(match: Optional[Dict[str, Any]], lat: Optional[float], lng: Optional[float]) -> Dict[str, Any]:
+    """Distance from the GPS point to the place the address names, and whether it is too far."""
+    if match is None or lat is None or lng is None:
+        return {"distance_m": None, "mismatch": False}
+    distance = haversine_m(lat, lng, match["latitude"], match["longitude"])
+    return {"distance_m": round(distance), "mismatch": distance > match["radius_m"] + GAZETTEER_TOLERANCE_M}
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """The shared gazetteer, loaded on first use (None if GAZETTEER_FILE cannot be read)."""
+    global _gazetteer
+    if _gazetteer is None:
+        try:
+            _gazetteer = Gazetteer.from_csv(GAZETTEER_FILE)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️  Gazetteer unavailable ({GAZETTEER_FILE}): {e}")
+            return None
+    return _gazetteer
+
+
+if __name__ == "__main__":
+    gazetteer = get_gazetteer()
+    for query in sys.argv[1:]:
+        start = time.perf_counter()
+        result = gazetteer.resolve(query)
+        print(f"{query!r} -> {result} ({(time.perf_counter() - start) * 1e6:.0f}µs)")
@@ -0,0 +1,138 @@
+import math
+from typing import List, Tuple
+
+# Standard geohash base32 alphabet. Every character is ASCII and sorts in the
+# same order as its bit value, so with a "C" collation a geohash prefix maps to
+# one contiguous B-tree range: [prefix, prefix || '{').
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(BASE32)}
+
+# Character that sorts directly after 'z' - used as the exclusive upper bound
+PREFIX_UPPER = "{"
+
+# Precision stored on complaints (~4.8m x 4.8m cells)
+STORED_PRECISION = 9
+
+EARTH_RADIUS_M = 6371008.8
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lng, max_lat, max_lng)
+
+
+def encode(lat: float, lng: float, precision: int = STORED_PRECISION) -> str:
+    """Encode a point as a geohash string."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> BBox:
+    """Return the (min_lat, min_lng, max_lat, max_lng) cell for a geohash."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Return the (lat_degrees, lng_degrees) size of a cell at this precision."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_prefixes(bbox: BBox, max_cells: int = 32, max_precision: int = STORED_PRECISION) -> List[str]:
+    """
+    Return the geohash cells that cover a bounding box.
+
+    Picks the finest precision (up to `max_precision`) whose cover needs at most
+    `max_cells` cells, so each cell becomes one small index range scan.
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+
+    precision = min(max_precision, STORED_PRECISION)
+    while precision > 1:
+        lat_step, lng_step = cell_size(precision)
+        rows = math.floor(max_lat / lat_step) - math.floor(min_lat / lat_step) + 1
+        cols = math.floor(max_lng / lng_step) - math.floor(min_lng / lng_step) + 1
+        if rows * cols <= max_cells:
+            break
+        precision -= 1
+
+    lat_step, lng_step = cell_size(precision)
+    cells = set()
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells.add(encode(min(lat, max_lat), min(lng, max_lng), precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + lng_step, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + lat_step, max_lat)
+    return sorted(cells)
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat: float, lng: float, radius_m: float) -> BBox:
+    """Bounding box that fully contains a circle of `radius_m` around a point."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
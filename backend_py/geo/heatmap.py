@@ -0,0 +1,196 @@
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+import asyncpg
+
+from .spatial import prefix_ranges_sql
+
+# Geohash precisions kept in the rollup table (roughly city -> street level)
+HEATMAP_PRECISIONS = (4, 5, 6, 7)
+
+# Tiles are this many characters coarser than the requested cell precision,
+# so a tile holds up to 32^2 = 1024 cells.
+TILE_DEPTH = 2
+
+# Sentinels used in place of NULL so rows can be part of the primary key
+UNCLASSIFIED = 'Unclassified'
+UNKNOWN_SEVERITY = 'Unknown'
+
+# Order of the per-cell count columns in the array-encoded response
+SEVERITY_COLUMNS = ('High', 'Medium', 'Low')
+
+
+def _bucket(category: Optional[str], severity: Optional[str], status: Optional[str]) -> Tuple[str, str, str]:
+    return category or UNCLASSIFIED, severity or UNKNOWN_SEVERITY, status or 'pending'
+
+
+async def apply_delta(
+    conn: asyncpg.Connection,
+    geohash: Optional[str],
+    day: date,
+    category: Optional[str],
+    severity: Optional[str],
+    status: Optional[str],
+    delta: int,
+) -> None:
+    """Add `delta` to the rollup counts of one complaint at every precision."""
+    if not geohash:
+        return
+    category, severity, status = _bucket(category, severity, status)
+    cells = [geohash[:p] for p in HEATMAP_PRECISIONS]
+    await conn.execute(
+        """
+        INSERT INTO complaint_grid_counts (cell, precision, day, category, severity, status, count)
+        SELECT cell, length(cell), $2, $3, $4, $5, $6
+        FROM unnest($1::text[]) AS cell
+        ON CONFLICT (precision, cell, day, category, severity, status)
+        DO UPDATE SET count = complaint_grid_counts.count + EXCLUDED.count
+        """,
+        cells, day, category, severity, status, delta
+    )
+    tile_cache.invalidate(geohash)
+
+
+async def record_insert(conn: asyncpg.Connection, geohash: Optional[str], day: date, status: str = 'pending') -> None:
+    """Count a freshly inserted (not yet classified) complaint."""
+    await apply_delta(conn, geohash, day, None, None, status, 1)
+
+
+async def record_change(conn: asyncpg.Connection, geohash: Optional[str], day: date,
+                        old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """Move one complaint between buckets after classification or a status change."""
+    old_bucket = _bucket(old.get('category'), old.get('severity'), old.get('status'))
+    new_bucket = _bucket(new.get('category'), new.get('severity'), new.get('status'))
+    if old_bucket == new_bucket:
+        return
+    await apply_delta(conn, geohash, day, *old_bucket, -1)
+    await apply_delta(conn, geohash, day, *new_bucket, 1)
+
+
+async def rebuild(conn: asyncpg.Connection) -> None:
+    """Recompute the whole rollup table from `complaints`."""
+    async with conn.transaction():
+        await conn.execute("TRUNCATE complaint_grid_counts")
+        await conn.execute(
+            """
+            INSERT INTO complaint_grid_counts (cell, precision, day, category, severity, status, count)
+            SELECT left(c.geohash, p), p, (c.created_at AT TIME ZONE 'UTC')::date,
+                   COALESCE(c.category, $2), COALESCE(c.severity, $3), COALESCE(c.status, 'pending'),
+                   COUNT(*)
+            FROM complaints c, unnest($1::int[]) AS p
+            WHERE c.geohash IS NOT NULL
+            GROUP BY 1, 2, 3, 4, 5, 6
+            """,
+            list(HEATMAP_PRECISIONS), UNCLASSIFIED, UNKNOWN_SEVERITY
+        )
+    tile_cache.clear()
+
+
+class TileCache:
+    """
+    Small in-process LRU of heatmap tiles.
+
+    Keyed by (tile prefix, precision, filters); entries expire after `ttl`
+    seconds so writes made by other processes show up eventually, and local
+    writes drop every tile containing the changed cell immediately.
+    """
+    def __init__(self, max_entries: int = 2048, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[float, List[list]]]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[List[list]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, cells = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return cells
+
+    def put(self, key: tuple, cells: List[list]) -> None:
+        self._entries[key] = (time.monotonic(), cells)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, geohash: str) -> None:
+        for key in [k for k in self._entries if geohash.startswith(k[0])]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+tile_cache = TileCache()
+
+
+async def fetch_tiles(
+    conn: asyncpg.Connection,
+    tiles: List[str],
+    precision: int,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> List[list]:
+    """
+    Return array-encoded cells `[cell, total, high, medium, low]` for the tiles.
+
+    Cached tiles are served from memory; the remaining ones are loaded with a
+    single query over the rollup table and cached individually.
+    """
+    filters = (category, status, since, until)
+    result: List[list] = []
+    missing: List[str] = []
+    for tile in tiles:
+        cached = tile_cache.get((tile, precision) + filters)
+        if cached is None:
+            missing.append(tile)
+        else:
+            result.extend(cached)
+
+    if not missing:
+        return result
+
+    params: List[Any] = [precision]
+    where = ["g.precision = $1", prefix_ranges_sql(params, "g.cell", missing)]
+    if category:
+        params.append(category)
+        where.append(f"g.category = ${len(params)}")
+    if status:
+        params.append(status)
+        where.append(f"g.status = ${len(params)}")
+    if since:
+        params.append(since)
+        where.append(f"g.day >= ${len(params)}")
+    if until:
+        params.append(until)
+        where.append(f"g.day <= ${len(params)}")
+
+    severity_cols = ", ".join(
+        f"SUM(g.count) FILTER (WHERE g.severity = '{s}')" for s in SEVERITY_COLUMNS
+    )
+    # covering_prefixes returns tiles of a single length
+    tile_len = len(missing[0])
+    rows = await conn.fetch(
+        f"""
+        SELECT left(g.cell, {tile_len}) AS tile, g.cell, SUM(g.count) AS total, {severity_cols}
+        FROM complaint_grid_counts g
+        WHERE {' AND '.join(where)}
+        GROUP BY g.cell
+        HAVING SUM(g.count) > 0
+        """,
+        *params
+    )
+
+    by_tile: Dict[str, List[list]] = {tile: [] for tile in missing}
+    for r in rows:
+        by_tile[r['tile']].append([r['cell']] + [int(v or 0) for v in list(r.values())[2:]])
+    for tile, cells in by_tile.items():
+        tile_cache.put((tile, precision) + filters, cells)
+        result.extend(cells)
+    return result
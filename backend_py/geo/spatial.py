@@ -0,0 +1,101 @@
+from typing import Dict, Any, List, Optional
+import asyncpg
+
+from .geohash import BBox, PREFIX_UPPER, EARTH_RADIUS_M, covering_prefixes, bbox_around
+
+
+def distance_sql(lat_ref: str, lng_ref: str) -> str:
+    """Haversine distance in metres from complaints.latitude/longitude to a point."""
+    return (
+        f"(2 * {EARTH_RADIUS_M} * asin(sqrt("
+        f"power(sin(radians(c.latitude - {lat_ref}) / 2), 2) + "
+        f"cos(radians({lat_ref})) * cos(radians(c.latitude)) * "
+        f"power(sin(radians(c.longitude - {lng_ref}) / 2), 2))))"
+    )
+
+
+def prefix_ranges_sql(params: List[Any], column: str, prefixes: List[str]) -> str:
+    """
+    OR of `[prefix, prefix || '{')` ranges on a C-collated geohash column.
+
+    Bounds are passed as separate parameters rather than joined from an array
+    so the planner sees real values and builds a BitmapOr of index range scans.
+    """
+    ranges = []
+    for prefix in prefixes:
+        params.append(prefix)
+        params.append(prefix + PREFIX_UPPER)
+        ranges.append(f"({column} >= ${len(params) - 1} AND {column} < ${len(params)})")
+    return "(" + " OR ".join(ranges) + ")"
+
+
+def build_spatial_filter(
+    params: List[Any],
+    bbox: Optional[BBox] = None,
+    near: Optional[tuple] = None,
+    radius_m: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Build SQL fragments for a bbox or radius filter over `complaints c`.
+
+    The geohash cells covering the search area become prefix range scans on
+    `idx_complaints_geohash`, and the candidates are then refined with an
+    exact bbox or haversine test. Parameters are appended to `params` in
+    place, matching the numbered-placeholder style used by the routers.
+
+    Returns {"where": [str], "distance": str | None}.
+    """
+    if near is not None:
+        lat, lng = near
+        search_box = bbox_around(lat, lng, radius_m)
+    else:
+        search_box = bbox
+
+    where: List[str] = [prefix_ranges_sql(params, "c.geohash", covering_prefixes(search_box))]
+    distance = None
+    if near is not None:
+        params.append(lat)
+        lat_ref = f"${len(params)}::float8"
+        params.append(lng)
+        lng_ref = f"${len(params)}::float8"
+        distance = distance_sql(lat_ref, lng_ref)
+        params.append(radius_m)
+        where.append(f"{distance} <= ${len(params)}")
+    else:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        params.extend([min_lat, max_lat, min_lng, max_lng])
+        n = len(params)
+        where.append(f"c.latitude BETWEEN ${n-3} AND ${n-2}")
+        where.append(f"c.longitude BETWEEN ${n-1} AND ${n}")
+
+    return {"where": where, "distance": distance}
+
+
+async def find_complaints_near(
+    conn: asyncpg.Connection,
+    lat: float,
+    lng: float,
+    radius_m: float,
+    limit: int = 10,
+    exclude_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Return complaints within `radius_m` of a point, nearest first."""
+    params: List[Any] = []
+    spatial = build_spatial_filter(params, near=(lat, lng), radius_m=radius_m)
+    where = list(spatial["where"])
+    if exclude_id is not None:
+        params.append(exclude_id)
+        where.append(f"c.id <> ${len(params)}")
+    params.append(limit)
+    rows = await conn.fetch(
+        f"""
+        SELECT c.id, c.category, c.severity, c.status, c.created_at,
+               {spatial['distance']} AS distance_m
+        FROM complaints c
+        WHERE {' AND '.join(where)}
+        ORDER BY distance_m ASC
+        LIMIT ${len(params)}
+        """,
+        *params
+    )
+    return [dict(r) for r in rows]
@@ -0,0 +1,404 @@
+"""
+Zone/ward dataset for point-in-zone lookups.
+
+Boundaries come from a versioned GeoJSON file (ZONES_SOURCE=file, the
+default) or the `zones` table (ZONES_SOURCE=db). Either way they are compiled
+once into a binary index file under ZONES_CACHE_DIR:
+
+    magic | header (JSON: version, zone properties, grid) | bboxes |
+    grid cell offsets | grid cell members | WKB offsets | WKB blob
+
+and memory-mapped on load, so a process with a cached index starts without
+parsing GeoJSON or building geometries. Geometries are decoded from WKB the
+first time a lookup reaches them.
+
+The index is swapped atomically: a reload builds the new one off the event
+loop and replaces a single reference, and lookups already in flight finish on
+the old one. Reloads happen when the source changes (checked every
+ZONES_WATCH_SECONDS) or on POST /api/zones/reload.
+
+Usage:
+    python -m backend_py.geo.zones compile                      # build the index now
+    python -m backend_py.geo.zones import wards.geojson         # replace the zones table
+    python -m backend_py.geo.zones lookup 17.43 78.45
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+ZONES_SOURCE = os.getenv("ZONES_SOURCE", "file")
+ZONES_FILE = os.getenv("ZONES_FILE", str(Path(__file__).resolve().parent / "data" / "zones.geojson"))
+ZONES_CACHE_DIR = os.getenv("ZONES_CACHE_DIR", "./cache/zones")
+ZONES_WATCH_SECONDS = float(os.getenv("ZONES_WATCH_SECONDS", 10))
+# Grid cells per axis over the dataset's extent; each cell lists the zones touching it
+ZONES_GRID_SIZE = int(os.getenv("ZONES_GRID_SIZE", 64))
+# Compiled indexes kept in the cache dir (older ones are deleted)
+ZONES_CACHE_KEEP = 4
+
+MAGIC = b"GSZONES1"
+INDEX_SUFFIX = ".zidx"
+
+
+class ZoneDataError(Exception):
+    """The zone source could not be read or compiled."""
+
+
+def _zone_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+    ward = properties.get("ward_number")
+    if ward is None and properties.get("ward_numbers"):
+        ward = properties["ward_numbers"][0]
+    return {"zone_name": properties.get("zone_name"), "ward_number": ward or 0}
+
+
+def _pad(n: int) -> bytes:
+    return b"\0" * (-n % 8)
+
+
+def compile_index(features: List[Dict[str, Any]], version: str, source: str, path: str,
+                  grid_size: int = ZONES_GRID_SIZE) -> None:
+    """Write GeoJSON features as a binary index file (atomically)."""
+    geometries, zones = [], []
+    for feature in features:
+        try:
+            geometry = shape(feature["geometry"])
+        except Exception as e:
+            raise ZoneDataError(f"Invalid geometry for {feature.get('properties')}: {e}") from e
+        if geometry.is_empty:
+            continue
+        geometries.append(geometry)
+        zones.append(_zone_properties(feature.get("properties") or {}))
+    if not geometries:
+        raise ZoneDataError(f"No zones in {source}")
+
+    bboxes = np.array([g.bounds for g in geometries], dtype=np.float64)
+    min_x, min_y = bboxes[:, 0].min(), bboxes[:, 1].min()
+    max_x, max_y = bboxes[:, 2].max(), bboxes[:, 3].max()
+    cell_w = (max_x - min_x) / grid_size or 1.0
+    cell_h = (max_y - min_y) / grid_size or 1.0
+
+    cells: List[List[int]] = [[] for _ in range(grid_size * grid_size)]
+    for i, geometry in enumerate(geometries):
+        shapely.prepare(geometry)
+        x0, y0, x1, y1 = bboxes[i]
+        for gy in range(int((y0 - min_y) / cell_h), min(int((y1 - min_y) / cell_h), grid_size - 1) + 1):
+            for gx in range(int((x0 - min_x) / cell_w), min(int((x1 - min_x) / cell_w), grid_size - 1) + 1):
+                cell = shapely.box(min_x + gx * cell_w, min_y + gy * cell_h,
+                                   min_x + (gx + 1) * cell_w, min_y + (gy + 1) * cell_h)
+                if geometry.intersects(cell):
+                    cells[gy * grid_size + gx].append(i)
+    cell_offsets = np.zeros(len(cells) + 1, dtype=np.int32)
+    cell_offsets[1:] = np.cumsum([len(c) for c in cells])
+    cell_items = np.array([i for c in cells for i in c], dtype=np.int32)
+
+    wkbs = [shapely.to_wkb(g) for g in geometries]
+    wkb_offsets = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    wkb_offsets[1:] = np.cumsum([len(w) for w in wkbs])
+
+    header = json.dumps({
+        "version": version,
+        "source": source,
+        "compiled_at": time.time(),
+        "zones": zones,
+        "grid": {"size": grid_size, "min_x": min_x, "min_y": min_y, "cell_w": cell_w, "cell_h": cell_h},
+        "cell_items": len(cell_items),
+    }).encode()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(_pad(len(MAGIC) + 4 + len(header)))
+        for array in (bboxes, cell_offsets, cell_items, wkb_offsets):
+            data = array.tobytes()
+            f.write(data + _pad(len(data)))
+        f.write(b"".join(wkbs))
+    os.replace(tmp_path, path)
+
+
+class ZoneIndex:
+    """A memory-mapped compiled zone dataset."""
+    def __init__(self, path: str, stamp: str):
+        self.path = path
+        self.stamp = stamp
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ZoneDataError(f"{path} is not a compiled zone index")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        offset = len(MAGIC) + 4
+        header = json.loads(self._mm[offset:offset + header_len])
+        offset += header_len
+        offset += -offset % 8
+
+        self.version: str = header["version"]
+        self.source: str = header["source"]
+        self.compiled_at: float = header["compiled_at"]
+        self.zones: List[Dict[str, Any]] = header["zones"]
+        grid = header["grid"]
+        self._grid_size = grid["size"]
+        self._min_x, self._min_y = grid["min_x"], grid["min_y"]
+        self._cell_w, self._cell_h = grid["cell_w"], grid["cell_h"]
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes + (-array.nbytes % 8)
+            return array
+
+        n = len(self.zones)
+        self._bboxes = take(np.float64, n * 4).reshape(n, 4)
+        self._cell_offsets = take(np.int32, self._grid_size * self._grid_size + 1)
+        self._cell_items = take(np.int32, header["cell_items"])
+        self._wkb_offsets = take(np.int64, n + 1)
+        self._wkb_start = offset
+        self._geometries: Dict[int, Any] = {}
+
+    def _geometry(self, i: int):
+        geometry = self._geometries.get(i)
+        if geometry is None:
+            start = self._wkb_start + int(self._wkb_offsets[i])
+            end = self._wkb_start + int(self._wkb_offsets[i + 1])
+            geometry = shapely.from_wkb(self._mm[start:end])
+            shapely.prepare(geometry)
+            self._geometries[i] = geometry
+        return geometry
+
+    def lookup(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
+        """Properties of the first zone covering the point (boundaries included), or None."""
+        gx = math.floor((lng - self._min_x) / self._cell_w)
+        gy = math.floor((lat - self._min_y) / self._cell_h)
+        # Points on the dataset's far edge belong to the last cell
+        if gx == self._grid_size and lng == self._min_x + self._grid_size * self._cell_w:
+            gx -= 1
+        if gy == self._grid_size and lat == self._min_y + self._grid_size * self._cell_h:
+            gy -= 1
+        if not (0 <= gx < self._grid_size and 0 <= gy < self._grid_size):
+            return None
+        cell = gy * self._grid_size + gx
+        for i in self._cell_items[self._cell_offsets[cell]:self._cell_offsets[cell + 1]]:
+            x0, y0, x1, y1 = self._bboxes[i]
+            if x0 <= lng <= x1 and y0 <= lat <= y1 and shapely.intersects_xy(self._geometry(int(i)), lng, lat):
+                return self.zones[i]
+        return None
+
+
+def _file_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"file:{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _load_file(path: str) -> Tuple[List[Dict[str, Any]], str]:
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        collection = json.loads(data)
+    except ValueError as e:
+        raise ZoneDataError(f"{path} is not valid GeoJSON: {e}") from e
+    version = collection.get("version") or f"sha256:{hashlib.sha256(data).hexdigest()[:12]}"
+    return collection.get("features", []), version
+
+
+async def _db_stamp(conn) -> str:
+    row = await conn.fetchrow(
+        "SELECT COUNT(*) AS n, MAX(updated_at) AS updated, "
+        "array_agg(DISTINCT dataset_version ORDER BY dataset_version) AS versions FROM zones"
+    )
+    return f"db:{row['n']}:{row['updated'].isoformat() if row['updated'] else ''}:{','.join(row['versions'] or [])}"
+
+
+async def _load_db(conn) -> Tuple[List[Dict[str, Any]], str]:
+    rows = await conn.fetch(
+        "SELECT zone_name, ward_number, geometry::text AS geometry, properties::text AS properties, "
+        "dataset_version FROM zones ORDER BY id"
+    )
+    versions = sorted({r['dataset_version'] for r in rows})
+    version = versions[0] if len(versions) == 1 else "mixed:" + hashlib.sha256(
+        ",".join(versions).encode()).hexdigest()[:12]
+    features = [{
+        "type": "Feature",
+        "properties": dict(json.loads(r['properties']), zone_name=r['zone_name'], ward_number=r['ward_number']),
+        "geometry": json.loads(r['geometry']),
+    } for r in rows]
+    return features, version
+
+
+class ZoneRegistry:
+    """
+    The process's current ZoneIndex.
+
+    `stamp` identifies a source revision (file path, mtime and size, or the
+    zones table's row count, last update and versions); the compiled index for
+    a stamp is cached on disk so every process after the first just maps it.
+    """
+    def __init__(self, source: str, path: str, cache_dir: str):
+        self.source = source
+        self.path = path
+        self.cache_dir = cache_dir
+        self.index: Optional[ZoneIndex] = None
+        self.reloads = 0
+        self.load_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Optional[ZoneIndex]:
+        if self.index is None:
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"⚠️  Zone dataset unavailable: {e}")
+        return self.index
+
+    def _cache_path(self, stamp: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(stamp.encode()).hexdigest()[:16] + INDEX_SUFFIX)
+
+    async def _stamp(self) -> Tuple[str, str]:
+        """(source used, stamp). The db source falls back to the file when the table is empty."""
+        if self.source == "db":
+            from ..db.connection import get_pool
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                stamp = await _db_stamp(conn)
+            if not stamp.startswith("db:0:"):
+                return "db", stamp
+        return "file", _file_stamp(self.path)
+
+    async def _compile(self, source: str, cache_path: str):
+        loop = asyncio.get_running_loop()
+        if source == "db":
+            from ..db.connection import get_pool
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                features, version = await _load_db(conn)
+            label = "zones table"
+        else:
+            features, version = await loop.run_in_executor(None, _load_file, self.path)
+            label = self.path
+        await loop.run_in_executor(None, compile_index, features, version, label, cache_path)
+        self._prune(keep=cache_path)
+
+    def _prune(self, keep: str):
+        try:
+            indexes = sorted(Path(self.cache_dir).glob("*" + INDEX_SUFFIX), key=lambda p: p.stat().st_mtime)
+            for stale in indexes[:-ZONES_CACHE_KEEP]:
+                if str(stale) != keep:
+                    stale.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    async def reload(self, force: bool = False) -> bool:
+        """Load the index for the source's current revision; True if a new index was swapped in."""
+        async with self._lock:
+            start = time.monotonic()
+            try:
+                source, stamp = await self._stamp()
+                if not force and self.index is not None and self.index.stamp == stamp:
+                    return False
+                cache_path = self._cache_path(stamp)
+                if force or not os.path.exists(cache_path):
+                    await self._compile(source, cache_path)
+                index = ZoneIndex(cache_path, stamp)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            previous = self.index
+            self.index = index
+            self.reloads += 1
+            self.load_ms = round((time.monotonic() - start) * 1000, 1)
+            self.last_error = None
+            if previous is None or previous.version != index.version or force:
+                print(f"🗺️  Zone dataset {index.version} loaded ({len(index.zones)} zones, {self.load_ms}ms)")
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "configured_source": self.source,
+            "version": index.version if index else None,
+            "source": index.source if index else None,
+            "zones": len(index.zones) if index else 0,
+            "compiled_at": index.compiled_at if index else None,
+            "reloads": self.reloads,
+            "load_ms": self.load_ms,
+            "last_error": self.last_error,
+        }
+
+
+zone_registry = ZoneRegistry(ZONES_SOURCE, ZONES_FILE, ZONES_CACHE_DIR)
+
+
+async def run_zone_watch_loop(interval_seconds: float) -> None:
+    """Reload the zone dataset whenever its source changes (runs as a background task)."""
+    while True:
+        try:
+            await zone_registry.reload()
+        except Exception as e:
+            print(f"Error reloading zone dataset: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def import_geojson(conn, path: str) -> Tuple[int, str]:
+    """Replace the zones table with the features of a GeoJSON file."""
+    features, version = _load_file(path)
+    rows = []
+    for feature in features:
+        properties = feature.get("properties") or {}
+        zone = _zone_properties(properties)
+        rows.append((zone["zone_name"], zone["ward_number"], json.dumps(feature["geometry"]),
+                     json.dumps(properties), version))
+    async with conn.transaction():
+        await conn.execute("DELETE FROM zones")
+        await conn.executemany(
+            "INSERT INTO zones (zone_name, ward_number, geometry, properties, dataset_version) "
+            "VALUES ($1, $2, $3::jsonb, $4::jsonb, $5)",
+            rows
+        )
+    return len(rows), version
+
+
+async def main(argv=None):
+    from dotenv import load_dotenv
+    from ..db.connection import get_pool, close_pool
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compile, import and query the zone dataset")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("compile", help="Build (or rebuild) the binary index for the configured source")
+    importer = sub.add_parser("import", help="Replace the zones table with a GeoJSON file")
+    importer.add_argument("file")
+    lookup = sub.add_parser("lookup", help="Zone for a point")
+    lookup.add_argument("lat", type=float)
+    lookup.add_argument("lng", type=float)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "import":
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                count, version = await import_geojson(conn, args.file)
+            print(f"✅ Imported {count} zones (version {version}); workers pick them up within "
+                  f"{ZONES_WATCH_SECONDS:g}s when ZONES_SOURCE=db")
+        elif args.command == "compile":
+            await zone_registry.reload(force=True)
+            index = zone_registry.index
+            print(f"✅ {index.path}: {len(index.zones)} zones, version {index.version}")
+        else:
+            index = await zone_registry.get()
+            print(index.lookup(args.lat, args.lng) if index else "No zone dataset")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
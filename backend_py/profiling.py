@@ -0,0 +1,283 @@
+"""
+Opt-in request profiling.
+
+A request is profiled when it carries an `X-Profile: 1` header (unless
+PROFILE_HEADER=0) or is picked at random with probability PROFILE_SAMPLE_RATE.
+While a profiled request is in flight a background thread samples the event
+loop thread's Python stack every PROFILE_INTERVAL_MS. Each agent run is also
+recorded as a wall-clock span, so time spent awaiting Gemini or the database
+shows up even while no Python code runs. The result is saved as a speedscope
+file (open it at https://www.speedscope.app) under PROFILE_DIR.
+
+Requests that are not profiled cost one header scan, plus a random() call
+when a sample rate is set; the sampler thread sleeps until it is needed.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Set, Tuple
+from urllib.parse import quote, unquote
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "1") != "0"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 1))
+# Profiles kept on disk; the oldest are deleted beyond this
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 200))
+# Frames kept per sample, counted from the outermost
+MAX_STACK_DEPTH = 128
+
+_HEADER = b"x-profile"
+_FILENAME = re.compile(r"^(?P<id>\d+-[0-9a-f]{6})_(?P<duration_ms>\d+)ms_(?P<method>[A-Z]+)_(?P<path>.*)\.speedscope\.json$")
+
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("request_profile", default=None)
+
+FrameKey = Tuple[str, str, int]
+
+
+class RequestProfile:
+    """Stack samples and agent spans collected for one request."""
+    def __init__(self, method: str, path: str, thread_id: int):
+        self.started_ms = time.time() * 1000
+        self.id = f"{int(self.started_ms)}-{uuid.uuid4().hex[:6]}"
+        self.method = method
+        self.path = path
+        self.thread_id = thread_id
+        self.duration_ms = 0.0
+        self.frames: Dict[FrameKey, int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add_sample(self, stack: List[FrameKey], weight_ms: float):
+        frames = self.frames
+        self.samples.append([frames.setdefault(key, len(frames)) for key in stack])
+        self.weights.append(weight_ms)
+
+    def finish(self):
+        self.duration_ms = time.time() * 1000 - self.started_ms
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        frames = [{"name": name, "file": file, "line": line} for name, file, line in self.frames]
+        profiles = [{
+            "type": "sampled",
+            "name": "Event loop (sampled)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(sum(self.weights), 3),
+            "samples": self.samples,
+            "weights": [round(w, 3) for w in self.weights],
+        }]
+        # Evented profiles must nest, but agents overlap (speculation runs
+        # alongside classification), so spans are packed into lanes
+        lanes: List[List[Tuple[str, float, float]]] = []
+        for span in sorted(self.spans, key=lambda s: s[1]):
+            lane = next((l for l in lanes if l[-1][2] <= span[1]), None)
+            if lane is None:
+                lanes.append([span])
+            else:
+                lane.append(span)
+        for number, lane in enumerate(lanes, 1):
+            events = []
+            for name, start, end in lane:
+                index = len(frames)
+                frames.append({"name": name, "file": "agents"})
+                events.append({"type": "O", "frame": index, "at": round(start - self.started_ms, 3)})
+                events.append({"type": "C", "frame": index, "at": round(end - self.started_ms, 3)})
+            profiles.append({
+                "type": "evented",
+                "name": "Agents (wall clock)" + (f" {number}" if len(lanes) > 1 else ""),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(self.duration_ms, 3),
+                "events": events,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.path} ({round(self.duration_ms)} ms)",
+            "exporter": "geosmart-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+def _stack(frame) -> List[FrameKey]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack[:MAX_STACK_DEPTH]
+
+
+class _Sampler:
+    """One daemon thread sampling the threads of all profiled requests."""
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self._active: Set[RequestProfile] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, profile: RequestProfile):
+        with self._lock:
+            self._active.discard(profile)
+
+    def _run(self):
+        last = time.perf_counter()
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                last = time.perf_counter()
+                continue
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            weight, last = (now - last) * 1000, now
+            frames = sys._current_frames()
+            stacks: Dict[int, List[FrameKey]] = {}
+            # Under the lock, so a profile gets no samples once removed
+            with self._lock:
+                for profile in self._active:
+                    frame = frames.get(profile.thread_id)
+                    if frame is None:
+                        continue
+                    if profile.thread_id not in stacks:
+                        stacks[profile.thread_id] = _stack(frame)
+                    profile.add_sample(stacks[profile.thread_id], weight)
+            del frames
+
+
+sampler = _Sampler(PROFILE_INTERVAL_MS)
+
+
+def record_span(name: str, start_ms: float, end_ms: float):
+    """Record a wall-clock span (epoch milliseconds) on the current request's profile, if any."""
+    profile = _current.get()
+    if profile is not None:
+        profile.spans.append((name, start_ms, end_ms))
+
+
+class ProfileStore:
+    """Speedscope files in a directory; metadata lives in the file names."""
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, profile: RequestProfile) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        name = (f"{profile.id}_{round(profile.duration_ms)}ms_{profile.method}_"
+                f"{quote(profile.path, safe='')[:120]}.speedscope.json")
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(profile.to_speedscope(), f, separators=(',', ':'))
+        self._prune()
+        return path
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            match = _FILENAME.match(name)
+            if match:
+                entries.append(dict(match.groupdict(), file=name))
+        return entries
+
+    def _prune(self):
+        entries = sorted(self._entries(), key=lambda e: e['id'])
+        for entry in entries[:max(len(entries) - self.keep, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, entry['file']))
+            except OSError:
+                pass
+
+    def list(self, limit: int, since_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Profiles started after `since_ms`, slowest first."""
+        profiles = []
+        for entry in self._entries():
+            started_ms = int(entry['id'].split('-')[0])
+            if since_ms is not None and started_ms < since_ms:
+                continue
+            profiles.append({
+                "id": entry['id'],
+                "method": entry['method'],
+                "path": unquote(entry['path']),
+                "duration_ms": int(entry['duration_ms']),
+                "started_at": datetime.fromtimestamp(started_ms / 1000, timezone.utc).isoformat(),
+                "size_bytes": os.path.getsize(os.path.join(self.directory, entry['file'])),
+            })
+        profiles.sort(key=lambda p: p['duration_ms'], reverse=True)
+        return profiles[:limit]
+
+    def path_for(self, profile_id: str) -> Optional[str]:
+        for entry in self._entries():
+            if entry['id'] == profile_id:
+                return os.path.join(self.directory, entry['file'])
+        return None
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_KEEP)
+
+
+def _wants_profile(scope) -> bool:
+    if PROFILE_HEADER:
+        for key, value in scope['headers']:
+            if key == _HEADER:
+                return value not in (b'', b'0')
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling selected requests end to end, including
+    streamed response bodies. The profile id comes back in `X-Profile-Id`.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope['method'], scope['path'], threading.get_ident())
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', [])) + [(b'x-profile-id', profile.id.encode())]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        token = _current.set(profile)
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.remove(profile)
+            _current.reset(token)
+            profile.finish()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, profile_store.save, profile)
+            except Exception as e:
+                print(f"⚠️  Could not save profile {profile.id}: {e}")
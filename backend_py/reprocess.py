@@ -0,0 +1,279 @@
+"""
+Re-run the multi-agent pipeline over existing complaints.
+
+Usage:
+    python -m backend_py.reprocess --run prompt-v2 --category Sanitation --since 2025-01-01
+    python -m backend_py.reprocess --run prompt-v2 --dry-run
+
+Progress is checkpointed per run name in `reprocess_checkpoints`, so re-running
+the same command after an interruption resumes where it left off.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import date, timezone
+from typing import Dict, Any, List, Optional
+
+from dotenv import load_dotenv
+
+from .db.connection import get_pool, close_pool
+from .db.complaints import UPDATE_RESULTS_SQL, result_update_args
+from .agents.coordinator import CoordinatorAgent
+from .geo import heatmap
+
+# Fields compared in dry-run mode
+DIFF_FIELDS = ('category', 'severity', 'department')
+
+
+class RateLimiter:
+    """Token bucket shared by every LLM call in the process."""
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _RateLimitedModel:
+    """Wraps a Gemini model so each generate call waits for a limiter token."""
+    def __init__(self, model, limiter: RateLimiter):
+        self._model = model
+        self._limiter = limiter
+
+    async def generate_content_async(self, *args, **kwargs):
+        await self._limiter.acquire()
+        return await self._model.generate_content_async(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def build_coordinator(dry_run: bool, limiter: Optional[RateLimiter]) -> CoordinatorAgent:
+    coordinator = CoordinatorAgent(persist=not dry_run)
+    if limiter:
+        for agent in coordinator.agents.values():
+            if getattr(agent, 'model', None) is not None and not getattr(agent, 'use_fallback', True):
+                agent.model = _RateLimitedModel(agent.model, limiter)
+    return coordinator
+
+
+def build_selection(args, run_id: int):
+    where = ["NOT EXISTS (SELECT 1 FROM reprocess_checkpoints k "
+             "WHERE k.run_id = $1 AND k.complaint_id = c.id AND k.status = 'done')"]
+    params: List[Any] = [run_id]
+    if args.ids:
+        params.append([int(i) for i in args.ids.split(',')])
+        where.append(f"c.id = ANY(${len(params)}::int[])")
+    for column in ('status', 'category', 'severity'):
+        value = getattr(args, column)
+        if value:
+            params.append(value)
+            where.append(f"c.{column} = ${len(params)}")
+    if args.ward is not None:
+        params.append(args.ward)
+        where.append(f"c.ward_number = ${len(params)}")
+    if args.degraded:
+        where.append("c.degraded_agents <> '{}'")
+    if args.since:
+        params.append(args.since)
+        where.append(f"c.created_at >= ${len(params)}")
+    if args.until:
+        params.append(args.until)
+        where.append(f"c.created_at < ${len(params)}")
+    sql = f"SELECT c.* FROM complaints c WHERE {' AND '.join(where)} ORDER BY c.id"
+    if args.limit:
+        params.append(args.limit)
+        sql += f" LIMIT ${len(params)}"
+    return sql, params
+
+
+async def get_or_create_run(conn, name: str, filters: Dict[str, Any], dry_run: bool) -> int:
+    row = await conn.fetchrow("SELECT id, dry_run FROM reprocess_runs WHERE name = $1", name)
+    if row:
+        if row['dry_run'] != dry_run:
+            raise SystemExit(f"Run '{name}' was started with dry_run={row['dry_run']}; use a new run name")
+        return row['id']
+    return await conn.fetchval(
+        "INSERT INTO reprocess_runs (name, filters, dry_run) VALUES ($1, $2, $3) RETURNING id",
+        name, json.dumps(filters, default=str), dry_run
+    )
+
+
+class Reprocessor:
+    def __init__(self, args, run_id: int):
+        self.args = args
+        self.run_id = run_id
+        limiter = RateLimiter(args.llm_rate) if args.llm_rate else None
+        self.coordinator = build_coordinator(args.dry_run, limiter)
+        self.pending: List[Dict[str, Any]] = []
+        self.flush_lock = asyncio.Lock()
+        self.stats = Counter()
+        self.transitions = Counter()
+
+    async def run(self, rows):
+        queue: asyncio.Queue = asyncio.Queue()
+        for row in rows:
+            queue.put_nowait(dict(row))
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.args.concurrency)]
+        await asyncio.gather(*workers)
+        await self._flush()
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            try:
+                row = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await self._process(row)
+            self.pending.append(result)
+            if len(self.pending) >= self.args.batch_size:
+                await self._flush()
+
+    async def _process(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        complaint_data = {
+            "id": row['id'],
+            "text": row['text'],
+            "latitude": row['latitude'],
+            "longitude": row['longitude'],
+            "address": row['address'],
+            "location_source": row['location_source'],
+            "image_url": row['image_url'],
+        }
+        try:
+            processing_result = await self.coordinator.process_complaint(complaint_data)
+        except Exception as e:
+            return {"row": row, "ok": False, "error": str(e)}
+        if not processing_result.get("success"):
+            return {"row": row, "ok": False, "error": "pipeline fell back to manual review"}
+        return {"row": row, "ok": True, "context": processing_result["result"]}
+
+    async def _flush(self):
+        async with self.flush_lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    done = [r for r in batch if r['ok']]
+                    if done and not self.args.dry_run:
+                        await conn.executemany(
+                            UPDATE_RESULTS_SQL,
+                            [result_update_args(r['context'], r['row']['id']) for r in done]
+                        )
+                        for r in done:
+                            row = r['row']
+                            await heatmap.record_change(
+                                conn, row.get('geohash'), row['created_at'].astimezone(timezone.utc).date(),
+                                row,
+                                {'category': r['context'].get('category'),
+                                 'severity': r['context'].get('severity'),
+                                 'status': row['status']}
+                            )
+                    await conn.executemany(
+                        """
+                        INSERT INTO reprocess_checkpoints (run_id, complaint_id, status, changed, error_message)
+                        VALUES ($1, $2, $3, $4, $5)
+                        ON CONFLICT (run_id, complaint_id) DO UPDATE
+                        SET status = EXCLUDED.status, changed = EXCLUDED.changed,
+                            error_message = EXCLUDED.error_message, processed_at = NOW()
+                        """,
+                        [(self.run_id, r['row']['id'], 'done' if r['ok'] else 'error',
+                          self._record_diff(r), r.get('error')) for r in batch]
+                    )
+            self.stats['processed'] += len(batch)
+            self.stats['errors'] += sum(1 for r in batch if not r['ok'])
+            print(f"  ✓ Flushed {len(batch)} complaints ({self.stats['processed']} total, {self.stats['errors']} errors)")
+
+    def _record_diff(self, result: Dict[str, Any]) -> Optional[bool]:
+        if not result['ok']:
+            return None
+        row, new = result['row'], result['context']
+        changed = False
+        for field in DIFF_FIELDS:
+            if row.get(field) != new.get(field):
+                changed = True
+                self.stats[f'{field}_changed'] += 1
+        if row.get('category') != new.get('category'):
+            self.transitions[(row.get('category'), new.get('category'))] += 1
+        if changed:
+            self.stats['changed'] += 1
+        return changed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run the agent pipeline over existing complaints")
+    parser.add_argument('--run', required=True, help="Run name; reuse it to resume an interrupted run")
+    parser.add_argument('--ids', help="Comma-separated complaint ids")
+    parser.add_argument('--status', choices=['pending', 'in-progress', 'resolved'])
+    parser.add_argument('--category')
+    parser.add_argument('--severity', choices=['Low', 'Medium', 'High'])
+    parser.add_argument('--ward', type=int)
+    parser.add_argument('--degraded', action='store_true', help="Only complaints processed with load-shed agents")
+    parser.add_argument('--since', type=date.fromisoformat, help="Created on/after YYYY-MM-DD")
+    parser.add_argument('--until', type=date.fromisoformat, help="Created before YYYY-MM-DD")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--concurrency', type=int, default=4, help="Pipelines in flight")
+    parser.add_argument('--llm-rate', type=float, default=2.0, help="Max LLM calls per second (0 = unlimited)")
+    parser.add_argument('--batch-size', type=int, default=50, help="Results written per transaction")
+    parser.add_argument('--dry-run', action='store_true', help="Only report how many classifications would change")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    pool = await get_pool()
+    try:
+        filters = {k: v for k, v in vars(args).items()
+                   if k in ('ids', 'status', 'category', 'severity', 'ward', 'degraded', 'since', 'until', 'limit')
+                   and v not in (None, False)}
+        async with pool.acquire() as conn:
+            run_id = await get_or_create_run(conn, args.run, filters, args.dry_run)
+            sql, params = build_selection(args, run_id)
+            rows = await conn.fetch(sql, *params)
+
+        print(f"🔁 Run '{args.run}': {len(rows)} complaints to process"
+              f"{' (dry run)' if args.dry_run else ''}")
+        reprocessor = Reprocessor(args, run_id)
+        start = time.monotonic()
+        await reprocessor.run(rows)
+
+        async with pool.acquire() as conn:
+            remaining = await conn.fetchval(
+                "SELECT COUNT(*) FROM reprocess_checkpoints WHERE run_id = $1 AND status = 'error'", run_id
+            )
+            if remaining == 0:
+                await conn.execute("UPDATE reprocess_runs SET finished_at = NOW() WHERE id = $1", run_id)
+            run_changed = await conn.fetchval(
+                "SELECT COUNT(*) FROM reprocess_checkpoints WHERE run_id = $1 AND changed", run_id
+            )
+
+        stats = reprocessor.stats
+        print(f"\n✓ Processed {stats['processed']} complaints in {time.monotonic() - start:.1f}s "
+              f"({stats['errors']} errors)")
+        print(f"  {'Would change' if args.dry_run else 'Changed'}: {stats['changed']} complaints "
+              + ", ".join(f"{f}={stats[f'{f}_changed']}" for f in DIFF_FIELDS))
+        for (old, new), count in reprocessor.transitions.most_common(10):
+            print(f"    {old} → {new}: {count}")
+        print(f"  Run total (including earlier sessions): {run_changed} changed")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,29 @@
+import asyncio
+import csv
+import io
 import os
 import shutil
-from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+import zlib
+from typing import Dict, List, Optional, Any
+from fastapi import APIRouter, Depends, status, UploadFile, File, Form, Query, Header, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import json
 import asyncpg
+from datetime import date, datetime, timezone
 
-from ..db.connection import db_connection
+from ..db.connection import db_connection, get_pool
+from ..db.complaints import UPDATE_RESULTS_SQL, result_update_args
+from ..db import jobs
+from ..db.query_cache import query_cache, ALL_COMPLAINTS
 from ..agents.coordinator import CoordinatorAgent
+from ..agents.context import AgentContext
+from ..agents.scheduler import pre_score, pipeline_scheduler
+from ..agents.load_shedding import load_shedder
+from ..geo import geohash
+from ..geo.spatial import build_spatial_filter
+from ..geo.gazetteer import get_gazetteer
+from ..geo import heatmap
 
 router = APIRouter()
 
@@ -27,6 +43,10 @@ class APIResponse(BaseModel):
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# "inline" runs the agent pipeline inside the request; "queue" hands it to
+# the worker fleet (python -m backend_py.worker) via pipeline_jobs.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "inline")
+
 async def save_upload(file: UploadFile) -> str:
     # Sanitize filename (basic)
     filename = f"{int(time.time())}_{file.filename}"
@@ -42,27 +62,62 @@ import time
 # ----------------------------------------------------------------------
 @router.post("/complaints", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
 async def create_complaint(
+    response: Response,
     text: str = Form(..., min_length=10),
-    latitude: float = Form(..., ge=-90, le=90),
-    longitude: float = Form(..., ge=-180, le=180),
+    latitude: Optional[float] = Form(None, ge=-90, le=90),
+    longitude: Optional[float] = Form(None, ge=-180, le=180),
     address: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    conn: asyncpg.Connection = Depends(db_connection),
 ):
+    # Without GPS the complaint is located from its address, offline
+    location_source = 'gps'
+    if latitude is None or longitude is None:
+        gazetteer = get_gazetteer()
+        match = gazetteer.resolve(address) if gazetteer and address else None
+        if match is None:
+            response.status_code = status.HTTP_400_BAD_REQUEST
+            return APIResponse(
+                success=False, error="Location required",
+                message="latitude and longitude are required unless the address names a known place"
+            )
+        latitude, longitude, location_source = match['latitude'], match['longitude'], 'address'
+
     try:
         image_url = None
         if image:
             image_url = await save_upload(image)
             
-        # Insert initial complaint
-        complaint_id = await conn.fetchval(
-            """
-            INSERT INTO complaints (text, latitude, longitude, address, status, image_url)
-            VALUES ($1, $2, $3, $4, 'pending', $5)
-            RETURNING id
-            """,
-            text, latitude, longitude, address, image_url
-        )
+        # Cheap urgency estimate so emergencies jump the pipeline queue
+        priority = pre_score(text, latitude, longitude)
+
+        # Connections are taken per phase rather than for the whole request:
+        # a complaint waiting for a pipeline slot must not hold one, or a
+        # burst of routine complaints could starve the pool and keep an
+        # emergency from ever reaching its reserved slot.
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # One transaction, so a queued complaint always has its job and the
+            # worker (woken by the NOTIFY at commit) always finds the complaint
+            async with conn.transaction():
+                # Insert initial complaint
+                cell = geohash.encode(latitude, longitude)
+                inserted = await conn.fetchrow(
+                    """
+                    INSERT INTO complaints (text, latitude, longitude, address, status, image_url, geohash, location_source)
+                    VALUES ($1, $2, $3, $4, 'pending', $5, $6, $7)
+                    RETURNING id, (created_at AT TIME ZONE 'UTC')::date AS created_day
+                    """,
+                    text, latitude, longitude, address, image_url, cell, location_source
+                )
+                complaint_id = inserted['id']
+                await heatmap.record_insert(conn, cell, inserted['created_day'])
+
+                if PIPELINE_MODE == "queue":
+                    job_id = await jobs.enqueue(conn, complaint_id, priority['priority'], priority['reasons'])
+                    row = await conn.fetchrow("SELECT * FROM complaints WHERE id = $1", complaint_id)
+                    response_data = dict(row)
+                    response_data['pipeline_job'] = {"id": job_id, "status": "queued", "priority": priority['label']}
+                    return APIResponse(success=True, data=response_data, message="Complaint queued for processing")
         
         # Trigger Multi-Agent
         coordinator = CoordinatorAgent()
@@ -73,44 +128,39 @@ async def create_complaint(
             "latitude": latitude,
             "longitude": longitude,
             "address": address,
+            "location_source": location_source,
             "image_url": image_url, # Key used in coordinator
             "imageUrl": image_url   # Redundancy for agents that might look for this
         }
         
-        processing_result = await coordinator.process_complaint(complaint_data)
+        async with load_shedder.track(), pipeline_scheduler.slot(priority['priority']) as queue_wait_ms:
+            processing_result = await coordinator.process_complaint(complaint_data)
         context_data = processing_result["result"]
         
-        # Update Database with results
-        # Mapping context fields to DB columns
-        await conn.execute(
-            """
-            UPDATE complaints 
-            SET category = $1, severity = $2, department = $3,
-                zone_name = $4, ward_number = $5, ai_summary = $6,
-                suggested_action = $7, action_plan = $8, updated_at = NOW()
-            WHERE id = $9
-            """,
-            context_data.get('category'),
-            context_data.get('severity'),
-            context_data.get('department'),
-            context_data.get('zone_name'),
-            context_data.get('ward_number'),
-            f"{context_data.get('issue_type') or 'Complaint'} reported in {context_data.get('zone_name') or 'area'}",
-            context_data.get('routing_reasoning') or f"Route to {context_data.get('department')}",
-            json.dumps(context_data.get('action_plan')),
-            complaint_id
-        )
-        
-        # Fetch complete record
-        row = await conn.fetchrow("SELECT * FROM complaints WHERE id = $1", complaint_id)
+        async with pool.acquire() as conn:
+            # Update Database with results
+            await conn.execute(UPDATE_RESULTS_SQL, *result_update_args(context_data, complaint_id))
+            await heatmap.record_change(
+                conn, cell, inserted['created_day'],
+                {'status': 'pending'},
+                {'category': context_data.get('category'), 'severity': context_data.get('severity'), 'status': 'pending'}
+            )
+
+            # Fetch complete record
+            row = await conn.fetchrow("SELECT * FROM complaints WHERE id = $1", complaint_id)
         
         # Convert row to dict and add execution summary
         response_data = dict(row)
         response_data['agent_execution_summary'] = {
             "total_agents": len(processing_result['execution_log']),
             "execution_time_ms": processing_result['total_execution_time_ms'],
+            "priority": priority['label'],
+            "queue_wait_ms": round(queue_wait_ms),
             "agents_executed": processing_result['execution_log']
         }
+        if processing_result.get('speculation'):
+            response_data['agent_execution_summary']['speculation'] = processing_result['speculation']
+        response_data['trace_id'] = processing_result['trace_id']
         
         return APIResponse(success=True, data=response_data)
         
@@ -121,46 +171,108 @@ async def create_complaint(
 # ----------------------------------------------------------------------
 # GET /complaints
 # ----------------------------------------------------------------------
+def _parse_coords(value: str, count: int) -> List[float]:
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != count:
+        raise ValueError(f"expected {count} comma-separated numbers")
+    return parts
+
+def _complaint_filters(params: List[Any], status: Optional[str], severity: Optional[str],
+                       department: Optional[str], bbox: Optional[str], near: Optional[str],
+                       radius_m: float, location_mismatch: Optional[bool] = None):
+    """WHERE clause, distance expression (for `near`, else None) and ordering
+    shared by the list and export endpoints; appends bind values to `params`.
+    Raises ValueError on a bad spatial filter."""
+    where = ["1=1"]
+    order_by = "c.created_at DESC"
+    distance = None
+
+    near_point = tuple(_parse_coords(near, 2)) if near else None
+    bbox_coords = _parse_coords(bbox, 4) if bbox else None
+
+    if near_point or bbox_coords:
+        spatial_box = None
+        if bbox_coords and not near_point:
+            min_lng, min_lat, max_lng, max_lat = bbox_coords
+            spatial_box = (min_lat, min_lng, max_lat, max_lng)
+        spatial = build_spatial_filter(params, bbox=spatial_box, near=near_point, radius_m=radius_m)
+        where.extend(spatial["where"])
+        if spatial["distance"]:
+            distance = spatial["distance"]
+            order_by = "distance_m ASC"
+
+    if status:
+        params.append(status)
+        where.append(f"c.status = ${len(params)}")
+    if severity:
+        params.append(severity)
+        where.append(f"c.severity = ${len(params)}")
+    if department:
+        # ILIKE ignores case, so lower-casing keeps cache keys canonical
+        params.append(f"%{department.lower()}%")
+        where.append(f"c.department ILIKE ${len(params)}")
+    if location_mismatch is not None:
+        where.append("c.location_mismatch" if location_mismatch else "NOT c.location_mismatch")
+
+    return " AND ".join(where), distance, order_by
+
+def _cache_header(response: Response, cached) -> None:
+    # Lets clients and load tests see which reads the query cache served
+    if query_cache.active:
+        response.headers["X-Cache"] = "HIT" if cached is not None else "MISS"
+
 @router.get("/complaints", response_model=APIResponse)
 async def list_complaints(
+    response: Response,
     status: Optional[str] = Query(None, regex="^(pending|in-progress|resolved)$"),
     severity: Optional[str] = Query(None, regex="^(Low|Medium|High)$"),
     department: Optional[str] = None,
+    location_mismatch: Optional[bool] = Query(None, description="Only complaints whose GPS does (or does not) disagree with the address"),
+    bbox: Optional[str] = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    near: Optional[str] = Query(None, description="lat,lng"),
+    radius_m: float = Query(1000, gt=0, le=50000),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    conn: asyncpg.Connection = Depends(db_connection),
 ):
     try:
-        where = ["1=1"]
         params = []
-        
-        if status:
-            params.append(status)
-            where.append(f"status = ${len(params)}")
-        if severity:
-            params.append(severity)
-            where.append(f"severity = ${len(params)}")
-        if department:
-            params.append(f"%{department}%")
-            where.append(f"department ILIKE ${len(params)}")
-            
-        where_clause = " AND ".join(where)
-        
-        # Get Data
-        rows = await conn.fetch(
-            f"SELECT * FROM complaints WHERE {where_clause} ORDER BY created_at DESC LIMIT ${len(params)+1} OFFSET ${len(params)+2}",
-            *params, limit, offset
-        )
-        
-        # Get Total
-        total = await conn.fetchval(
-            f"SELECT COUNT(*) FROM complaints WHERE {where_clause}",
-            *params
-        )
-        
+        try:
+            where_clause, distance, order_by = _complaint_filters(
+                params, status, severity, department, bbox, near, radius_m, location_mismatch
+            )
+        except ValueError as e:
+            return APIResponse(success=False, error="Invalid spatial filter", message=str(e))
+        select = f"c.*, {distance} AS distance_m" if distance else "c.*"
+
+        # The bound parameters are the normalized filters (department is
+        # matched case-insensitively, coordinates are parsed floats)
+        key = ("complaints", where_clause, order_by, tuple(params), limit, offset)
+        cached = query_cache.get(key)
+        _cache_header(response, cached)
+        if cached is not None:
+            data, total = cached
+            return APIResponse(success=True, data=data, total=total, limit=limit, offset=offset)
+
+        generation = query_cache.generation
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # Get Data
+            rows = await conn.fetch(
+                f"SELECT {select} FROM complaints c WHERE {where_clause} ORDER BY {order_by} LIMIT ${len(params)+1} OFFSET ${len(params)+2}",
+                *params, limit, offset
+            )
+
+            # Get Total
+            total = await conn.fetchval(
+                f"SELECT COUNT(*) FROM complaints c WHERE {where_clause}",
+                *params
+            )
+
+        data = [dict(r) for r in rows]
+        query_cache.put(key, (data, total), ALL_COMPLAINTS, generation)
         return APIResponse(
             success=True,
-            data=[dict(r) for r in rows],
+            data=data,
             total=total,
             limit=limit,
             offset=offset
@@ -169,36 +281,284 @@ async def list_complaints(
         print(f"Error fetching complaints: {e}")
         return APIResponse(success=False, error="Failed to fetch complaints", message=str(e))
 
+# ----------------------------------------------------------------------
+# GET /complaints/export
+# ----------------------------------------------------------------------
+# Rows fetched from the server-side cursor per round-trip
+EXPORT_PREFETCH = int(os.getenv("EXPORT_PREFETCH", 1000))
+# Rows serialised into each response chunk
+EXPORT_CHUNK_ROWS = 500
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_json_default)
+    return value
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """An explicit `gzip` entry wins over `*`; an unparsable q counts as 0."""
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if name not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+async def _stream_export(query: str, params: List[Any], columns: List[str], fmt: str, compress: bool):
+    """
+    Yield the export in chunks from a server-side cursor.
+
+    Runs in its own pooled connection (the request's dependency connection is
+    released before a streaming body is sent) inside a read-only REPEATABLE
+    READ transaction, so the dump is one consistent snapshot. Memory stays at
+    one prefetch batch plus one chunk regardless of the result size.
+    """
+    encoder = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return encoder.compress(data) if encoder else data
+
+    if writer:
+        writer.writerow(columns)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(readonly=True, isolation="repeatable_read"):
+            rows = 0
+            async for row in conn.cursor(query, *params, prefetch=EXPORT_PREFETCH):
+                if writer:
+                    writer.writerow([_csv_value(row[c]) for c in columns])
+                else:
+                    buffer.write(json.dumps({c: row[c] for c in columns}, default=_json_default))
+                    buffer.write("\n")
+                rows += 1
+                if rows % EXPORT_CHUNK_ROWS == 0:
+                    chunk = drain()
+                    if chunk:
+                        yield chunk
+                    # Serialising a chunk is CPU work; give other requests a turn
+                    await asyncio.sleep(0)
+    chunk = drain()
+    if encoder:
+        chunk += encoder.flush()
+    if chunk:
+        yield chunk
+
+@router.get("/complaints/export")
+async def export_complaints(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated complaint columns to export"),
+    status: Optional[str] = Query(None, regex="^(pending|in-progress|resolved)$"),
+    severity: Optional[str] = Query(None, regex="^(Low|Medium|High)$"),
+    department: Optional[str] = None,
+    location_mismatch: Optional[bool] = Query(None, description="Only complaints whose GPS does (or does not) disagree with the address"),
+    bbox: Optional[str] = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    near: Optional[str] = Query(None, description="lat,lng"),
+    radius_m: float = Query(1000, gt=0, le=50000),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Every complaint matching the list filters, streamed as CSV or NDJSON."""
+    try:
+        columns = _parse_csv_param(fields) or list(COMPLAINT_COLUMNS)
+        unknown = [f for f in columns if f not in COMPLAINT_COLUMNS]
+        if unknown:
+            return APIResponse(success=False, error="Invalid fields", message=f"Unknown fields: {', '.join(unknown)}")
+        columns = list(dict.fromkeys(columns))
+
+        params = []
+        try:
+            where_clause, distance, order_by = _complaint_filters(
+                params, status, severity, department, bbox, near, radius_m, location_mismatch
+            )
+        except ValueError as e:
+            return APIResponse(success=False, error="Invalid spatial filter", message=str(e))
+        select = ", ".join(f"c.{c}" for c in columns)
+        if distance:
+            select += f", {distance} AS distance_m"
+            columns.append("distance_m")
+        query = f"SELECT {select} FROM complaints c WHERE {where_clause} ORDER BY {order_by}, c.id"
+
+        compress = _accepts_gzip(accept_encoding)
+        headers = {
+            "Content-Disposition": f'attachment; filename="complaints-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"',
+            "Vary": "Accept-Encoding",
+        }
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(
+            _stream_export(query, params, columns, format, compress),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers=headers,
+        )
+    except Exception as e:
+        print(f"Error exporting complaints: {e}")
+        return APIResponse(success=False, error="Failed to export complaints", message=str(e))
+
 # ----------------------------------------------------------------------
 # GET /complaints/{id}
 # ----------------------------------------------------------------------
+# Columns a client may request through `fields=`. Anything else is rejected so
+# the value can be interpolated into the SELECT list safely.
+COMPLAINT_COLUMNS = (
+    "id", "text", "latitude", "longitude", "address", "category", "severity",
+    "department", "zone_name", "ward_number", "zone_dataset_version", "ai_summary", "suggested_action",
+    "location_source", "address_match", "address_distance_m", "location_mismatch", "incident_id",
+    "action_plan", "status", "image_url", "geohash", "degraded_agents", "created_at", "updated_at",
+)
+
+def _parse_csv_param(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def _projection_tag(requested: List[str], includes: set) -> str:
+    """Short hash of the normalized fields/include selection ('' for the full complaint)."""
+    if not requested and not includes:
+        return ""
+    selection = f"{','.join(sorted(set(requested)))}|{','.join(sorted(includes))}"
+    return f"{zlib.crc32(selection.encode()):08x}"
+
+def _complaint_etag(complaint_id: int, updated_at, projection: str = "") -> str:
+    # updated_at is bumped by every write to the row, so it versions the resource;
+    # each fields/include projection is a different representation and gets its own tag.
+    stamp = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return f'W/"{complaint_id}-{stamp}-{projection}"' if projection else f'W/"{complaint_id}-{stamp}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    # Weak comparison: ignore the W/ prefix on either side
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
 @router.get("/complaints/{id}", response_model=APIResponse)
 async def get_complaint(
     id: int,
-    conn: asyncpg.Connection = Depends(db_connection),
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated complaint columns to return"),
+    include: Optional[str] = Query(None, description="Comma-separated extras, e.g. 'executions'"),
+    if_none_match: Optional[str] = Header(None),
 ):
     try:
+        requested = _parse_csv_param(fields)
+        unknown = [f for f in requested if f not in COMPLAINT_COLUMNS]
+        if unknown:
+            return APIResponse(success=False, error="Invalid fields", message=f"Unknown fields: {', '.join(unknown)}")
+        includes = set(_parse_csv_param(include))
+        projection = _projection_tag(requested, includes)
+
+        # Only the complaint row itself is cached; execution history is read on demand
+        key = ("complaint", id, tuple(sorted(set(requested))))
+        cached = None if includes else query_cache.get(key)
+        if not includes:
+            _cache_header(response, cached)
+        if cached is not None:
+            data, etag = cached
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+            return APIResponse(success=True, data=data)
+
+        generation = query_cache.generation
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            return await _fetch_complaint(conn, id, response, requested, includes, projection,
+                                          if_none_match, key, generation)
+
+    except Exception as e:
+        return APIResponse(success=False, error="Failed to fetch complaint", message=str(e))
+
+async def _fetch_complaint(conn: asyncpg.Connection, id: int, response: Response, requested: List[str],
+                           includes: set, projection: str, if_none_match: Optional[str], key: tuple,
+                           generation: int):
+    if if_none_match:
+        # Served by idx_complaints_id_updated_at as an index-only scan, so a
+        # polling client that is up to date never touches the heap or JSON.
+        updated_at = await conn.fetchval("SELECT updated_at FROM complaints WHERE id = $1", id)
+        if updated_at is not None:
+            etag = _complaint_etag(id, updated_at, projection)
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    if requested:
+        columns = list(dict.fromkeys(requested + ["updated_at"]))
+        row = await conn.fetchrow(f"SELECT {', '.join(columns)} FROM complaints WHERE id = $1", id)
+    else:
         row = await conn.fetchrow("SELECT * FROM complaints WHERE id = $1", id)
-        if not row:
-            return APIResponse(success=False, error="Complaint not found")
-            
+    if not row:
+        return APIResponse(success=False, error="Complaint not found")
+
+    data = dict(row)
+    etag = _complaint_etag(id, data["updated_at"], projection)
+    response.headers["ETag"] = etag
+    if requested and "updated_at" not in requested:
+        del data["updated_at"]
+    if not includes:
+        query_cache.put(key, (data, etag), id, generation)
+        return APIResponse(success=True, data=data)
+
+    # agent_executions is partitioned by month; bounding created_at by the
+    # complaint's own timestamp lets the planner skip older partitions.
+    if "executions" in includes:
         executions = await conn.fetch(
             """
-            SELECT agent_name, execution_time_ms, status, output_data, created_at 
+            SELECT agent_name, execution_time_ms, status, context_delta, output_data, trace_id, created_at 
             FROM agent_executions 
-            WHERE complaint_id = $1 
-            ORDER BY created_at ASC
+            WHERE complaint_id = $1 AND created_at >= (SELECT created_at FROM complaints WHERE id = $1)
+            ORDER BY created_at ASC, id ASC
             """,
             id
         )
-        
-        data = dict(row)
         data['agent_executions'] = [dict(r) for r in executions]
-        
-        return APIResponse(success=True, data=data)
-        
-    except Exception as e:
-        return APIResponse(success=False, error="Failed to fetch complaint", message=str(e))
+
+    if "context" in includes:
+        # Replay per-step deltas; rows written before deltas existed carry a
+        # full snapshot in input_data, which replays the same way. Only the
+        # latest run counts: each run (reprocess, worker retry) has its own
+        # trace id and rebuilds the context from scratch.
+        deltas = await conn.fetch(
+            """
+            WITH runs AS (
+                SELECT COALESCE(context_delta, input_data) AS delta, trace_id, created_at, id
+                FROM agent_executions
+                WHERE complaint_id = $1 AND created_at >= (SELECT created_at FROM complaints WHERE id = $1)
+            )
+            SELECT delta FROM runs
+            WHERE trace_id IS NOT DISTINCT FROM (SELECT trace_id FROM runs ORDER BY created_at DESC, id DESC LIMIT 1)
+            ORDER BY created_at ASC, id ASC
+            """,
+            id
+        )
+        context = AgentContext.from_deltas(id, (json.loads(r['delta']) for r in deltas if r['delta']))
+        data['agent_context'] = context.get_all()
+    
+    return APIResponse(success=True, data=data)
 
 # ----------------------------------------------------------------------
 # PATCH /complaints/{id}
@@ -213,14 +573,27 @@ async def update_complaint(
     conn: asyncpg.Connection = Depends(db_connection),
 ):
     try:
-        row = await conn.fetchrow(
-            "UPDATE complaints SET status = $1, updated_at = NOW() WHERE id = $2 RETURNING *",
-            body.status, id
-        )
-        
-        if not row:
-            return APIResponse(success=False, error="Complaint not found")
+        async with conn.transaction():
+            old = await conn.fetchrow(
+                "SELECT status FROM complaints WHERE id = $1 FOR UPDATE", id
+            )
+            row = await conn.fetchrow(
+                "UPDATE complaints SET status = $1, updated_at = NOW() WHERE id = $2 RETURNING *",
+                body.status, id
+            )
             
+            if not row:
+                return APIResponse(success=False, error="Complaint not found")
+
+            await heatmap.record_change(
+                conn, row['geohash'], row['created_at'].astimezone(timezone.utc).date(),
+                {'category': row['category'], 'severity': row['severity'], 'status': old['status']},
+                {'category': row['category'], 'severity': row['severity'], 'status': row['status']}
+            )
+
+        # The trigger's NOTIFY reaches this process a moment later; drop our
+        # own entries now so the caller reads its write back
+        query_cache.invalidate(id)
         return APIResponse(success=True, data=dict(row))
         
     except Exception as e:
@@ -230,32 +603,42 @@ async def update_complaint(
 # GET /stats
 # ----------------------------------------------------------------------
 @router.get("/stats", response_model=APIResponse)
-async def get_stats(conn: asyncpg.Connection = Depends(db_connection)):
+async def get_stats(response: Response):
     try:
-        stats = await conn.fetchrow("""
-          SELECT 
-            COUNT(*) as total_complaints,
-            COUNT(*) FILTER (WHERE status = 'pending') as pending,
-            COUNT(*) FILTER (WHERE status = 'in-progress') as in_progress,
-            COUNT(*) FILTER (WHERE status = 'resolved') as resolved,
-            COUNT(*) FILTER (WHERE severity = 'High') as high_severity,
-            COUNT(*) FILTER (WHERE severity = 'Medium') as medium_severity,
-            COUNT(*) FILTER (WHERE severity = 'Low') as low_severity
-          FROM complaints
-        """)
-        
-        cat_stats = await conn.fetch("""
-          SELECT category, COUNT(*) as count 
-          FROM complaints 
-          WHERE category IS NOT NULL
-          GROUP BY category 
-          ORDER BY count DESC
-        """)
-        
-        return APIResponse(success=True, data={
+        cached = query_cache.get(("stats",))
+        _cache_header(response, cached)
+        if cached is not None:
+            return APIResponse(success=True, data=cached)
+
+        generation = query_cache.generation
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            stats = await conn.fetchrow("""
+              SELECT 
+                COUNT(*) as total_complaints,
+                COUNT(*) FILTER (WHERE status = 'pending') as pending,
+                COUNT(*) FILTER (WHERE status = 'in-progress') as in_progress,
+                COUNT(*) FILTER (WHERE status = 'resolved') as resolved,
+                COUNT(*) FILTER (WHERE severity = 'High') as high_severity,
+                COUNT(*) FILTER (WHERE severity = 'Medium') as medium_severity,
+                COUNT(*) FILTER (WHERE severity = 'Low') as low_severity
+              FROM complaints
+            """)
+
+            cat_stats = await conn.fetch("""
+              SELECT category, COUNT(*) as count 
+              FROM complaints 
+              WHERE category IS NOT NULL
+              GROUP BY category 
+              ORDER BY count DESC
+            """)
+
+        data = {
             "overview": dict(stats),
             "by_category": [dict(r) for r in cat_stats]
-        })
+        }
+        query_cache.put(("stats",), data, ALL_COMPLAINTS, generation)
+        return APIResponse(success=True, data=data)
         
     except Exception as e:
         return APIResponse(success=False, error="Failed to fetch statistics", message=str(e))
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from fastapi import APIRouter, WebSocket, status
+
+from ..change_feed import change_feed, FeedFilter
+from .complaints import _parse_csv_param
+
+router = APIRouter()
+
+SEVERITIES = {"low", "medium", "high"}
+
+# ----------------------------------------------------------------------
+# WebSocket /feed
+# ----------------------------------------------------------------------
+@router.websocket("/feed")
+async def complaint_feed(
+    websocket: WebSocket,
+    department: Optional[str] = None,
+    zone: Optional[str] = None,
+    severity: Optional[str] = None,
+    since: Optional[int] = None,
+):
+    """Complaint created / classified / status events matching the filters (comma-separated values)."""
+    severities = set(_parse_csv_param(severity))
+    if {s.lower() for s in severities} - SEVERITIES:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="severity must be Low, Medium or High")
+        return
+    if change_feed.full():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many feed subscribers")
+        return
+    await websocket.accept()
+    feed_filter = FeedFilter(set(_parse_csv_param(department)), set(_parse_csv_param(zone)), severities)
+    await change_feed.serve(websocket, feed_filter, since)
@@ -0,0 +1,36 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+
+from ..agents.forecasting import forecaster, HORIZON_DAYS
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# GET /forecast
+# ----------------------------------------------------------------------
+@router.get("/forecast", response_model=APIResponse)
+async def forecast_all_wards(
+    ward_number: Optional[int] = None,
+    category: Optional[str] = None,
+    min_risk: float = Query(0.0, ge=0.0, le=1.0),
+):
+    try:
+        if not forecaster.ready:
+            await forecaster.refresh()
+
+        forecasts = [
+            f for f in forecaster.all()
+            if f['recurrence_risk'] >= min_risk
+            and (ward_number is None or f['ward_number'] == ward_number)
+            and (category is None or f['category'] == category)
+        ]
+        return APIResponse(success=True, data={
+            "horizon_days": HORIZON_DAYS,
+            "fitted_at": forecaster.fitted_at,
+            "forecasts": forecasts
+        }, total=len(forecasts))
+
+    except Exception as e:
+        print(f"Error fetching forecasts: {e}")
+        return APIResponse(success=False, error="Failed to fetch forecasts", message=str(e))
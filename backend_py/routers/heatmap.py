@@ -0,0 +1,48 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+import asyncpg
+
+from ..db.connection import db_connection
+from ..geo.geohash import covering_prefixes
+from ..geo.heatmap import HEATMAP_PRECISIONS, TILE_DEPTH, SEVERITY_COLUMNS, fetch_tiles
+from .complaints import APIResponse, _parse_coords
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# GET /heatmap
+# ----------------------------------------------------------------------
+@router.get("/heatmap", response_model=APIResponse)
+async def get_heatmap(
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    precision: int = Query(6, ge=min(HEATMAP_PRECISIONS), le=max(HEATMAP_PRECISIONS)),
+    category: Optional[str] = None,
+    status: Optional[str] = Query(None, regex="^(pending|in-progress|resolved)$"),
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    conn: asyncpg.Connection = Depends(db_connection),
+):
+    try:
+        try:
+            min_lng, min_lat, max_lng, max_lat = _parse_coords(bbox, 4)
+        except ValueError as e:
+            return APIResponse(success=False, error="Invalid bbox", message=str(e))
+
+        # Whole tiles are returned, so cells just outside the bbox may be included
+        tiles = covering_prefixes(
+            (min_lat, min_lng, max_lat, max_lng),
+            max_cells=64,
+            max_precision=max(1, precision - TILE_DEPTH),
+        )
+        cells = await fetch_tiles(conn, tiles, precision, category, status, since, until)
+
+        return APIResponse(success=True, data={
+            "precision": precision,
+            "columns": ["cell", "total"] + [s.lower() for s in SEVERITY_COLUMNS],
+            "cells": cells,
+        })
+
+    except Exception as e:
+        print(f"Error fetching heatmap: {e}")
+        return APIResponse(success=False, error="Failed to fetch heatmap", message=str(e))
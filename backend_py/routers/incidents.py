@@ -0,0 +1,89 @@
+import json
+from typing import Any, Dict, Optional
+
+import asyncpg
+from fastapi import APIRouter, Depends, Query
+
+from ..db.connection import db_connection
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# Member complaints returned with a single incident
+INCIDENT_MEMBERS_LIMIT = 100
+
+
+def _incident(row) -> Dict[str, Any]:
+    incident = dict(row)
+    if isinstance(incident.get('plan'), str):
+        incident['plan'] = json.loads(incident['plan'])
+    return incident
+
+# ----------------------------------------------------------------------
+# GET /incidents
+# ----------------------------------------------------------------------
+@router.get("/incidents", response_model=APIResponse)
+async def list_incidents(
+    status: str = Query("open", regex="^(open|merged)$"),
+    category: Optional[str] = None,
+    department: Optional[str] = None,
+    min_members: Optional[int] = Query(None, ge=1, description="Only incidents with at least this many reports"),
+    since_hours: float = Query(72, gt=0, le=24 * 365, description="Only incidents with a report this recent"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    conn: asyncpg.Connection = Depends(db_connection),
+):
+    """Incidents by most recent report: one row per problem, however many people reported it."""
+    try:
+        params = [status, since_hours]
+        where = ["i.status = $1", "i.last_seen >= NOW() - $2 * INTERVAL '1 hour'"]
+        if min_members:
+            params.append(min_members)
+            where.append(f"i.member_count >= ${len(params)}")
+        if category:
+            params.append(category)
+            where.append(f"i.category = ${len(params)}")
+        if department:
+            params.append(f"%{department}%")
+            where.append(f"i.department ILIKE ${len(params)}")
+        where_clause = " AND ".join(where)
+
+        rows = await conn.fetch(
+            f"SELECT i.* FROM incidents i WHERE {where_clause} "
+            f"ORDER BY i.last_seen DESC LIMIT ${len(params)+1} OFFSET ${len(params)+2}",
+            *params, limit, offset
+        )
+        total = await conn.fetchval(f"SELECT COUNT(*) FROM incidents i WHERE {where_clause}", *params)
+        return APIResponse(success=True, data=[_incident(r) for r in rows], total=total, limit=limit, offset=offset)
+    except Exception as e:
+        print(f"Error fetching incidents: {e}")
+        return APIResponse(success=False, error="Failed to fetch incidents", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /incidents/{id}
+# ----------------------------------------------------------------------
+@router.get("/incidents/{id}", response_model=APIResponse)
+async def get_incident(id: int, conn: asyncpg.Connection = Depends(db_connection)):
+    """One incident with its member complaints (newest first) and their status counts."""
+    try:
+        row = await conn.fetchrow("SELECT * FROM incidents WHERE id = $1", id)
+        if not row:
+            return APIResponse(success=False, error="Incident not found")
+        incident = _incident(row)
+        members = await conn.fetch(
+            """
+            SELECT id, text, latitude, longitude, address, severity, status, image_thumbnail_url, created_at
+            FROM complaints WHERE incident_id = $1
+            ORDER BY created_at DESC LIMIT $2
+            """,
+            id, INCIDENT_MEMBERS_LIMIT
+        )
+        counts = await conn.fetch(
+            "SELECT status, COUNT(*) AS count FROM complaints WHERE incident_id = $1 GROUP BY status", id
+        )
+        incident['members'] = [dict(m) for m in members]
+        incident['member_status'] = {r['status']: r['count'] for r in counts}
+        return APIResponse(success=True, data=incident)
+    except Exception as e:
+        print(f"Error fetching incident: {e}")
+        return APIResponse(success=False, error="Failed to fetch incident", message=str(e))
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from ..agents.llm_usage import llm_usage
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# GET /llm/usage
+# ----------------------------------------------------------------------
+@router.get("/llm/usage", response_model=APIResponse)
+async def llm_usage_stats():
+    """Token counts per LLM agent since this process started, with each agent's prompt budget."""
+    try:
+        return APIResponse(success=True, data=llm_usage.snapshot())
+    except Exception as e:
+        print(f"Error fetching LLM usage: {e}")
+        return APIResponse(success=False, error="Failed to fetch LLM usage", message=str(e))
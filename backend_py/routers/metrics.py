@@ -0,0 +1,86 @@
+from fastapi import APIRouter
+
+from ..agents.load_shedding import load_shedder
+from ..agents.speculation import speculation_stats
+from ..agents.imaging import image_processor
+from ..agents.incidents import incident_clusterer
+from ..db.query_cache import query_cache
+from ..change_feed import change_feed
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# Per-process counters of the pipeline's subsystems, one endpoint each so
+# every response keeps a fixed shape.
+
+# ----------------------------------------------------------------------
+# GET /metrics/load-shedding
+# ----------------------------------------------------------------------
+@router.get("/metrics/load-shedding", response_model=APIResponse)
+async def load_shedding_metrics():
+    """Current shedding level, the agents degraded at it, the live signals and their SLOs."""
+    try:
+        return APIResponse(success=True, data=load_shedder.snapshot())
+    except Exception as e:
+        print(f"Error fetching load-shedding metrics: {e}")
+        return APIResponse(success=False, error="Failed to fetch load-shedding metrics", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /metrics/speculation
+# ----------------------------------------------------------------------
+@router.get("/metrics/speculation", response_model=APIResponse)
+async def speculation_metrics():
+    """How often routing and action planning started on the rule-based classification could be kept."""
+    try:
+        return APIResponse(success=True, data=speculation_stats.snapshot())
+    except Exception as e:
+        print(f"Error fetching speculation metrics: {e}")
+        return APIResponse(success=False, error="Failed to fetch speculation metrics", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /metrics/images
+# ----------------------------------------------------------------------
+@router.get("/metrics/images", response_model=APIResponse)
+async def image_metrics():
+    """The image preprocessing pool: workers, pending photos, cache hits and failures."""
+    try:
+        return APIResponse(success=True, data=image_processor.snapshot())
+    except Exception as e:
+        print(f"Error fetching image metrics: {e}")
+        return APIResponse(success=False, error="Failed to fetch image metrics", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /metrics/incidents
+# ----------------------------------------------------------------------
+@router.get("/metrics/incidents", response_model=APIResponse)
+async def incident_metrics():
+    """Incidents opened, joined and merged by this process, plans reused and members tracked per category."""
+    try:
+        return APIResponse(success=True, data=incident_clusterer.snapshot())
+    except Exception as e:
+        print(f"Error fetching incident metrics: {e}")
+        return APIResponse(success=False, error="Failed to fetch incident metrics", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /metrics/query-cache
+# ----------------------------------------------------------------------
+@router.get("/metrics/query-cache", response_model=APIResponse)
+async def query_cache_metrics():
+    """Size, hit ratio and invalidations of the read-endpoint result cache."""
+    try:
+        return APIResponse(success=True, data=query_cache.snapshot())
+    except Exception as e:
+        print(f"Error fetching query cache metrics: {e}")
+        return APIResponse(success=False, error="Failed to fetch query cache metrics", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /metrics/change-feed
+# ----------------------------------------------------------------------
+@router.get("/metrics/change-feed", response_model=APIResponse)
+async def change_feed_metrics():
+    """WebSocket subscribers on this process and the events they were sent."""
+    try:
+        return APIResponse(success=True, data=change_feed.snapshot())
+    except Exception as e:
+        print(f"Error fetching change feed metrics: {e}")
+        return APIResponse(success=False, error="Failed to fetch change feed metrics", message=str(e))
@@ -0,0 +1,39 @@
+import time
+
+from fastapi import APIRouter, Query
+from fastapi.responses import FileResponse
+
+from ..profiling import profile_store
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# GET /profiles
+# ----------------------------------------------------------------------
+@router.get("/profiles", response_model=APIResponse)
+async def list_profiles(
+    limit: int = Query(20, ge=1, le=200),
+    since_minutes: int = Query(24 * 60, ge=1, description="Only profiles of requests started this recently"),
+):
+    """Recent request profiles, slowest first."""
+    try:
+        since_ms = time.time() * 1000 - since_minutes * 60_000
+        profiles = profile_store.list(limit, since_ms)
+        for profile in profiles:
+            profile["url"] = f"/api/profiles/{profile['id']}"
+        return APIResponse(success=True, data=profiles, total=len(profiles), limit=limit)
+    except Exception as e:
+        print(f"Error listing profiles: {e}")
+        return APIResponse(success=False, error="Failed to list profiles", message=str(e))
+
+# ----------------------------------------------------------------------
+# GET /profiles/{id}
+# ----------------------------------------------------------------------
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """The speedscope file for one profile (open it at https://www.speedscope.app)."""
+    path = profile_store.path_for(profile_id)
+    if path is None:
+        return APIResponse(success=False, error="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
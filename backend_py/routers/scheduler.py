@@ -0,0 +1,37 @@
+import asyncpg
+from fastapi import APIRouter, Depends, Query
+
+from ..db.connection import db_connection
+from ..db import jobs
+from ..agents.scheduler import pipeline_scheduler, PRIORITIES
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# GET /scheduler/stats
+# ----------------------------------------------------------------------
+@router.get("/scheduler/stats", response_model=APIResponse)
+async def scheduler_stats(
+    window_minutes: int = Query(60, ge=1, le=7 * 24 * 60, description="Queue wait window for worker jobs"),
+    conn: asyncpg.Connection = Depends(db_connection),
+):
+    """Per-priority queue waits, for pipelines run in-process and for the worker queue."""
+    try:
+        rows = await jobs.wait_stats(conn, window_minutes)
+        queue = {
+            PRIORITIES[r['priority']]: {
+                "count": r['count'],
+                "p50_ms": round(r['p50_ms'], 1) if r['p50_ms'] is not None else None,
+                "p95_ms": round(r['p95_ms'], 1) if r['p95_ms'] is not None else None,
+                "max_ms": r['max_ms'],
+            }
+            for r in rows if 0 <= r['priority'] < len(PRIORITIES)
+        }
+        return APIResponse(success=True, data={
+            "inline": pipeline_scheduler.snapshot(),
+            "queue": {"window_minutes": window_minutes, "wait_ms": queue},
+        })
+    except Exception as e:
+        print(f"Error fetching scheduler stats: {e}")
+        return APIResponse(success=False, error="Failed to fetch scheduler stats", message=str(e))
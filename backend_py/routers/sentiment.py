@@ -0,0 +1,39 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+import asyncpg
+
+from ..db.connection import db_connection
+from ..agents.sentiment_agent import score_batch
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# POST /sentiment/batch
+# ----------------------------------------------------------------------
+class SentimentBatch(BaseModel):
+    texts: Optional[List[str]] = Field(None, max_length=5000)
+    complaint_ids: Optional[List[int]] = Field(None, max_length=5000)
+
+@router.post("/sentiment/batch", response_model=APIResponse)
+async def score_sentiment_batch(
+    body: SentimentBatch,
+    conn: asyncpg.Connection = Depends(db_connection),
+):
+    try:
+        if body.complaint_ids:
+            rows = await conn.fetch(
+                "SELECT id, text FROM complaints WHERE id = ANY($1::int[]) ORDER BY id",
+                body.complaint_ids
+            )
+            scores = score_batch([r['text'] for r in rows])
+            data = [{"complaint_id": r['id'], **score} for r, score in zip(rows, scores)]
+        else:
+            data = score_batch(body.texts or [])
+
+        return APIResponse(success=True, data=data, total=len(data))
+
+    except Exception as e:
+        print(f"Error scoring sentiment batch: {e}")
+        return APIResponse(success=False, error="Failed to score sentiment", message=str(e))
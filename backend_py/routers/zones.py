@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+
+from ..geo.zones import zone_registry
+from .complaints import APIResponse
+
+router = APIRouter()
+
+# ----------------------------------------------------------------------
+# GET /zones
+# ----------------------------------------------------------------------
+@router.get("/zones", response_model=APIResponse)
+async def zone_dataset():
+    """The zone dataset this process is using."""
+    await zone_registry.get()
+    return APIResponse(success=True, data=zone_registry.snapshot())
+
+# ----------------------------------------------------------------------
+# POST /zones/reload
+# ----------------------------------------------------------------------
+@router.post("/zones/reload", response_model=APIResponse)
+async def reload_zones(force: bool = False):
+    """Swap in the current zone source without a restart (`force` recompiles an unchanged source)."""
+    try:
+        reloaded = await zone_registry.reload(force=force)
+        return APIResponse(success=True, data=dict(zone_registry.snapshot(), reloaded=reloaded))
+    except Exception as e:
+        print(f"Error reloading zones: {e}")
+        return APIResponse(success=False, error="Failed to reload zone dataset", message=str(e),
+                           data=zone_registry.snapshot())
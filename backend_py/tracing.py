@@ -0,0 +1,264 @@
+"""
+Lightweight span tracing.
+
+Every HTTP request, and every pipeline run outside a request (worker jobs,
+reprocessing), gets a trace id that follows it through the coordinator, the
+agents, asyncpg (pool acquire wait and each query) and the Gemini calls via
+context variables. The trace id is always assigned, stored on each
+agent_executions row and returned to the client. Spans are only recorded
+when an exporter is configured:
+
+    TRACE_EXPORT=jsonl   append spans to TRACE_FILE (default ./traces/spans.jsonl)
+    TRACE_EXPORT=otlp    POST OTLP/HTTP JSON to a local collector at
+                         OTEL_EXPORTER_OTLP_ENDPOINT (default http://localhost:4318)
+
+Both can be given, comma-separated. A trace's spans are exported together
+when its root span ends, off the event loop.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+TRACE_EXPORT = {t.strip() for t in os.getenv("TRACE_EXPORT", "").split(",") if t.strip()}
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces/spans.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/") + "/v1/traces"
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "geosmart-backend")
+# A trace with more spans than this (e.g. a huge export) keeps the first ones and its root
+MAX_SPANS_PER_TRACE = int(os.getenv("TRACE_MAX_SPANS", 2000))
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any],
+                 start_ns: Optional[int] = None):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns or time.time_ns()
+        trace = self.trace
+        if len(trace.spans) < MAX_SPANS_PER_TRACE or self.parent_id is None:
+            trace.spans.append(self)
+        else:
+            trace.dropped += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.start_ns / 1e9, timezone.utc).isoformat(),
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being recorded."""
+    __slots__ = ()
+    span_id = None
+
+    def set(self, **attributes: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    __slots__ = ('trace_id', 'recording', 'spans', 'dropped')
+
+    def __init__(self, recording: bool):
+        self.trace_id = _new_id(16)
+        self.recording = recording
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def trace(name: str, **attributes: Any):
+    """Start a trace, or a child span if one is already active."""
+    if _trace.get() is not None:
+        with span(name, **attributes) as current:
+            yield current
+        return
+    new_trace = Trace(recording=bool(TRACE_EXPORT))
+    trace_token = _trace.set(new_trace)
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _trace.reset(trace_token)
+        if new_trace.recording:
+            exporter.submit(new_trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """A child of the current span; a no-op outside a recorded trace."""
+    current_trace = _trace.get()
+    if current_trace is None or not current_trace.recording:
+        yield NOOP_SPAN
+        return
+    parent = _span.get()
+    new_span = Span(current_trace, name, parent.span_id if parent else None, attributes)
+    token = _span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span.reset(token)
+        new_span.end()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, error: Optional[str] = None, **attributes: Any):
+    """Record an already-timed operation as a child of the current span."""
+    current_trace = _trace.get()
+    if current_trace is None or not current_trace.recording:
+        return
+    parent = _span.get()
+    finished = Span(current_trace, name, parent.span_id if parent else None, attributes, start_ns)
+    finished.error = error
+    finished.end(end_ns)
+
+
+class SpanExporter:
+    """Writes finished traces to a JSONL file and/or an OTLP/HTTP collector."""
+    def __init__(self, targets, path: str, endpoint: str):
+        self.targets = targets
+        self.path = path
+        self.endpoint = endpoint
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.failures = 0
+
+    def submit(self, finished: Trace):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.export(finished)
+            return
+        loop.run_in_executor(None, self.export, finished)
+
+    def export(self, finished: Trace):
+        spans = list(finished.spans)
+        if finished.dropped:
+            spans[-1].set(**{"trace.dropped_spans": finished.dropped})
+        with self._lock:
+            try:
+                if "jsonl" in self.targets:
+                    self._write_jsonl(spans)
+                if "otlp" in self.targets:
+                    self._post_otlp(spans)
+                self.exported += len(spans)
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️  Span export failed: {e}")
+
+    def _write_jsonl(self, spans: List[Span]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+    def _post_otlp(self, spans: List[Span]):
+        body = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "backend_py.tracing"}, "spans": [_otlp_span(s) for s in spans]}],
+        }]}).encode()
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    record = {
+        "traceId": s.trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": _otlp_attributes(s.attributes),
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        record["parentSpanId"] = s.parent_id
+    return record
+
+
+exporter = SpanExporter(TRACE_EXPORT, TRACE_FILE, OTLP_ENDPOINT)
+
+
+class TracingMiddleware:
+    """ASGI middleware giving each HTTP request a trace; its id is returned in `X-Trace-Id`."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        with trace(f"{scope['method']} {scope['path']}", **{"http.method": scope['method'],
+                                                             "http.target": scope['path']}) as root:
+            trace_id = current_trace_id()
+
+            async def send_with_id(message):
+                if message['type'] == 'http.response.start':
+                    root.set(**{"http.status_code": message['status']})
+                    headers = list(message.get('headers', [])) + [(b'x-trace-id', trace_id.encode())]
+                    message = dict(message, headers=headers)
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
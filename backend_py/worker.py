@@ -0,0 +1,259 @@
+"""
+Standalone pipeline worker.
+
+Claims complaints from the `pipeline_jobs` queue, runs the multi-agent
+pipeline and writes the results back. Run as many processes as needed, on one
+machine or several; they coordinate only through Postgres.
+
+Usage:
+    python -m backend_py.worker --concurrency 4
+    python -m backend_py.worker --concurrency 8 --llm-rate 5 --lease-seconds 120
+
+Set PIPELINE_MODE=queue on the API so new complaints are queued for workers
+instead of being processed inside the request.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+from collections import Counter
+from datetime import timezone
+from typing import Dict, Any
+
+from dotenv import load_dotenv
+
+from .db.connection import get_pool, close_pool
+from .db.complaints import UPDATE_RESULTS_SQL, result_update_args
+from .db import jobs
+from .geo import heatmap
+from .geo.zones import zone_registry, run_zone_watch_loop, ZONES_WATCH_SECONDS
+from .reprocess import RateLimiter, build_coordinator
+from .agents.scheduler import EMERGENCY, DEFAULT_AGING_SECONDS
+from .agents.load_shedding import load_shedder, run_load_shedding_loop
+from .agents.forecasting import run_refresh_loop
+
+# How often each worker requeues jobs whose lease expired
+REAP_INTERVAL_SECONDS = 30.0
+
+
+class Worker:
+    def __init__(self, args):
+        self.args = args
+        self.worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        limiter = RateLimiter(args.llm_rate) if args.llm_rate else None
+        self.coordinator = build_coordinator(False, limiter)
+        # In-flight job tasks and their priority
+        self.running: Dict[asyncio.Task, int] = {}
+        self.wakeup = asyncio.Event()
+        self.stopping = False
+        self.last_reap = 0.0
+        self.stats = Counter()
+
+    def stop(self):
+        if not self.stopping:
+            print(f"🛑 Worker {self.worker_id}: draining {len(self.running)} in-flight job(s)...")
+        self.stopping = True
+        self.wakeup.set()
+
+    async def run(self):
+        pool = await get_pool()
+        listener = await pool.acquire()
+        await listener.add_listener(jobs.NOTIFY_CHANNEL, self._on_notify)
+        print(f"👷 Worker {self.worker_id} started (concurrency {self.args.concurrency}, "
+              f"{self.args.reserved_emergency} reserved for emergencies)")
+        try:
+            while not self.stopping:
+                self.wakeup.clear()
+                free = self.args.concurrency - len(self.running)
+                if free > 0:
+                    claimed = await self._claim(pool, free)
+                    for job in claimed:
+                        task = asyncio.create_task(self._run_job(dict(job)))
+                        self.running[task] = job['priority']
+                        task.add_done_callback(self._job_finished)
+                    if claimed and len(claimed) == free:
+                        continue
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.args.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._drain()
+        finally:
+            await listener.remove_listener(jobs.NOTIFY_CHANNEL, self._on_notify)
+            await pool.release(listener)
+        print(f"✓ Worker {self.worker_id} stopped: {dict(self.stats)}")
+
+    async def _claim(self, pool, free: int):
+        """Claim emergencies into any free slot, other work only into unreserved ones."""
+        general_running = sum(1 for priority in self.running.values() if priority != EMERGENCY)
+        general_free = min(free, self.args.concurrency - self.args.reserved_emergency - general_running)
+        async with pool.acquire() as conn:
+            if time.monotonic() - self.last_reap >= REAP_INTERVAL_SECONDS:
+                self.last_reap = time.monotonic()
+                reaped = await jobs.reap_expired(conn)
+                if reaped:
+                    print(f"  ↺ Requeued {reaped} job(s) with expired leases")
+            claimed = list(await jobs.claim(conn, self.worker_id, free, self.args.lease_seconds,
+                                            max_priority=EMERGENCY))
+            if general_free > 0 and len(claimed) < free:
+                claimed += await jobs.claim(conn, self.worker_id, min(general_free, free - len(claimed)),
+                                            self.args.lease_seconds, aging_seconds=self.args.aging_seconds)
+            return claimed
+
+    def _on_notify(self, *_):
+        self.wakeup.set()
+
+    def _job_finished(self, task: asyncio.Task):
+        self.running.pop(task, None)
+        self.wakeup.set()
+
+    async def _drain(self):
+        if not self.running:
+            return
+        _, pending = await asyncio.wait(set(self.running), timeout=self.args.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+    async def _run_job(self, job: Dict[str, Any]):
+        async with load_shedder.track():
+            await self._process_job(job)
+
+    async def _process_job(self, job: Dict[str, Any]):
+        pool = await get_pool()
+        job['lease_lost'] = False
+        heartbeat = asyncio.create_task(self._heartbeat(job, asyncio.current_task()))
+        try:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow("SELECT * FROM complaints WHERE id = $1", job['complaint_id'])
+            complaint_data = {
+                "id": row['id'],
+                "text": row['text'],
+                "latitude": row['latitude'],
+                "longitude": row['longitude'],
+                "address": row['address'],
+                "location_source": row['location_source'],
+                "image_url": row['image_url'],
+                "imageUrl": row['image_url'],
+            }
+            processing_result = await self.coordinator.process_complaint(complaint_data)
+            error = None
+            if processing_result.get("fallback"):
+                error = "; ".join(e.get("error", "") for e in processing_result["execution_log"]
+                                  if e.get("status") == "error") or "pipeline fell back to manual review"
+                if job['attempts'] < job['max_attempts']:
+                    raise RuntimeError(error)
+            await self._write_results(pool, job, processing_result["result"], error)
+            self.stats['failed' if error else 'done'] += 1
+        except asyncio.CancelledError:
+            if job['lease_lost']:
+                self.stats['lease_lost'] += 1
+                return
+            # Shutdown timed out: hand the job to another worker right away
+            async with pool.acquire() as conn:
+                await jobs.release(conn, job['id'], self.worker_id)
+            self.stats['released'] += 1
+            raise
+        except jobs.LeaseLost as e:
+            print(f"  ⚠️  {e}; discarding results")
+            self.stats['lease_lost'] += 1
+        except Exception as e:
+            print(f"  ✗ Job {job['id']} (complaint {job['complaint_id']}) attempt {job['attempts']} failed: {e}")
+            async with pool.acquire() as conn:
+                if job['attempts'] < job['max_attempts']:
+                    await jobs.retry_later(conn, job['id'], self.worker_id, job['attempts'], str(e))
+                    self.stats['retried'] += 1
+                else:
+                    try:
+                        await jobs.complete(conn, job['id'], self.worker_id, str(e))
+                    except jobs.LeaseLost:
+                        pass
+                    self.stats['failed'] += 1
+        finally:
+            heartbeat.cancel()
+
+    async def _write_results(self, pool, job: Dict[str, Any], context_data: Dict[str, Any], error):
+        """Apply the pipeline output and finish the job in one transaction."""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Fence first: if the lease was lost this raises and nothing is written
+                await jobs.complete(conn, job['id'], self.worker_id, error)
+                current = await conn.fetchrow(
+                    "SELECT category, severity, status, geohash, created_at FROM complaints WHERE id = $1 FOR UPDATE",
+                    job['complaint_id']
+                )
+                await conn.execute(UPDATE_RESULTS_SQL, *result_update_args(context_data, job['complaint_id']))
+                await heatmap.record_change(
+                    conn, current['geohash'], current['created_at'].astimezone(timezone.utc).date(),
+                    dict(current),
+                    {'category': context_data.get('category'),
+                     'severity': context_data.get('severity'),
+                     'status': current['status']}
+                )
+
+    async def _heartbeat(self, job: Dict[str, Any], job_task: asyncio.Task):
+        pool = await get_pool()
+        interval = self.args.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with pool.acquire() as conn:
+                    await jobs.heartbeat(conn, job['id'], self.worker_id, self.args.lease_seconds)
+            except jobs.LeaseLost as e:
+                print(f"  ⚠️  {e}; abandoning complaint {job['complaint_id']}")
+                job['lease_lost'] = True
+                job_task.cancel()
+                return
+            except Exception as e:
+                # Transient DB error: keep the job running and retry next beat
+                print(f"  ⚠️  Heartbeat for job {job['id']} failed: {e}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run agent pipelines from the pipeline_jobs queue")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv("WORKER_CONCURRENCY", 4)),
+                        help="Pipelines in flight in this process (keep below DB_POOL_MAX_SIZE)")
+    parser.add_argument('--reserved-emergency', type=int, default=int(os.getenv("WORKER_RESERVED_EMERGENCY", 1)),
+                        help="Slots only emergency jobs may use")
+    parser.add_argument('--aging-seconds', type=float, default=DEFAULT_AGING_SECONDS,
+                        help="Waiting jobs gain one priority level per this many seconds")
+    parser.add_argument('--lease-seconds', type=float, default=120.0,
+                        help="Lease length; renewed every third of it while a job runs")
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help="Seconds between polls when no NOTIFY arrives")
+    parser.add_argument('--llm-rate', type=float, default=0.0, help="Max LLM calls per second (0 = unlimited)")
+    parser.add_argument('--drain-timeout', type=float, default=60.0,
+                        help="Seconds to let in-flight jobs finish on shutdown before releasing them")
+    parser.add_argument('--worker-id', help="Defaults to hostname:pid")
+    args = parser.parse_args(argv)
+    if args.reserved_emergency >= args.concurrency:
+        parser.error("--reserved-emergency must be lower than --concurrency")
+    return args
+
+
+async def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    worker = Worker(args)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    shedding = asyncio.create_task(run_load_shedding_loop(float(os.getenv("SHED_INTERVAL_SECONDS", 2))))
+    # The predictive agent reads the forecaster's cached model, refreshed here as on the API
+    forecast_refresh = asyncio.create_task(run_refresh_loop(float(os.getenv("FORECAST_REFRESH_SECONDS", 900))))
+    await zone_registry.get()
+    zone_watch = asyncio.create_task(run_zone_watch_loop(ZONES_WATCH_SECONDS))
+    try:
+        await worker.run()
+    finally:
+        shedding.cancel()
+        forecast_refresh.cancel()
+        zone_watch.cancel()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+import asyncio
+
+from backend_py.agents.context import AgentContext
+from backend_py.agents.classification_agent import ClassificationAgent
+from backend_py.agents.streaming import STREAM_RETRIES
+
+
+def test_proposed_values_reach_forks_only():
+    async def run():
+        context = AgentContext(1, persist=False)
+        await context.propose({'category': 'Roads', 'severity': 'High'})
+        assert context.get('category') is None
+        assert context.get_all()['severity'] is None
+        assert context.take_changes() == {}
+        assert context.peek('category') == 'Roads'
+        fork = context.fork()
+        assert (fork.get('category'), fork.get('severity')) == ('Roads', 'High')
+        context.retract('category', 'severity')
+        assert context.peek('category') is None
+        assert context.fork().get('category') is None
+    asyncio.run(run())
+
+
+def test_wait_for_wakes_on_a_proposal():
+    async def run():
+        context = AgentContext(1, persist=False)
+        waiter = asyncio.create_task(context.wait_for('category', 'severity'))
+        await context.propose({'category': 'Roads'})
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await context.propose({'severity': 'Low'})
+        await asyncio.wait_for(waiter, 1)
+    asyncio.run(run())
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class Response:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for text in self._chunks:
+            await asyncio.sleep(0)
+            yield Chunk(text)
+
+
+class Model:
+    """Streams each response in turn, one per call."""
+    def __init__(self, *responses):
+        self._responses = list(responses)
+
+    async def generate_content_async(self, prompt, stream=False):
+        return Response(self._responses.pop(0))
+
+
+def _agent(model):
+    agent = ClassificationAgent()
+    agent.use_fallback = False
+    agent.model = model
+    return agent
+
+
+async def _classify(agent):
+    context = AgentContext(1, persist=False)
+    await context.update('Test', {'issue_type': 'garbage accumulation', 'original_text': 'Garbage on the road'})
+    context.take_changes()
+    seen = []
+
+    async def watch():
+        # What the coordinator sees when it wakes for the early fields
+        await context.wait_for('category', 'severity')
+        seen.append((context.get('category'), context.peek('category')))
+
+    watcher = asyncio.create_task(watch())
+    await agent.execute(context)
+    await watcher
+    return context, seen
+
+
+def test_early_fields_are_not_committed_when_the_stream_fails():
+    broken = ['{"category": "Roads", "severity": "High", ', '"reasoning": oops']
+    # Every attempt (the first plus STREAM_RETRIES) fails, so the agent falls back
+    agent = _agent(Model(*[broken] * (STREAM_RETRIES + 1)))
+    context, seen = asyncio.run(_classify(agent))
+    # The coordinator could see the proposal while it streamed...
+    assert seen == [(None, 'Roads')]
+    # ...but the context only ever holds the fallback classification
+    changes = context.take_changes()
+    assert (changes['category'], changes['classification_reasoning']) == ('Sanitation', 'Fallback Logic')
+    assert context.peek('severity') == context.get('severity') == 'Medium'
+
+
+def test_early_fields_are_committed_with_the_full_response():
+    agent = _agent(Model([
+        '{"category": "Roads", "severity": "High", ',
+        '"impact_scope": "Street", "reasoning": "Pothole on a main road"}',
+    ]))
+    context, seen = asyncio.run(_classify(agent))
+    assert seen == [(None, 'Roads')]
+    assert context.take_changes() == {
+        'category': 'Roads', 'severity': 'High', 'impact_scope': 'Street',
+        'classification_reasoning': 'Pothole on a main road',
+    }
+    assert context.peek('category') == 'Roads'
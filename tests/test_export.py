@@ -0,0 +1,21 @@
+import pytest
+
+from backend_py.routers.complaints import _accepts_gzip
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("br;q=1.0, *", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("gzip;level=1;q=0", False),
+    ("gzip;q=abc", False),
+    ("*;q=1, gzip;q=0", False),
+    ("gzip;q=0.1, *;q=0", True),
+    ("identity", False),
+])
+def test_accepts_gzip(header, expected):
+    assert _accepts_gzip(header) is expected
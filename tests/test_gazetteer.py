@@ -0,0 +1,67 @@
+import pytest
+
+from backend_py.geo.gazetteer import (
+    Gazetteer, Place, GAZETTEER_FILE, GAZETTEER_TOLERANCE_M, normalize, check_location, _edit_distance,
+)
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    def place(name, kind, lat, lng, radius, *aliases):
+        return Place(name, kind, lat, lng, radius), [name, *aliases]
+    return Gazetteer([
+        place("Jubilee Hills", "locality", 17.4305, 78.4070, 2000),
+        place("Banjara Hills", "locality", 17.4156, 78.4347, 2000),
+        place("Apollo Hospital", "landmark", 17.4326, 78.4071, 200, "Apollo Hospitals Jubilee Hills"),
+        place("KBR Park", "landmark", 17.4239, 78.4212, 600, "Kasu Brahmananda Reddy Park"),
+        place("Road No 10 Jubilee Hills", "road", 17.4340, 78.4100, 800),
+        place("Road No 12 Banjara Hills", "road", 17.4110, 78.4330, 800),
+    ])
+
+
+def test_normalize_expands_abbreviations_and_drops_filler():
+    assert normalize("Opp. KBR Pk, Rd No.12, Banjara Hills, Hyderabad 500034") == \
+        ["kbr", "pk", "road", "no", "12", "banjara", "hills"]
+    assert normalize(None) == []
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert _edit_distance("banjara", "banjara", 2) == 0
+    assert _edit_distance("banjara", "bnajara", 2) == 1
+    assert _edit_distance("jubilee", "jublie", 2) == 2
+    assert _edit_distance("hospital", "park", 2) == 3
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("Banjara Hills", "Banjara Hills"),
+    ("near Apollo Hospital, Jubilee Hills", "Apollo Hospital"),
+    ("Kasu Brahmananda Reddy Park main gate", "KBR Park"),
+    ("Rd no 12 banjara hills", "Road No 12 Banjara Hills"),
+    ("Jubliee Hils", "Jubilee Hills"),
+    ("Bnajara hills road", "Banjara Hills"),
+])
+def test_resolve(gazetteer, address, expected):
+    assert gazetteer.resolve(address)["name"] == expected
+
+
+def test_numbers_must_match_exactly(gazetteer):
+    assert gazetteer.resolve("Road No 11 Banjara Hills")["name"] == "Banjara Hills"
+
+
+@pytest.mark.parametrize("address", [None, "", "near the bus stop", "Secunderabad station"])
+def test_unknown_addresses_resolve_to_none(gazetteer, address):
+    assert gazetteer.resolve(address) is None
+
+
+def test_check_location(gazetteer):
+    match = gazetteer.resolve("Apollo Hospital")
+    assert check_location(match, 17.4326, 78.4071) == {"distance_m": 0, "mismatch": False}
+    far = check_location(match, 17.3616, 78.4747)
+    assert far["distance_m"] > match["radius_m"] + GAZETTEER_TOLERANCE_M and far["mismatch"]
+    assert check_location(None, 17.4, 78.4) == {"distance_m": None, "mismatch": False}
+
+
+def test_shipped_gazetteer_loads_and_resolves():
+    gazetteer = Gazetteer.from_csv(GAZETTEER_FILE)
+    assert gazetteer.resolve("Opp KBR park, Road no 12 Banjara hills")["kind"] in ("landmark", "road")
+    assert gazetteer.resolve("Charminar")["kind"] == "landmark"
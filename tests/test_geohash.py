@@ -0,0 +1,64 @@
+import math
+import random
+
+import pytest
+
+from backend_py.geo import geohash
+
+
+def test_encode_known_value():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_decode_bbox_contains_the_point():
+    lat, lng = 17.4239, 78.4738
+    min_lat, min_lng, max_lat, max_lng = geohash.decode_bbox(geohash.encode(lat, lng))
+    assert min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+    lat_step, lng_step = geohash.cell_size(geohash.STORED_PRECISION)
+    assert max_lat - min_lat == pytest.approx(lat_step)
+    assert max_lng - min_lng == pytest.approx(lng_step)
+
+
+def test_prefix_upper_sorts_after_every_base32_char():
+    assert list(geohash.BASE32) == sorted(geohash.BASE32)
+    assert all(c < geohash.PREFIX_UPPER for c in geohash.BASE32)
+
+
+@pytest.mark.parametrize("bbox", [
+    (17.38, 78.47, 17.39, 78.49),            # a few streets
+    (17.2, 78.2, 17.6, 78.7),                # the whole city
+    (-0.01, -0.01, 0.01, 0.01),              # straddles the equator and meridian
+    (17.385, 78.4867, 17.385, 78.4867),      # a single point
+])
+def test_covering_prefixes_cover_every_point(bbox):
+    prefixes = geohash.covering_prefixes(bbox, max_cells=32)
+    assert 0 < len(prefixes) <= 32
+    assert len({len(p) for p in prefixes}) == 1
+    min_lat, min_lng, max_lat, max_lng = bbox
+    rng = random.Random(7)
+    corners = [(min_lat, min_lng), (min_lat, max_lng), (max_lat, min_lng), (max_lat, max_lng)]
+    points = corners + [(rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)) for _ in range(500)]
+    for lat, lng in points:
+        cell = geohash.encode(lat, lng)
+        assert any(cell.startswith(p) for p in prefixes), (lat, lng)
+
+
+def test_covering_prefixes_prefers_finer_cells_for_smaller_boxes():
+    small = geohash.covering_prefixes((17.385, 78.486, 17.386, 78.487))
+    large = geohash.covering_prefixes((17.0, 78.0, 18.0, 79.0))
+    assert len(small[0]) > len(large[0])
+
+
+def test_bbox_around_contains_the_circle():
+    lat, lng, radius = 17.385, 78.4867, 500.0
+    min_lat, min_lng, max_lat, max_lng = geohash.bbox_around(lat, lng, radius)
+    for bearing in range(0, 360, 15):
+        # Points just inside the circle along each bearing
+        d = (radius - 1) / geohash.EARTH_RADIUS_M
+        b = math.radians(bearing)
+        p_lat = math.degrees(math.asin(math.sin(math.radians(lat)) * math.cos(d)
+                                       + math.cos(math.radians(lat)) * math.sin(d) * math.cos(b)))
+        p_lng = lng + math.degrees(math.atan2(math.sin(b) * math.sin(d) * math.cos(math.radians(lat)),
+                                              math.cos(d) - math.sin(math.radians(lat)) * math.sin(math.radians(p_lat))))
+        assert geohash.haversine_m(lat, lng, p_lat, p_lng) == pytest.approx(radius - 1, abs=0.01)
+        assert min_lat <= p_lat <= max_lat and min_lng <= p_lng <= max_lng
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+from backend_py.agents import imaging
+from backend_py.agents.imaging import ImageProcessor, preprocess_image
+
+
+def _write_png(path, size):
+    Image.new("RGB", size, (120, 80, 40)).save(path)
+    return str(path)
+
+
+def test_preprocess_rejects_images_over_the_pixel_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(imaging, "IMAGE_MAX_PIXELS", 100 * 100)
+    # Below Pillow's own 2x bomb threshold, so only the explicit check catches it
+    path = _write_png(tmp_path / "big.png", (150, 100))
+    with pytest.raises(Image.DecompressionBombError):
+        preprocess_image(path, str(tmp_path / "cache"))
+
+
+def test_preprocess_accepts_images_at_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(imaging, "IMAGE_MAX_PIXELS", 100 * 100)
+    meta = preprocess_image(_write_png(tmp_path / "ok.png", (100, 100)), str(tmp_path / "cache"))
+    assert (meta["width"], meta["height"], meta["cached"]) == (100, 100, False)
+
+
+def test_timed_out_image_keeps_its_slot_until_the_work_finishes(monkeypatch):
+    release = threading.Event()
+
+    def slow_preprocess(path, cache_dir):
+        release.wait(5)
+        return {"cached": True, "sha256": "ab" * 32}
+
+    monkeypatch.setattr(imaging, "preprocess_image", slow_preprocess)
+    monkeypatch.setattr(imaging, "IMAGE_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        processor = ImageProcessor(1, 1, "unused", "/uploads/derived")
+        processor._executor = ThreadPoolExecutor(1)
+        with pytest.raises(asyncio.TimeoutError):
+            await processor.process("a.jpg")
+        # The worker is still busy, so the slot is still taken
+        assert processor.pending == 1
+        with pytest.raises(imaging.ImageProcessorBusy):
+            await processor.process("b.jpg")
+        release.set()
+        for _ in range(100):
+            if processor.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert processor.pending == 0
+        processor._executor.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from backend_py.agents.incidents import CategoryGrid, Member, window_for, DEFAULT_WINDOW, _window_overrides
+from backend_py.geo.geohash import haversine_m
+
+NOW = 1_000_000.0
+
+
+def test_window_for_falls_back_to_the_default():
+    assert window_for("Roads") == (150, 72)
+    assert window_for("Noise") == DEFAULT_WINDOW
+
+
+def test_window_overrides_parse_pairs():
+    assert _window_overrides('{"Roads": [100, 12]}') == {"Roads": (100.0, 12.0)}
+
+
+@pytest.mark.parametrize("raw", ["not json", "[150, 72]", '{"Roads": 150}', '{"Roads": [150]}', '{"Roads": ["far", 72]}'])
+def test_invalid_window_overrides_fall_back_to_the_defaults(raw, capsys):
+    assert _window_overrides(raw) == {}
+    assert "INCIDENT_WINDOWS" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("lat", [0.0, 17.385, 60.0, -45.0])
+def test_neighbours_match_a_brute_force_scan(lat):
+    grid = CategoryGrid(eps_m=150, window_s=3600)
+    rng = random.Random(int(lat * 1000))
+    members = []
+    for i in range(400):
+        member = Member(i, i, lat + rng.uniform(-0.01, 0.01), 78.0 + rng.uniform(-0.01, 0.01), NOW)
+        grid.add(member)
+        members.append(member)
+    for _ in range(50):
+        q_lat, q_lng = lat + rng.uniform(-0.01, 0.01), 78.0 + rng.uniform(-0.01, 0.01)
+        found = {m.complaint_id for _, m in grid.neighbours(q_lat, q_lng, NOW)}
+        expected = {m.complaint_id for m in members if haversine_m(q_lat, q_lng, m.lat, m.lng) <= 150}
+        assert found == expected
+
+
+def test_expired_members_are_dropped():
+    grid = CategoryGrid(eps_m=150, window_s=3600)
+    grid.add(Member(1, 10, 17.385, 78.4867, NOW - 4000))
+    grid.add(Member(2, 11, 17.385, 78.4867, NOW - 100))
+    assert [m.complaint_id for _, m in grid.neighbours(17.385, 78.4867, NOW)] == [2]
+    assert 1 not in grid.members
+    assert 10 not in grid.by_incident
+
+
+def test_readding_a_member_only_moves_its_incident():
+    grid = CategoryGrid(eps_m=150, window_s=3600)
+    grid.add(Member(1, 10, 17.385, 78.4867, NOW))
+    grid.add(Member(1, 20, 17.385, 78.4867, NOW))
+    assert grid.members[1].incident_id == 20
+    assert 10 not in grid.by_incident or not grid.by_incident[10]
+    assert len(grid.neighbours(17.385, 78.4867, NOW)) == 1
+
+
+def test_merge_moves_every_member():
+    grid = CategoryGrid(eps_m=150, window_s=3600)
+    grid.add(Member(1, 10, 17.385, 78.4867, NOW))
+    grid.add(Member(2, 11, 17.3851, 78.4868, NOW))
+    grid.merge(11, 10)
+    assert {m.incident_id for _, m in grid.neighbours(17.385, 78.4867, NOW)} == {10}
+    assert {m.complaint_id for m in grid.by_incident[10]} == {1, 2}
+    assert 11 not in grid.by_incident
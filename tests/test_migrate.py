@@ -0,0 +1,23 @@
+from backend_py.db.migrate import discover, split_statements
+
+
+def test_split_statements_on_line_end_semicolons():
+    sql = "-- migrate:no-transaction\n-- a comment\nCREATE INDEX a ON t (x);\n\nDROP INDEX b;\nSELECT 1"
+    assert split_statements(sql) == ["CREATE INDEX a ON t (x)", "DROP INDEX b", "SELECT 1"]
+
+
+def test_split_statements_keeps_dollar_quoted_bodies_whole():
+    sql = "DELETE FROM t;\nDO $$\nBEGIN\n    -- inside\n    DROP INDEX x;\nEND\n$$;\nCREATE INDEX y ON t (z);"
+    assert split_statements(sql) == [
+        "DELETE FROM t",
+        "DO $$\nBEGIN\n    -- inside\n    DROP INDEX x;\nEND\n$$",
+        "CREATE INDEX y ON t (z)",
+    ]
+
+
+def test_migrations_are_numbered_and_split_cleanly():
+    migrations = discover()
+    assert [m.version for m in migrations] == sorted(m.version for m in migrations)
+    for m in migrations:
+        if not m.transactional:
+            assert all(statement and not statement.endswith(";") for statement in split_statements(m.sql))
@@ -0,0 +1,80 @@
+import pytest
+
+from backend_py.agents.prompts import (
+    PromptTemplate, PromptField, truncate_text, truncate_list, estimate_tokens, CHARS_PER_TOKEN,
+    MIN_ELASTIC_TOKENS,
+)
+
+LONG_TEXT = ("Huge pothole on the main road " + "and traffic keeps swerving around it " * 60
+             + "please fix it near Ameerpet metro")
+
+
+def test_short_text_is_only_whitespace_normalized():
+    assert truncate_text("  pothole\n near   school ", 50) == "pothole near school"
+    assert truncate_text(None, 10) == ""
+
+
+@pytest.mark.parametrize("max_tokens", [20, 50, 120])
+def test_truncate_text_keeps_head_and_tail_within_budget(max_tokens):
+    result = truncate_text(LONG_TEXT, max_tokens)
+    assert len(result) <= max_tokens * CHARS_PER_TOKEN
+    assert "chars omitted" in result
+    head, _, rest = result.partition(" … [")
+    assert LONG_TEXT.startswith(head)
+    tail = rest.split("] … ", 1)[1]
+    assert LONG_TEXT.endswith(tail)
+
+
+def test_truncate_text_cuts_on_word_boundaries_and_counts_omitted_chars():
+    result = truncate_text(LONG_TEXT, 50)
+    head, rest = result.split(" … [", 1)
+    omitted, tail = rest.split(" chars omitted] … ", 1)
+    assert int(omitted) == len(LONG_TEXT) - len(head) - len(tail)
+    assert LONG_TEXT[len(head)] == " "
+    assert LONG_TEXT[len(LONG_TEXT) - len(tail) - 1] == " "
+
+
+def test_truncate_text_is_deterministic():
+    assert truncate_text(LONG_TEXT, 40) == truncate_text(LONG_TEXT, 40)
+
+
+def test_truncate_list_notes_left_out_items():
+    items = [f"facility number {i}" for i in range(50)]
+    result = truncate_list(items, 30)
+    assert result.endswith("more)")
+    kept = result.rsplit(" (+", 1)[0].split(", ")
+    assert result.endswith(f"(+{50 - len(kept)} more)")
+    assert truncate_list(["a", "b"], 30) == "a, b"
+
+
+def _template(budget=200):
+    return PromptTemplate("classification", "You classify civic complaints.\nReply as JSON.", [
+        PromptField("category", "Category"),
+        PromptField("facilities", "Nearby", kind='list'),
+        PromptField("text", "Complaint", kind='text', elastic=True),
+    ], budget)
+
+
+def test_render_fits_the_budget_and_reports_truncation():
+    built = _template().render(category="Roads", facilities=["Hospital"], text=LONG_TEXT)
+    assert built.estimated_tokens <= 200 + 2
+    assert built.truncated == ["text"]
+    assert built.text.startswith("You classify civic complaints.\nReply as JSON.\n\n")
+    assert 'Complaint: "Huge pothole' in built.text
+
+
+def test_render_without_truncation():
+    built = _template().render(category=None, facilities=[], text="Pothole near school")
+    assert built.truncated == []
+    assert built.text.endswith('Category: None\nNearby: None\nComplaint: "Pothole near school"')
+
+
+def test_elastic_field_keeps_a_minimum_when_the_budget_is_spent():
+    built = _template(budget=10).render(category="Roads", facilities=[], text=LONG_TEXT)
+    complaint = built.text.rsplit("Complaint: ", 1)[1]
+    assert estimate_tokens(complaint) >= MIN_ELASTIC_TOKENS - estimate_tokens("Complaint") - 2
+
+
+def test_budget_env_override(monkeypatch):
+    monkeypatch.setenv("PROMPT_BUDGET_ACTION_PLANNING", "321")
+    assert PromptTemplate("actionPlanning", "x", [], 100).budget == 321
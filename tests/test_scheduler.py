@@ -0,0 +1,119 @@
+import asyncio
+import types
+
+import pytest
+
+from backend_py.agents import scheduler
+from backend_py.agents.scheduler import PriorityScheduler, EMERGENCY, ELEVATED, ROUTINE
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the scheduler's view of time is faked; the event loop keeps the real clock
+    fake = Clock()
+    monkeypatch.setattr(scheduler, "time", types.SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+async def _queue(sched, priority, order, name):
+    async with sched.slot(priority):
+        order.append(name)
+
+
+def test_effective_priority_improves_one_level_per_aging_period(clock):
+    sched = PriorityScheduler(concurrency=2, reserved=1, aging_seconds=30)
+    assert sched._effective(ROUTINE, 1000.0, 1000.0) == ROUTINE
+    assert sched._effective(ROUTINE, 1000.0, 1029.9) == ROUTINE
+    assert sched._effective(ROUTINE, 1000.0, 1030.0) == ELEVATED
+    assert sched._effective(ROUTINE, 1000.0, 1100.0) == EMERGENCY
+
+
+def test_most_urgent_waiter_goes_first(clock):
+    async def run():
+        sched = PriorityScheduler(concurrency=2, reserved=1)
+        order = []
+        await sched.acquire(ROUTINE)
+        await sched.acquire(EMERGENCY)
+        tasks = [asyncio.create_task(_queue(sched, p, order, name))
+                 for p, name in ((ROUTINE, "routine"), (ELEVATED, "elevated"), (EMERGENCY, "emergency"))]
+        await asyncio.sleep(0)
+        sched.release(EMERGENCY)
+        sched.release(ROUTINE)
+        await asyncio.gather(*tasks)
+        return order
+    assert asyncio.run(run()) == ["emergency", "elevated", "routine"]
+
+
+def test_aged_routine_work_overtakes_newer_elevated_work(clock):
+    async def run():
+        sched = PriorityScheduler(concurrency=2, reserved=1, aging_seconds=30)
+        order = []
+        await sched.acquire(ROUTINE)
+        routine = asyncio.create_task(_queue(sched, ROUTINE, order, "routine"))
+        await asyncio.sleep(0)
+        clock.now += 31
+        elevated = asyncio.create_task(_queue(sched, ELEVATED, order, "elevated"))
+        await asyncio.sleep(0)
+        # Both are now effectively elevated; the one that waited longer wins
+        sched.release(ROUTINE)
+        await asyncio.gather(routine, elevated)
+        return order
+    assert asyncio.run(run()) == ["routine", "elevated"]
+
+
+def test_reserved_slots_only_admit_emergencies(clock):
+    async def run():
+        sched = PriorityScheduler(concurrency=2, reserved=1)
+        await sched.acquire(ROUTINE)
+        routine = asyncio.create_task(sched.acquire(ROUTINE))
+        await asyncio.sleep(0)
+        assert not routine.done()
+        await asyncio.wait_for(sched.acquire(EMERGENCY), 1)
+        assert sched.running == 2
+        routine.cancel()
+        await asyncio.gather(routine, return_exceptions=True)
+        assert sched.snapshot()["queued"]["routine"] == 0
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot(clock):
+    async def run():
+        sched = PriorityScheduler(concurrency=2, reserved=1)
+        await sched.acquire(ROUTINE)
+        waiter = asyncio.create_task(sched.acquire(ROUTINE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        sched.release(ROUTINE)
+        assert sched.running == 0 and sched.running_general == 0
+    asyncio.run(run())
+
+
+def test_reserved_must_leave_general_capacity():
+    with pytest.raises(ValueError):
+        PriorityScheduler(concurrency=2, reserved=2)
+
+
+@pytest.mark.parametrize("text, reasons", [
+    ("Submission deadline for the road repair has passed", []),
+    ("Contractor was fired, drain still blocked", []),
+    ("Fire near the transformer, people injured", ['injured', 'fire']),
+    ("Two accidents this week at the broken signal", ['broken', 'accident']),
+    ("EMERGENCY: gas leak", ['emergency']),
+])
+def test_pre_score_matches_whole_words(text, reasons):
+    assert scheduler.pre_score(text)["reasons"] == reasons
+
+
+def test_pre_score_levels():
+    assert scheduler.pre_score("Garbage not collected")["priority"] == ROUTINE
+    assert scheduler.pre_score("Urgent: garbage not collected")["priority"] == ELEVATED
+    assert scheduler.pre_score("Fire spreading in the market")["priority"] == EMERGENCY
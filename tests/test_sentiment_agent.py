@@ -0,0 +1,43 @@
+import pytest
+
+from backend_py.agents.sentiment_agent import score_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Negation stops at punctuation and at the word right after the negator
+    ("Streetlight not working, dangerous at night", 'negative'),
+    ("Garbage not collected for months", 'negative'),
+    ("Water not supplied for weeks, very bad", 'negative'),
+    ("Drain not cleaned. Mosquitoes everywhere, children sick", 'negative'),
+    ("Pothole not fixed", 'negative'),
+    ("Road is not a good road", 'neutral'),
+    ("The wire is not dangerous", 'positive'),
+    # Phrases and postfix negators
+    ("no water since 3 days", 'negative'),
+    ("paani theek nahi aa raha", 'neutral'),
+    ("Issue resolved, thanks", 'positive'),
+])
+def test_sentiment(text, expected):
+    assert score_text(text)['sentiment'] == expected
+
+
+def test_negation_does_not_cross_a_comma():
+    result = score_text("Streetlight not working, dangerous at night")
+    assert result['distress_terms'] == ['dangerous']
+    assert result['raw_score'] == 2.5
+
+
+def test_postfix_negator_flips_the_previous_term():
+    assert score_text("theek nahi")['distress_terms'] == ['theek (nahi)']
+
+
+def test_shouting_scales_distress_only():
+    calm = score_text("Thanks, resolved")
+    assert score_text("THANKS, RESOLVED!!!")['raw_score'] == calm['raw_score']
+    assert score_text("Dangerous wire!!!")['raw_score'] > score_text("Dangerous wire")['raw_score']
+
+
+def test_empty_text_is_neutral():
+    result = score_text(None)
+    assert result['sentiment'] == 'neutral'
+    assert result['severity_adjustment'] is None
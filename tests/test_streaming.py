@@ -0,0 +1,60 @@
+import pytest
+
+from backend_py.agents.streaming import IncrementalJSONParser, MalformedJSON
+
+
+def feed_chunks(parser, chunks):
+    completed = []
+    for chunk in chunks:
+        completed += parser.feed(chunk)
+    return completed
+
+
+def test_fields_complete_as_soon_as_they_close():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"category": "Ro') == []
+    assert parser.feed('ads", "severity"') == [('category', 'Roads')]
+    assert parser.feed(': "High", "score": 0.') == [('severity', 'High')]
+    assert parser.feed('75}') == [('score', 0.75)]
+    assert parser.done
+    assert parser.finish() == {'category': 'Roads', 'severity': 'High', 'score': 0.75}
+
+
+def test_single_character_chunks_match_json_loads():
+    text = '{"a": [1, {"b": "x]}"}], "c": {"d": null}, "e": true, "f": "q\\"uote", "g": -3e2}'
+    parser = IncrementalJSONParser()
+    feed_chunks(parser, text)
+    assert parser.finish() == {"a": [1, {"b": "x]}"}], "c": {"d": None}, "e": True, "f": 'q"uote', "g": -300.0}
+
+
+def test_code_fence_and_trailing_text_are_tolerated():
+    parser = IncrementalJSONParser()
+    feed_chunks(parser, ['```json\n{"category": ', '"Water Supply"}\n```', ' hope this helps'])
+    assert parser.finish() == {'category': 'Water Supply'}
+
+
+def test_escaped_key():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a\\"b": 1}')
+    assert parser.finish() == {'a"b': 1}
+
+
+@pytest.mark.parametrize("text", [
+    'Sure! Here is the JSON',
+    '{"category" "Roads"}',
+    '{"category": Roads}',
+    '{"items": [1, 2}',
+    '{"a": 1 "b": 2}',
+    '{category: 1}',
+])
+def test_malformed_output_raises_on_the_offending_chunk(text):
+    with pytest.raises(MalformedJSON):
+        IncrementalJSONParser().feed(text)
+
+
+def test_truncated_object_fails_on_finish():
+    parser = IncrementalJSONParser()
+    parser.feed('{"category": "Roads", "severity": "Hi')
+    assert not parser.done
+    with pytest.raises(MalformedJSON):
+        parser.finish()